@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+"""
+fakeserver を相手に、クライアントの API 呼び出しの性能を測るベンチマーク
+
+    $ PYTHONPATH=src python bench/bench_client.py [-n 回数] [-c 並列数] [--latency 秒] [--transport pooled]
+
+シナリオごとに子プロセスを起動し、1 回の呼び出しごとの所要時間から calls/sec と p50 / p99 を求め、
+子プロセスの最大 RSS をメモリ使用量のピークとして表示します。
+サーバはこのプロセス内で動かすため、子プロセスの計測値には含まれません。
+"""
+import json
+import optparse
+import resource
+import subprocess
+import sys
+import threading
+import time
+
+SCENARIOS = ["find_issue", "get_comments", "create_issue", "models"]
+
+
+def _maxrss():
+    # Linux では KB、Mac OS X では byte 単位
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss * 1024 if sys.platform != "darwin" else rss
+
+
+def _percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def _scenario(name, backlog, options):
+    from backloglib.models import Issue
+    issues = options.issues
+    if name == "find_issue":
+        return lambda i: backlog.find_issue({"projectId": 1, "offset": i * 100 % issues, "limit": 100})
+    if name == "get_comments":
+        return lambda i: backlog.get_comments(i % issues + 1)
+    if name == "create_issue":
+        return lambda i: backlog.create_issue({"projectId": 1, "summary": u"bench %d" % i, "priorityId": 3})
+    if name == "models":
+        structs = backlog.server.backlog.getIssue(1)
+        return lambda i: Issue(**structs)
+    raise ValueError("unknown scenario : %s" % name)
+
+
+def measure(name, uri, options):
+    from backloglib import Backlog, PooledTransport
+    transport = PooledTransport(pool_size=options.concurrency) if options.transport == "pooled" else None
+    backlog = Backlog("bench", "user", "password", uri=uri, transport=transport, compact=options.compact)
+    call = _scenario(name, backlog, options)
+    call(0)
+
+    latencies = []
+    counter = iter(xrange(options.number))
+    lock = threading.Lock()
+
+    def run():
+        while 1:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            start = time.time()
+            ret = call(i)
+            latencies.append(time.time() - start)
+            del ret
+
+    start = time.time()
+    threads = [threading.Thread(target=run) for x in range(options.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.time() - start
+    return {"scenario": name, "calls": len(latencies), "calls_per_sec": len(latencies) / elapsed,
+            "p50": _percentile(latencies, 0.50), "p99": _percentile(latencies, 0.99),
+            "memory": _maxrss()}
+
+
+def main(argv):
+    parser = optparse.OptionParser(usage="%prog [options] [scenario ...]")
+    parser.add_option("-n", "--number", type="int", default=200, help="number of calls per scenario")
+    parser.add_option("-c", "--concurrency", type="int", default=1, help="number of calling threads")
+    parser.add_option("--transport", choices=["default", "pooled"], default="default")
+    parser.add_option("--compact", action="store_true", default=False, help="use compact models")
+    parser.add_option("--latency", type="float", default=0.0, help="server latency in seconds")
+    parser.add_option("--issues", type="int", default=1000, help="number of issues on the server")
+    parser.add_option("--comments", type="int", default=10, help="number of comments per issue")
+    parser.add_option("--description-size", type="int", default=1000, help="length of descriptions and comments")
+    parser.add_option("--child", metavar="URI", help=optparse.SUPPRESS_HELP)
+    options, scenarios = parser.parse_args(argv[1:])
+    if options.concurrency > 1 and options.transport != "pooled":
+        parser.error("--concurrency requires --transport pooled")
+
+    if options.child:
+        # 親プロセスの引数に続けてシナリオ名を渡すため、最後のものを使う
+        print json.dumps(measure(scenarios[-1], options.child, options))
+        return
+
+    from backloglib.fakeserver import FakeBacklogServer
+    server = FakeBacklogServer(latency=options.latency, issues=options.issues, comments=options.comments,
+                               description_size=options.description_size)
+    with server:
+        print "%-14s %8s %12s %10s %10s %12s" % ("scenario", "calls", "calls/sec", "p50(ms)", "p99(ms)", "peak(KB)")
+        for name in scenarios or SCENARIOS:
+            output = subprocess.check_output([sys.executable, __file__, "--child", server.uri] + argv[1:] + [name])
+            r = json.loads(output.splitlines()[-1])
+            print "%-14s %8d %12.1f %10.2f %10.2f %12d" % (name, r["calls"], r["calls_per_sec"], r["p50"] * 1000,
+                                                          r["p99"] * 1000, r["memory"] / 1024)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
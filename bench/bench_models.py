@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+"""
+models と compact のクラスのメモリ使用量を比較するベンチマーク
+
+    $ PYTHONPATH=src python bench/bench_models.py [件数]
+
+比較ごとに子プロセスを起動し、オブジェクトを作る前後の最大 RSS の差を測ります。
+"""
+import resource
+import subprocess
+import sys
+import time
+
+MODES = ["models", "lazy", "compact"]
+
+
+def issue_struct(i):
+    return {"id": i, "key": "BENCH-%d" % i, "summary": u"summary %d" % i, "description": u"description %d" % i,
+            "url": "https://space.backlog.jp/view/BENCH-%d" % i, "start_date": "20140101", "due_date": "20140201",
+            "estimated_hours": 1.5, "actual_hours": 2.0, "created_on": "20140101000000",
+            "updated_on": "20140102000000", "issueType": {"id": 1, "name": u"Bug", "color": "#990000"},
+            "priority": {"id": 3, "name": u"Middle"}, "status": {"id": 1, "name": u"Open"},
+            "components": [{"id": 1, "name": u"component"}], "versions": [], "milestones": [],
+            "created_user": {"id": 1, "name": u"creator"}, "assigner": {"id": 2, "name": u"assigner"}}
+
+
+def comment_struct(i):
+    return {"id": i, "content": u"comment %d" % i, "created_user": {"id": 1, "name": u"creator"},
+            "created_on": "20140101000000", "updated_on": "20140101000000"}
+
+
+def user_struct(i):
+    return {"id": i, "name": u"user %d" % i}
+
+
+def _maxrss():
+    # Linux では KB、Mac OS X では byte 単位
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss * 1024 if sys.platform != "darwin" else rss
+
+
+def measure(mode, count):
+    from backloglib import compact, models
+    module = compact if mode == "compact" else models
+    issue_class = models.LazyIssue if mode == "lazy" else module.Issue
+    structs = [(issue_struct(i), comment_struct(i), user_struct(i)) for i in range(count)]
+    before = _maxrss()
+    started = time.time()
+    objects = [(issue_class(**i), module.Comment(**c), module.User(**u)) for i, c, u in structs]
+    elapsed = time.time() - started
+    after = _maxrss()
+    print "%s\t%d\t%d\t%.3f" % (mode, len(objects), after - before, elapsed)
+
+
+def main(argv):
+    if len(argv) > 2:
+        measure(argv[2], int(argv[1]))
+        return
+    count = argv[1] if len(argv) > 1 else "100000"
+    print "%-10s %10s %14s %10s %10s" % ("mode", "objects", "bytes", "bytes/obj", "sec")
+    for mode in MODES:
+        out = subprocess.Popen([sys.executable, __file__, count, mode], stdout=subprocess.PIPE).communicate()[0]
+        name, objects, used, elapsed = out.split()
+        print "%-10s %10s %14s %10d %10s" % (name, objects, used, int(used) / int(objects), elapsed)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+"""
+serialize() と、以前の実装である _do_convert(vars(obj)) の速度を比較するベンチマーク
+
+    $ PYTHONPATH=src python bench/bench_serialize.py [回数]
+"""
+import sys
+import timeit
+import xmlrpclib
+
+from backloglib.models import AddIssue, AdminUpdateProjectUsers, UpdateIssue
+
+OBJECTS = [
+    ("AddIssue", AddIssue(1, u"summary", description=u"description", start_date="20140101", due_date="20140201",
+                          estimated_hours=1.5, issueTypeId=2, componentId=3, priorityId=3, assignerId=4)),
+    ("UpdateIssue", UpdateIssue("BENCH-1", summary=u"summary", description=u"description", versionId=5,
+                                milestoneId=6, resolutionId=0, comment=u"comment")),
+    ("AdminUpdateProjectUsers", AdminUpdateProjectUsers(1, range(100))),
+]
+
+
+def main(argv):
+    number = int(argv[1]) if len(argv) > 1 else 100000
+    print "%-25s %12s %12s %8s" % ("class", "legacy(sec)", "compiled", "speedup")
+    for name, obj in OBJECTS:
+        legacy = obj._do_convert(vars(obj))
+        compiled = obj.serialize()
+        assert xmlrpclib.dumps((legacy,)) == xmlrpclib.dumps((compiled,)), name
+        legacy_time = min(timeit.repeat(lambda: obj._do_convert(vars(obj)), number=number, repeat=3))
+        compiled_time = min(timeit.repeat(obj.serialize, number=number, repeat=3))
+        print "%-25s %12.3f %12.3f %7.1fx" % (name, legacy_time, compiled_time, legacy_time / compiled_time)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
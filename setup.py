@@ -33,6 +33,7 @@ setup(
     platforms="any",
     packages=['backloglib'],
     package_dir={"backloglib": "src/backloglib"},
+    scripts=["scripts/backlog-export"],
     keywords="backlog client",
     classifiers=[
         "Operating System :: OS Independent",
@@ -26,24 +26,108 @@ XML-RPC で提供されている API に対してアクセスを行い、オブ
 __version__ = "0.2.4"
 __author__ = "someda@isenshi.com"
 
-__all__ = ["Backlog", "BacklogAdmin"]
+__all__ = ["Backlog", "BacklogAdmin", "AsyncBacklog", "AsyncBacklogAdmin", "PooledTransport", "PooledSafeTransport",
+           "MasterDataCache", "MemoryBackend", "SqliteBackend", "RateLimiter", "AIMDController",
+           "RetryPolicy", "Instrumentation"]
 
 #
 # Backlog (http://www.backlog.jp) CLIENT LIBRARY
 #
-from xmlrpclib import ServerProxy, Transport
-
-from utils import classwrap
+import inspect
+import threading
+from collections import deque
+from xmlrpclib import Fault, Transport
+
+import bulk
+import columnar
+import compact
+import models
+from batch import Batch
+from cache import MasterDataCache, MemoryBackend, SqliteBackend
+from instrument import Instrumentation
+from proxy import BacklogServerProxy
+from retry import RetryPolicy
+from throttle import AIMDController, RateLimiter
+from utils import check_page_size, classwrap
 from models import *
+from transport import PooledTransport, PooledSafeTransport
+from workers import WorkerPool, inline, spawn
+
+# compact 引数に応じて戻り値に使うクラスのモジュール
+_MODELS_ = {False: models, True: compact}
 
 _URI_FORMAT_ = "https://%(username)s:%(password)s@%(space)s.%(domain)s/XML-RPC"
 
 
+def _attach_comments(issue, comments):
+    """
+    issue の comments 属性にコメントのリストを設定する。compact.Issue では _extra_ に保持する
+    """
+    if hasattr(issue, "__dict__"):
+        issue.__dict__["comments"] = comments
+    else:
+        extra = getattr(issue, "_extra_", None) or {}
+        extra["comments"] = comments
+        issue._extra_ = extra
+
+
 class BacklogBase(object):
-    def __init__(self, space, username, password, domain="backlog.jp"):
-        uri = _URI_FORMAT_ % {"username": username, "password": password, "space": space, "domain": domain}
+    # system.multicall を拒否されたら False にし、以降は個別の呼び出しを行う
+    multicall_supported = True
+
+    def __init__(self, space, username, password, domain="backlog.jp", transport=None, cache=None, lazy=False,
+                 compact=False, uri=None, limiter=None, controller=None, retry=None, instrumentation=None):
+        """
+        transport に PooledSafeTransport などを渡すと、接続を使い回して API を呼び出す
+        cache に MasterDataCache を渡すと、マスタデータの取得結果をキャッシュする
+        lazy を True にすると、課題のネストしたフィールドをアクセスされるまで変換しない (LazyIssue)
+        compact を True にすると、戻り値を __slots__ で状態を持つ compact モジュールのクラスにする
+        uri を渡すと、space / domain から組み立てる代わりにその接続先を使う (fakeserver など)
+        limiter に RateLimiter を渡すと、参照系と更新系の呼び出しをそれぞれの rate 以下に抑える
+        controller に AIMDController を渡すと、応答時間とエラーに応じて同時に実行する呼び出しの数を調整する
+        retry に RetryPolicy を渡すと、一時的な通信エラーで失敗した呼び出しをやり直す
+        instrumentation に Instrumentation を渡すと、XML-RPC のメソッドごとの所要時間などを記録する
+        """
+        if lazy and compact:
+            raise ValueError("lazy and compact cannot be used together")
+        if uri is None:
+            uri = _URI_FORMAT_ % {"username": username, "password": password, "space": space, "domain": domain}
         Transport.user_agent = 'backloglib/%s' % __version__
-        self.server = ServerProxy(uri)
+        self.transport = transport
+        self.models = _MODELS_[bool(compact)]
+        self._issue_class = LazyIssue if lazy else self.models.Issue
+        self.server = BacklogServerProxy(uri, transport=transport, cache=cache, limiter=limiter,
+                                         controller=controller, retry=retry, instrumentation=instrumentation)
+        self.server.factories.update(self._factories())
+        if instrumentation is not None:
+            self._instrument(instrumentation)
+
+    def _instrument(self, instrumentation):
+        # モデルオブジェクトへの変換も計測するため、公開メソッドをこのインスタンスに限って置き換える。
+        # ジェネレータは呼び出し側が要素を取り出す時間を含んでしまうため置き換えない
+        for name in dir(self.__class__):
+            method = getattr(self.__class__, name)
+            if name.startswith("_") or not inspect.ismethod(method) or inspect.isgeneratorfunction(method):
+                continue
+            setattr(self, name, instrumentation.wrap(getattr(self, name)))
+
+    def _factories(self):
+        """
+        レスポンスを解析しながらモデルオブジェクトに変換するメソッドと、そのクラス。
+        これらのメソッドの戻り値は dict とモデルオブジェクトのどちらにもなるため classwrap で受け取る
+        """
+        return {}
+
+    def _max_workers(self, max_workers=None):
+        """
+        並列に API を呼び出せる数を返す。
+        標準の Transport はスレッドから同時に使えないため、PooledTransport 以外では常に 1 となる
+        """
+        if not isinstance(self.transport, PooledTransport):
+            return 1
+        if max_workers is None:
+            return self.transport.pool_size
+        return max(1, min(max_workers, self.transport.pool_size))
 
 
 class Backlog(BacklogBase):
@@ -51,37 +135,75 @@ class Backlog(BacklogBase):
     @since: 0.1.1 (Backlog R2009-01-30)
     """
 
+    def _factories(self):
+        return {"backlog.findIssue": self._issue_class,
+                "backlog.getComments": self.models.Comment,
+                "backlog.getTimeline": self.models.Timeline,
+                "backlog.getProjectSummaries": self.models.ProjectSummary}
+
     def get_projects(self):
         projects = self.server.backlog.getProjects()
-        return [Project(**x) for x in projects]
+        return [self.models.Project(**x) for x in projects]
 
     def get_project(self, key):
         project = self.server.backlog.getProject(key)
-        return Project(**project)
+        return self.models.Project(**project)
 
     def get_components(self, project_id):
         components = self.server.backlog.getComponents(project_id)
-        return [Component(**x) for x in components]
+        return [self.models.Component(**x) for x in components]
 
     def get_versions(self, project_id):
         versions = self.server.backlog.getVersions(project_id)
-        return [Version(**x) for x in versions]
+        return [self.models.Version(**x) for x in versions]
 
     def get_users(self, project_id):
         users = self.server.backlog.getUsers(project_id)
-        return [User(**x) for x in users]
+        return [self.models.User(**x) for x in users]
 
     def get_issue_types(self, project_id):
         issue_types = self.server.backlog.getIssueTypes(project_id)
-        return [IssueType(**v) for v in issue_types]
+        return [self.models.IssueType(**v) for v in issue_types]
 
     def get_issue(self, key):
         issue = self.server.backlog.getIssue(key)
-        return Issue(**issue)
+        return self._issue_class(**issue)
 
     def get_comments(self, issue_id):
         comments = self.server.backlog.getComments(issue_id)
-        return [Comment(**x) for x in comments]
+        return [classwrap(x, self.models.Comment) for x in comments]
+
+    def batch(self, chunk_size=50, max_workers=None):
+        """
+        get_issue / get_comments / get_user を system.multicall でまとめて呼び出す Batch を返す
+
+        @since: 0.3.0
+        """
+        return Batch(self, chunk_size=chunk_size, max_workers=max_workers)
+
+    def get_issues(self, keys, chunk_size=50):
+        """
+        keys の各課題を system.multicall でまとめて取得する。
+        keys と同じ順序で、取得できた課題は Issue を、失敗した課題は Fault を返す
+
+        @since: 0.3.0
+        """
+        batch = self.batch(chunk_size=chunk_size)
+        for key in keys:
+            batch.get_issue(key)
+        return [x.fault or x.value for x in batch.execute()]
+
+    def get_comments_many(self, issue_ids, chunk_size=50):
+        """
+        issue_ids の各課題のコメントを system.multicall でまとめて取得する。
+        issue_ids と同じ順序で、取得できた課題は Comment のリストを、失敗した課題は Fault を返す
+
+        @since: 0.3.0
+        """
+        batch = self.batch(chunk_size=chunk_size)
+        for issue_id in issue_ids:
+            batch.get_comments(issue_id)
+        return [x.fault or x.value for x in batch.execute()]
 
     def count_issue(self, condition):
         if not isinstance(condition, FindCondition):
@@ -92,22 +214,205 @@ class Backlog(BacklogBase):
         if not isinstance(condition, FindCondition):
             condition = FindCondition(condition)
         issues = self.server.backlog.findIssue(condition.serialize())
-        return [Issue(**x) for x in issues]
+        return [classwrap(x, self._issue_class) for x in issues]
+
+    def find_issue_stream(self, condition):
+        """
+        find_issue と同じ検索を行い、課題をレスポンスの受信・解析が済んだものから順に返すジェネレータ。
+        PooledTransport を利用している場合は、レスポンス全体を dict のリストとして保持しない
+
+        @since: 0.3.0
+        """
+        if not isinstance(condition, FindCondition):
+            condition = FindCondition(condition)
+        return self.server.stream("backlog.findIssue", (condition.serialize(),))
+
+    def find_issue_batch(self, condition, page_size=None):
+        """
+        find_issue と同じ検索を行い、結果を属性ごとの NumPy の配列を持つ IssueBatch で返す (numpy が必要)。
+        page_size (100 以下) を指定すると、condition に一致する課題を offset / limit でページごとに全て取得する。
+        レスポンスを解析しながら列に追加するため、Issue は作らない
+
+        @since: 0.3.0
+        """
+        if page_size is not None:
+            check_page_size(page_size)
+        if not isinstance(condition, FindCondition):
+            condition = FindCondition(condition)
+        params = condition.serialize()
+        builder = columnar.IssueBatchBuilder()
+        if page_size is None:
+            for x in self.server.stream("backlog.findIssue", (params,), factory=builder.factory):
+                pass
+            return builder.build()
+        offset = params.get("offset", 0)
+        remaining = params.get("limit")
+        while remaining is None or remaining > 0:
+            size = page_size if remaining is None else min(page_size, remaining)
+            before = len(builder)
+            page_params = dict(params, offset=offset, limit=size)
+            for x in self.server.stream("backlog.findIssue", (page_params,), factory=builder.factory):
+                pass
+            fetched = len(builder) - before
+            offset += fetched
+            if remaining is not None:
+                remaining -= fetched
+            if fetched < size:
+                break
+        return builder.build()
+
+    def iter_issues(self, condition, page_size=100, comments=False, comments_chunk=20, max_in_flight=None):
+        """
+        condition に一致する課題を offset / limit でページごとに取得し、1 件ずつ返すジェネレータ。
+        PooledTransport を利用している場合は、呼び出し側が現在のページを処理している間に
+        次のページを先読みする。
+        condition に offset / limit がある場合は、取得の開始位置と全体の最大件数として扱う。
+        page_size は findIssue の上限の 100 以下とする。
+
+        comments を True にすると、各課題の comments 属性にコメントのリストを設定して返す。
+        コメントは comments_chunk 件の課題ごとに system.multicall でまとめ、最大 max_in_flight 組を並列に取得する。
+        取得済みで未だ返していないコメントも含め、保持するのは max_in_flight 組までとなる
+
+        @since: 0.3.0
+        """
+        issues = self._iter_issues(condition, page_size)
+        if comments:
+            issues = self._with_comments(issues, comments_chunk, self._max_workers(max_in_flight))
+        for issue in issues:
+            yield issue
+
+    def _with_comments(self, issues, chunk_size, max_in_flight):
+        start = spawn if max_in_flight > 1 else inline
+        pending = deque()
+        chunk = []
+        while 1:
+            issue = next(issues, None)
+            if issue is not None:
+                chunk.append(issue)
+            if chunk and (len(chunk) >= chunk_size or issue is None):
+                pending.append((chunk, start(self.get_comments_many, [x.id for x in chunk], chunk_size)))
+                chunk = []
+            # 取得中のものが上限に達したか入力が尽きたら、先頭の組の完了を待って返す
+            while pending and (len(pending) >= max_in_flight or issue is None):
+                chunk_issues, future = pending.popleft()
+                for x, comments in zip(chunk_issues, future.result()):
+                    if isinstance(comments, Fault):
+                        raise comments
+                    _attach_comments(x, comments)
+                    yield x
+            if issue is None:
+                return
+
+    def _iter_issues(self, condition, page_size):
+        check_page_size(page_size)
+        if not isinstance(condition, FindCondition):
+            condition = FindCondition(condition)
+        params = condition.serialize()
+        offset = params.get("offset", 0)
+        remaining = params.get("limit")
+
+        def fetch(offset, limit):
+            page_params = dict(params)
+            page_params["offset"] = offset
+            page_params["limit"] = limit
+            return self.server.backlog.findIssue(page_params)
+
+        start = spawn if self._max_workers() > 1 else inline
+
+        size = page_size if remaining is None else min(page_size, remaining)
+        future = start(fetch, offset, size) if size > 0 else None
+        while future:
+            page = future.result()
+            offset += len(page)
+            if remaining is not None:
+                remaining -= len(page)
+            if len(page) < size or remaining == 0:
+                future = None
+            else:
+                size = page_size if remaining is None else min(page_size, remaining)
+                future = start(fetch, offset, size)
+            # 返したものから順に手放せるよう、末尾から取り出す
+            page.reverse()
+            while page:
+                yield classwrap(page.pop(), self._issue_class)
+
+    def find_issue_parallel(self, condition, page_size=100, max_workers=None):
+        """
+        count_issue で件数を求めてから offset / limit の区間に分割し、各区間を並列に取得する。
+        結果は find_issue と同じく sort / order に従った順序で返す。
+        並列数は max_workers と PooledTransport の pool_size の小さい方となる。
+        page_size は findIssue の上限の 100 以下とする。いずれかの区間の取得に失敗した場合は、
+        未だ開始していない区間を取得せずにその例外を送出する。
+
+        @since: 0.3.0
+        """
+        check_page_size(page_size)
+        if not isinstance(condition, FindCondition):
+            condition = FindCondition(condition)
+        params = condition.serialize()
+        offset = params.get("offset", 0)
+        count_params = dict([(k, v) for k, v in params.iteritems() if k not in ("offset", "limit", "sort", "order")])
+        end = self.server.backlog.countIssue(count_params)
+        if params.get("limit") is not None:
+            end = min(end, offset + params["limit"])
+
+        failed = threading.Event()
+
+        def fetch(window):
+            # 他の区間が失敗していれば、結果は使われないため呼び出さない
+            if failed.isSet():
+                return []
+            page_params = dict(params)
+            page_params["offset"], page_params["limit"] = window
+            try:
+                return self.server.backlog.findIssue(page_params)
+            except:
+                failed.set()
+                raise
+
+        windows = [(x, min(page_size, end - x)) for x in range(offset, end, page_size)]
+        pool = WorkerPool(self._max_workers(max_workers))
+        try:
+            pages = pool.map(fetch, windows)
+        finally:
+            pool.shutdown(wait=False)
+        return [classwrap(x, self._issue_class) for page in pages for x in page]
 
     def create_issue(self, issue):
         issue = classwrap(issue, AddIssue)
         ret = self.server.backlog.createIssue(issue.serialize())
-        return Issue(**ret)
+        return self._issue_class(**ret)
+
+    def create_issues(self, issues, max_in_flight=None, checkpoint=None):
+        """
+        issues (dict か AddIssue の iterable) を最大 max_in_flight 件ずつ並列に登録し、
+        入力と同じ順序で、登録した課題か失敗の理由を持つ BulkResult のリストを返す。
+        checkpoint にファイルのパスを渡すと、再実行時に登録済みの入力を省く
+
+        @since: 0.3.0
+        """
+        return bulk.create_issues(self, issues, max_in_flight=self._max_workers(max_in_flight),
+                                  checkpoint=checkpoint)
+
+    def update_issues(self, updates, max_in_flight=None):
+        """
+        updates (UpdateIssue / UpdateStatus か、それらの dict の iterable) を、課題キーごとに入力の順で、
+        異なる課題キーは最大 max_in_flight 件ずつ並列に実行する。
+        同じ課題キーへの連続した更新は 1 回の呼び出しにまとめ、入力ごとの結果と処理件数を持つ BulkReport を返す
+
+        @since: 0.3.0
+        """
+        return bulk.update_issues(self, updates, max_in_flight=self._max_workers(max_in_flight))
 
     def update_issue(self, issue):
         issue = classwrap(issue, UpdateIssue)
         ret = self.server.backlog.updateIssue(issue.serialize())
-        return Issue(**ret)
+        return self._issue_class(**ret)
 
     def switch_status(self, status):
         status = classwrap(status, UpdateStatus)
         ret = self.server.backlog.switchStatus(status.serialize())
-        return Issue(**ret)
+        return self._issue_class(**ret)
 
     def add_issue_type(self, issueType):
         """
@@ -115,15 +420,15 @@ class Backlog(BacklogBase):
         """
         issueType = classwrap(issueType, AddIssueType)
         ret = self.server.backlog.addIssueType(issueType.serialize())
-        return IssueType(**ret)
+        return self.models.IssueType(**ret)
 
     def update_issue_type(self, issueType):
         """
         @since: 0.2.1 (Backlog R2010-03-31)
         """
-        issueType = classwrap(issueType, IssueType)
+        issueType = classwrap(issueType, self.models.IssueType)
         ret = self.server.backlog.updateIssueType(issueType.serialize())
-        return IssueType(**ret)
+        return self.models.IssueType(**ret)
 
     def delete_issue_type(self, id, substitute_id=None):
         """
@@ -133,7 +438,7 @@ class Backlog(BacklogBase):
         if substitute_id:
             args["substitute_id"] = substitute_id
         ret = self.server.backlog.deleteIssueType(args)
-        return IssueType(**ret)
+        return self.models.IssueType(**ret)
 
     def add_version(self, version):
         """
@@ -141,22 +446,22 @@ class Backlog(BacklogBase):
         """
         version = classwrap(version, AddVersion)
         ret = self.server.backlog.addVersion(version.serialize())
-        return UpdateVersion(**ret)
+        return self.models.UpdateVersion(**ret)
 
     def update_version(self, version):
         """
         @since: 0.2.1 (Backlog R2010-03-31)
         """
-        version = classwrap(version, UpdateVersion)
+        version = classwrap(version, self.models.UpdateVersion)
         ret = self.server.backlog.updateVersion(version.serialize())
-        return UpdateVersion(**ret)
+        return self.models.UpdateVersion(**ret)
 
     def delete_version(self, id):
         """
         @since: 0.2.1 (Backlog R2010-03-31)
         """
         ret = self.server.backlog.deleteVersion(id)
-        return UpdateVersion(**ret)
+        return self.models.UpdateVersion(**ret)
 
     def add_component(self, component):
         """
@@ -164,36 +469,44 @@ class Backlog(BacklogBase):
         """
         component = classwrap(component, AddComponent)
         ret = self.server.backlog.addComponent(component.serialize())
-        return Component(**ret)
+        return self.models.Component(**ret)
 
     def update_component(self, component):
         """
         @since: 0.2.1 (Backlog R2010-03-31)
         """
-        component = classwrap(component, Component)
+        component = classwrap(component, self.models.Component)
         ret = self.server.backlog.updateComponent(component.serialize())
-        return Component(**ret)
+        return self.models.Component(**ret)
 
     def delete_component(self, id):
         """
         @since: 0.2.1 (Backlog R2010-03-31)
         """
         ret = self.server.backlog.deleteComponent(id)
-        return Component(**ret)
+        return self.models.Component(**ret)
 
     def get_timeline(self):
         """
         @since: 0.2.1 (Backlog R2010-10-28)        
         """
         ret = self.server.backlog.getTimeline()
-        return [Timeline(**x) for x in ret]
+        return [classwrap(x, self.models.Timeline) for x in ret]
+
+    def get_timeline_stream(self):
+        """
+        get_timeline と同じ結果を、レスポンスの受信・解析が済んだものから順に返すジェネレータ
+
+        @since: 0.3.0
+        """
+        return self.server.stream("backlog.getTimeline", ())
 
     def get_activity_types(self):
         """
         @since: 0.2.1 (Backlog R2010-10-28)        
         """
         ret = self.server.backlog.getActivityTypes();
-        return [ActivityType(**x) for x in ret]
+        return [self.models.ActivityType(**x) for x in ret]
 
     def add_comment(self, comment):
         """
@@ -201,56 +514,56 @@ class Backlog(BacklogBase):
         """
         comment = classwrap(comment, AddComment)
         ret = self.server.backlog.addComment(comment.serialize())
-        return Comment(**ret)
+        return self.models.Comment(**ret)
 
     def get_project_summary(self, project_id):
         """
         @since: 0.2.1 (Backlog R2010-10-28)        
         """
         ret = self.server.backlog.getProjectSummary(project_id)
-        return ProjectSummary(**ret)
+        return self.models.ProjectSummary(**ret)
 
     def get_project_summaries(self):
         """
         @since: 0.2.1 (Backlog R2010-10-28)        
         """
         ret = self.server.backlog.getProjectSummaries()
-        return [ProjectSummary(**x) for x in ret]
+        return [classwrap(x, self.models.ProjectSummary) for x in ret]
 
     def get_user(self, user_id):
         """
         @since: 0.2.1 (Backlog R2010-10-28)        
         """
         ret = self.server.backlog.getUser(user_id)
-        return DetailUser(**ret)
+        return self.models.DetailUser(**ret)
 
     def get_user_icon(self, user_id):
         """
         @since: 0.2.1 (Backlog R2010-10-28)        
         """
         ret = self.server.backlog.getUserIcon(user_id)
-        return UserIcon(**ret)
+        return self.models.UserIcon(**ret)
 
     def get_statuses(self):
         """
         @since: 0.2.1 (Backlog R2010-10-28)        
         """
         statuses = self.server.backlog.getStatuses()
-        return [Status(**x) for x in statuses]
+        return [self.models.Status(**x) for x in statuses]
 
     def get_resolutions(self):
         """
         @since: 0.2.1 (Backlog R2010-10-28)        
         """
         resolutions = self.server.backlog.getResolutions()
-        return [Resolution(**x) for x in resolutions]
+        return [self.models.Resolution(**x) for x in resolutions]
 
     def get_priorities(self):
         """
         @since: 0.2.1 (Backlog R2010-10-28)        
         """
         priorities = self.server.backlog.getPriorities()
-        return [Priority(**x) for x in priorities]
+        return [self.models.Priority(**x) for x in priorities]
 
 
 class BacklogAdmin(BacklogBase):
@@ -264,18 +577,22 @@ class BacklogAdmin(BacklogBase):
     ROLE_GUEST_REPORTER = "guest-reporter"
     ROLE_GUEST_VIEWER = "guest-viewer"
 
+    def _factories(self):
+        return {"backlog.admin.getUsers": self.models.AdminUser,
+                "backlog.admin.getProjectUsers": self.models.AdminProjectUser}
+
     def get_users(self):
         users = self.server.backlog.admin.getUsers()
-        return [AdminUser(**x) for x in users]
+        return [classwrap(x, self.models.AdminUser) for x in users]
 
     def add_user(self, user):
         user = classwrap(user, AdminAddUser)
         ret = self.server.backlog.admin.addUser(user.serialize())
-        return AdminUser(**ret)
+        return self.models.AdminUser(**ret)
 
     def update_user(self, user):
-        if isinstance(user, AdminUser):
-            user = vars(user)
+        if isinstance(user, (AdminUser, compact.AdminUser)):
+            user = vars(user) if isinstance(user, AdminUser) else user.__getstate__()
             del user["created_on"]
             del user["updated_on"]
             del user["user_id"]
@@ -283,24 +600,24 @@ class BacklogAdmin(BacklogBase):
         elif not isinstance(user, AdminUpdateUser):
             user = AdminUpdateUser(**user)
         ret = self.server.backlog.admin.updateUser(user.serialize())
-        return AdminUser(**ret)
+        return self.models.AdminUser(**ret)
 
     def delete_user(self, id):
         user = self.server.backlog.admin.deleteUser(id)
-        return AdminUser(**user)
+        return self.models.AdminUser(**user)
 
     def get_projects(self):
         projects = self.server.backlog.admin.getProjects()
-        return [AdminProject(**x) for x in projects]
+        return [self.models.AdminProject(**x) for x in projects]
 
     def add_project(self, project):
         project = classwrap(project, AdminAddProject)
         ret = self.server.backlog.admin.addProject(project.serialize())
-        return AdminProject(**ret)
+        return self.models.AdminProject(**ret)
 
     def update_project(self, project):
-        if isinstance(project, AdminProject):
-            project = vars(project)
+        if isinstance(project, (AdminProject, compact.AdminProject)):
+            project = vars(project) if isinstance(project, AdminProject) else project.__getstate__()
             del project["created_on"]
             del project["updated_on"]
             del project["url"]
@@ -308,27 +625,51 @@ class BacklogAdmin(BacklogBase):
         elif not isinstance(project, AdminUpdateProject):
             project = AdminUpdateProject(**project)
         ret = self.server.backlog.admin.updateProject(project.serialize())
-        return AdminProject(**ret)
+        return self.models.AdminProject(**ret)
 
     def delete_project(self, id):
         ret = self.server.backlog.admin.deleteProject(id)
-        return AdminProject(**ret)
+        return self.models.AdminProject(**ret)
 
     def get_project_users(self, project_id):
         ret = self.server.backlog.admin.getProjectUsers(project_id)
-        return [AdminProjectUser(**x) for x in ret]
+        return [classwrap(x, self.models.AdminProjectUser) for x in ret]
 
     def add_project_user(self, project_user):
         project_user = classwrap(project_user, AdminAddProjectUser)
         ret = self.server.backlog.admin.addProjectUser(project_user.serialize())
-        return [AdminProjectUser(**x) for x in ret]
+        return [self.models.AdminProjectUser(**x) for x in ret]
 
     def update_project_users(self, project_users):
         project_users = classwrap(project_users, AdminUpdateProjectUsers)
         ret = self.server.backlog.admin.updateProjectUsers(project_users.serialize())
-        return [AdminProjectUser(**x) for x in ret]
+        return [self.models.AdminProjectUser(**x) for x in ret]
 
     def delete_project_user(self, project_user):
         project_user = classwrap(project_user, AdminAddProjectUser)
         ret = self.server.backlog.admin.deleteProjectUser(project_user.serialize())
-        return [AdminProjectUser(**x) for x in ret]
+        return [self.models.AdminProjectUser(**x) for x in ret]
+
+    def sync_project_members(self, project_id, user_ids, dry_run=False):
+        """
+        プロジェクトユーザを user_ids (ユーザの id) と一致させる。現在のユーザとの差分が 1 件であれば
+        add_project_user / delete_project_user を、2 件以上であれば update_project_users を 1 回だけ呼び出し、
+        追加・削除したユーザを持つ MembershipResult を返す。dry_run の場合は差分を求めるだけで変更しない
+
+        @since: 0.3.0
+        """
+        return bulk.sync_project_members(self, project_id, user_ids, dry_run=dry_run)
+
+    def sync_all_project_members(self, members, max_workers=None, dry_run=False):
+        """
+        members (プロジェクトの id とユーザの id のリストの dict) の全てのプロジェクトを並列に
+        sync_project_members で同期し、プロジェクトの id の順に MembershipResult のリストを返す。
+        members にないプロジェクトは変更しない
+
+        @since: 0.3.0
+        """
+        return bulk.sync_all_project_members(self, members, max_workers=self._max_workers(max_workers),
+                                             dry_run=dry_run)
+
+
+from nonblocking import AsyncBacklog, AsyncBacklogAdmin
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+"""
+参照系の API 呼び出しを system.multicall でまとめて送るためのモジュールです。
+
+    with backlog.batch() as batch:
+        issue = batch.get_issue("ZAKU-1")
+        comments = batch.get_comments(472153)
+    print issue.value, comments.value
+
+サーバが system.multicall を受け付けない場合は、個別の呼び出しを並列に実行します。
+"""
+from xmlrpclib import Fault
+
+from utils import classwrap
+from workers import WorkerPool
+
+# メソッドが存在しないことを表す faultCode (XML-RPC の仕様の拡張で定められたもの)
+METHOD_NOT_FOUND = -32601
+
+_CONVERTERS_ = {
+    "backlog.getIssue": lambda backlog, x: classwrap(x, backlog._issue_class),
+    "backlog.getComments": lambda backlog, x: [classwrap(c, backlog.models.Comment) for c in x],
+    "backlog.getUser": lambda backlog, x: classwrap(x, backlog.models.DetailUser),
+}
+
+
+class BatchResult(object):
+    """
+    バッチ内の 1 件の呼び出しの結果。execute の後に value か fault のどちらかが設定される
+    """
+
+    def __init__(self, backlog, method, params):
+        self.backlog = backlog
+        self.method = method
+        self.params = params
+        self.fault = None
+        self._value = None
+
+    def _set(self, raw):
+        if isinstance(raw, Fault):
+            self.fault = raw
+        else:
+            self._value = _CONVERTERS_[self.method](self.backlog, raw)
+
+    @property
+    def value(self):
+        """
+        変換済みのモデルオブジェクト。呼び出しが失敗していた場合は Fault を送出する
+        """
+        if self.fault:
+            raise self.fault
+        return self._value
+
+    def __repr__(self):
+        return "%s%r -> %r" % (self.method, self.params, self.fault or self._value)
+
+
+class Batch(object):
+    """
+    呼び出しを溜めておき、execute で chunk_size 件ずつ system.multicall にまとめて送る
+    """
+
+    def __init__(self, backlog, chunk_size=50, max_workers=None):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be positive : %s" % chunk_size)
+        self.backlog = backlog
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.results = []
+
+    def get_issue(self, key):
+        return self._add("backlog.getIssue", key)
+
+    def get_comments(self, issue_id):
+        return self._add("backlog.getComments", issue_id)
+
+    def get_user(self, user_id):
+        return self._add("backlog.getUser", user_id)
+
+    def execute(self):
+        """
+        溜めた呼び出しを送信し、呼び出し順の BatchResult のリストを返す
+        """
+        results, self.results = self.results, []
+        chunks = [results[i:i + self.chunk_size] for i in range(0, len(results), self.chunk_size)]
+        pool = WorkerPool(self.backlog._max_workers(self.max_workers))
+        try:
+            if self.backlog.multicall_supported:
+                try:
+                    pool.map(self._multicall, chunks)
+                    return results
+                except Fault, e:
+                    # 認証エラーなど他の Fault で個別の呼び出しに切り替えると以降の全ての呼び出しが遅くなるため、
+                    # system.multicall が無い場合に限る
+                    if not _is_method_not_found(e):
+                        raise
+                    self.backlog.multicall_supported = False
+            pool.map(self._single_call, results)
+            return results
+        finally:
+            pool.shutdown(wait=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.execute()
+
+    def _add(self, method, *params):
+        result = BatchResult(self.backlog, method, params)
+        self.results.append(result)
+        return result
+
+    def _multicall(self, chunk):
+        calls = [{"methodName": x.method, "params": list(x.params)} for x in chunk]
+        responses = self.backlog.server.system.multicall(calls)
+        for result, response in zip(chunk, responses):
+            if isinstance(response, dict):
+                result._set(Fault(response["faultCode"], response["faultString"]))
+            else:
+                result._set(response[0])
+
+    def _single_call(self, result):
+        try:
+            raw = getattr(self.backlog.server, result.method)(*result.params)
+        except Fault, e:
+            raw = e
+        result._set(raw)
+
+
+def _is_method_not_found(fault):
+    return fault.faultCode == METHOD_NOT_FOUND or "system.multicall" in (fault.faultString or "")
@@ -0,0 +1,402 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+"""
+大量の課題をまとめて登録・更新するためのモジュールです。
+
+    results = backlog.create_issues(read_issues(), max_in_flight=8, checkpoint="/tmp/import.ckpt")
+    for result in results:
+        if not result.ok:
+            print result.index, result.fault or result.error
+
+    report = backlog.update_issues([UpdateIssue("ZAKU-1", milestoneId=3), {"key": "ZAKU-2", "statusId": 4, ...}])
+    print report.throughput, report.failed
+
+    results = admin.sync_all_project_members({1: [10, 11, 12], 2: [10]})
+
+入力は 1 件ずつ AddIssue で検証してから、最大 max_in_flight 件を並列に createIssue で登録します。
+createIssue は冪等ではないため system.multicall にはまとめず、1 件ずつの呼び出しとしています。
+
+checkpoint を指定すると、登録できた入力の位置と課題の id / key をファイルに追記し、
+同じ入力で再実行した場合はそれらを登録せずに skipped として返します。
+登録の直後、チェックポイントへの書き込みまでの間に中断した課題は、再実行で二重に登録されます。
+
+update_issues は同じ課題キーへの更新を入力の順に 1 件ずつ実行し、異なる課題キーの更新を並列に実行します。
+同じ課題キーへの連続した UpdateIssue 同士 (UpdateStatus 同士) は、後の値で上書きした 1 回の呼び出しにまとめます。
+ただし、コメントを持つもの同士はコメントが失われるためまとめません。
+ある更新が失敗した場合、同じ課題キーへのそれ以降の更新は行いません。
+
+sync_project_members は現在のプロジェクトユーザとの差分を求め、変更が 1 件であれば
+addProjectUser / deleteProjectUser を、2 件以上であれば updateProjectUsers を 1 回だけ呼び出します。
+"""
+import copy
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from xmlrpclib import Fault
+
+from models import AddIssue, AdminAddProjectUser, AdminUpdateProjectUsers, UpdateIssue, UpdateStatus
+from utils import classwrap
+from workers import WorkerPool
+
+
+class BulkResult(object):
+    """
+    入力 1 件の処理の結果。issue、fault、error のいずれかが設定される。
+    チェックポイントにより登録を省いた場合は skipped が True で、id と key だけが設定される
+    """
+
+    def __init__(self, index, params):
+        self.index = index
+        self.params = params
+        self.issue = None
+        self.fault = None
+        self.error = None
+        self.skipped = False
+        self.id = None
+        self.key = None
+
+    @property
+    def ok(self):
+        return self.fault is None and self.error is None
+
+    @property
+    def value(self):
+        """
+        登録した課題。失敗していた場合はその例外を送出する
+        """
+        if self.fault:
+            raise self.fault
+        if self.error:
+            raise self.error
+        return self.issue
+
+    def __repr__(self):
+        if self.skipped:
+            return "[%d] skipped %s" % (self.index, self.key)
+        return "[%d] -> %r" % (self.index, self.fault or self.error or self.issue)
+
+
+class Checkpoint(object):
+    """
+    登録できた入力の位置を 1 行ずつ JSON で記録するファイル
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._done = {}
+        line = "\n"
+        if os.path.exists(path):
+            f = open(path)
+            try:
+                for line in f:
+                    # 書き込み途中で中断した最後の行は無視する
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self._done[entry["index"]] = (entry["id"], entry["key"])
+            finally:
+                f.close()
+        self._file = open(path, "a")
+        if not line.endswith("\n"):
+            self._file.write("\n")
+        self._lock = threading.Lock()
+
+    def get(self, index):
+        """
+        index の入力が登録済みであれば (id, key) を、そうでなければ None を返す
+        """
+        return self._done.get(index)
+
+    def record(self, index, issue):
+        line = json.dumps({"index": index, "id": issue.id, "key": issue.key}) + "\n"
+        self._lock.acquire()
+        try:
+            self._done[index] = (issue.id, issue.key)
+            self._file.write(line)
+            self._file.flush()
+        finally:
+            self._lock.release()
+
+    def close(self):
+        self._file.close()
+
+
+def create_issues(backlog, issues, max_in_flight=1, checkpoint=None):
+    """
+    issues (dict か AddIssue の iterable) を backlog に登録し、入力の順に BulkResult のリストを返す
+    """
+    if max_in_flight < 1:
+        raise ValueError("max_in_flight must be positive : %s" % max_in_flight)
+    own_checkpoint = isinstance(checkpoint, basestring)
+    if own_checkpoint:
+        checkpoint = Checkpoint(checkpoint)
+
+    def create(result, issue):
+        try:
+            result.issue = backlog.create_issue(issue)
+        except Fault, e:
+            result.fault = e
+        except Exception, e:
+            result.error = e
+        else:
+            result.id = result.issue.id
+            result.key = result.issue.key
+            if checkpoint is not None:
+                checkpoint.record(result.index, result.issue)
+
+    results = []
+    pool = WorkerPool(max_in_flight) if max_in_flight > 1 else None
+    # 入力を全て読み込まずに済むよう、実行中の件数が max_in_flight に達したら完了を待つ
+    slots = threading.BoundedSemaphore(max_in_flight)
+    try:
+        for index, params in enumerate(issues):
+            result = BulkResult(index, params)
+            results.append(result)
+            done = checkpoint and checkpoint.get(index)
+            if done:
+                result.skipped = True
+                result.id, result.key = done
+                continue
+            try:
+                issue = classwrap(params, AddIssue)
+            except Exception, e:
+                result.error = e
+                continue
+            if pool is None:
+                create(result, issue)
+                continue
+            slots.acquire()
+            pool.submit(create, result, issue).add_done_callback(lambda f: slots.release())
+        return results
+    finally:
+        if pool is not None:
+            # 入力の読み込みで例外が発生した場合も、実行中の全ての呼び出しの完了を待つ
+            for i in range(max_in_flight):
+                slots.acquire()
+            pool.shutdown(wait=False)
+        if own_checkpoint:
+            checkpoint.close()
+
+
+class BulkReport(object):
+    """
+    update_issues の結果。results は入力の順の BulkResult で、まとめて送った入力は同じ結果を持つ
+    """
+
+    def __init__(self, results, calls, elapsed):
+        self.results = results
+        # 実際に行った API 呼び出しの数と、全体にかかった秒数
+        self.calls = calls
+        self.elapsed = elapsed
+
+    @property
+    def failed(self):
+        return [x for x in self.results if not x.ok]
+
+    @property
+    def throughput(self):
+        """
+        1 秒あたりに処理した入力の数
+        """
+        return len(self.results) / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __repr__(self):
+        return "items=%d calls=%d failed=%d elapsed=%.2fs throughput=%.1f/s" % (
+            len(self.results), self.calls, len(self.failed), self.elapsed, self.throughput)
+
+
+# 文字列と id のどちらかで指定する BaseIssue の属性
+_ALTERNATIVES_ = {}
+for _pair in (("issueType", "issueTypeId"), ("component", "componentId"), ("version", "versionId"),
+              ("milestone", "milestoneId"), ("priority", "priorityId")):
+    _ALTERNATIVES_[_pair[0]] = _pair[1]
+    _ALTERNATIVES_[_pair[1]] = _pair[0]
+
+
+class _Update(object):
+    """
+    1 回の update_issue / switch_status の呼び出しと、それにまとめた入力の結果
+    """
+
+    def __init__(self, update, result):
+        self.update = copy.copy(update)
+        self.results = [result]
+
+    def merge(self, update, result):
+        if update.__class__ is not self.update.__class__ or (update.comment and self.update.comment):
+            return False
+        for k, v in vars(update).iteritems():
+            if v is not None:
+                setattr(self.update, k, v)
+                if k in _ALTERNATIVES_ and hasattr(self.update, _ALTERNATIVES_[k]):
+                    delattr(self.update, _ALTERNATIVES_[k])
+        self.results.append(result)
+        return True
+
+    def send(self, backlog):
+        try:
+            if isinstance(self.update, UpdateStatus):
+                issue = backlog.switch_status(self.update)
+            else:
+                issue = backlog.update_issue(self.update)
+        except Fault, e:
+            self.fail(fault=e)
+            return False
+        except Exception, e:
+            self.fail(error=e)
+            return False
+        for result in self.results:
+            result.issue = issue
+            result.id = issue.id
+            result.key = issue.key
+        return True
+
+    def fail(self, fault=None, error=None):
+        for result in self.results:
+            result.fault = fault
+            result.error = error
+
+
+def _to_update(payload):
+    if isinstance(payload, (UpdateIssue, UpdateStatus)):
+        return payload
+    if "statusId" in payload:
+        return UpdateStatus(**payload)
+    return UpdateIssue(**payload)
+
+
+def update_issues(backlog, updates, max_in_flight=1):
+    """
+    updates (UpdateIssue / UpdateStatus か、それらの dict の iterable) を課題キーごとにまとめて実行し、
+    BulkReport を返す。statusId を持つ dict は UpdateStatus として扱う
+    """
+    if max_in_flight < 1:
+        raise ValueError("max_in_flight must be positive : %s" % max_in_flight)
+    started = time.time()
+    results = []
+    plans = OrderedDict()
+    for index, payload in enumerate(updates):
+        result = BulkResult(index, payload)
+        results.append(result)
+        try:
+            update = _to_update(payload)
+        except Exception, e:
+            result.error = e
+            continue
+        calls = plans.setdefault(update.key, [])
+        if not calls or not calls[-1].merge(update, result):
+            calls.append(_Update(update, result))
+
+    def run(calls):
+        for i, call in enumerate(calls):
+            if not call.send(backlog):
+                error = RuntimeError("skipped because an earlier update of %s failed" % call.update.key)
+                for rest in calls[i + 1:]:
+                    rest.fail(error=error)
+                return
+
+    if max_in_flight > 1 and len(plans) > 1:
+        pool = WorkerPool(min(max_in_flight, len(plans)))
+        try:
+            pool.map(run, plans.values())
+        finally:
+            pool.shutdown(wait=False)
+    else:
+        for calls in plans.itervalues():
+            run(calls)
+    return BulkReport(results, sum([len(x) for x in plans.itervalues()]), time.time() - started)
+
+
+class MembershipResult(object):
+    """
+    sync_project_members の 1 プロジェクト分の結果
+
+    added, removed: 追加・削除したユーザの id
+    calls: 変更に使った API 呼び出しの数 (取得は含まない)
+    users: 変更後のプロジェクトユーザ。dry_run の場合は変更前のもの
+    """
+
+    def __init__(self, project_id):
+        self.project_id = project_id
+        self.added = []
+        self.removed = []
+        self.calls = 0
+        self.users = None
+        self.fault = None
+        self.error = None
+
+    @property
+    def ok(self):
+        return self.fault is None and self.error is None
+
+    @property
+    def changed(self):
+        return bool(self.added or self.removed)
+
+    def __repr__(self):
+        return "[%s] +%r -%r calls=%d%s" % (self.project_id, self.added, self.removed, self.calls,
+                                            " error=%r" % (self.fault or self.error) if not self.ok else "")
+
+
+def sync_project_members(admin, project_id, user_ids, dry_run=False):
+    """
+    プロジェクトユーザを user_ids (ユーザの id) と一致させ、MembershipResult を返す
+    """
+    result = MembershipResult(project_id)
+    try:
+        result.users = admin.get_project_users(project_id)
+        current = set([x.id for x in result.users])
+        desired = set(user_ids)
+        result.added = sorted(desired - current)
+        result.removed = sorted(current - desired)
+        if dry_run or not result.changed:
+            return result
+        if len(result.added) + len(result.removed) == 1:
+            # 1 件だけの変更は、その間に他で行われた変更を上書きしないよう個別の API で行う
+            change = AdminAddProjectUser(project_id, (result.added or result.removed)[0])
+            if result.added:
+                result.users = admin.add_project_user(change)
+            else:
+                result.users = admin.delete_project_user(change)
+        else:
+            result.users = admin.update_project_users(AdminUpdateProjectUsers(project_id, sorted(desired)))
+        result.calls = 1
+    except Fault, e:
+        result.fault = e
+    except Exception, e:
+        result.error = e
+    return result
+
+
+def sync_all_project_members(admin, members, max_workers=1, dry_run=False):
+    """
+    members (プロジェクトの id とユーザの id のリストの dict) の各プロジェクトを並列に同期し、
+    プロジェクトの id の順に MembershipResult のリストを返す
+    """
+    project_ids = sorted(members)
+    sync = lambda project_id: sync_project_members(admin, project_id, members[project_id], dry_run)
+    if max_workers > 1 and len(project_ids) > 1:
+        pool = WorkerPool(min(max_workers, len(project_ids)))
+        try:
+            return pool.map(sync, project_ids)
+        finally:
+            pool.shutdown(wait=False)
+    return [sync(x) for x in project_ids]
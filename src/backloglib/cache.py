@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+"""
+ほとんど変更されないマスタデータ (状態、優先度、カテゴリ、バージョンなど) の API 呼び出し結果を
+キャッシュするモジュールです。
+
+    cache = MasterDataCache(SqliteBackend("/tmp/backlog-cache.db"), ttls={"backlog.getUsers": 60})
+    backlog = Backlog("space", "username", "password", cache=cache)
+
+キャッシュするのは XML-RPC のレスポンスそのもので、モデルオブジェクトは呼び出しの度に作られます。
+カテゴリやユーザなどの結果はユーザの権限で変わるため、SPACE_WIDE 以外のメソッドのエントリは
+接続先とユーザ名の組 (namespace) ごとに分けて保持します。
+カテゴリの追加など対応する更新系の API を呼び出すと、同じ接続先の全てのユーザの該当するメソッドのエントリが破棄されます。
+"""
+import cPickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# XML-RPC のメソッド名ごとのキャッシュの有効期間 (秒)
+DEFAULT_TTLS = {
+    "backlog.getStatuses": 3600,
+    "backlog.getPriorities": 3600,
+    "backlog.getResolutions": 3600,
+    "backlog.getActivityTypes": 3600,
+    "backlog.getIssueTypes": 600,
+    "backlog.getComponents": 600,
+    "backlog.getVersions": 600,
+    "backlog.getUsers": 600,
+}
+
+# ユーザの権限によらずスペースで共通の結果を返すメソッド。これらのエントリはユーザ間で共有する
+SPACE_WIDE = frozenset([
+    "backlog.getStatuses",
+    "backlog.getPriorities",
+    "backlog.getResolutions",
+    "backlog.getActivityTypes",
+])
+
+# 更新系のメソッドと、その呼び出しで破棄するメソッド
+INVALIDATIONS = {
+    "backlog.addIssueType": ["backlog.getIssueTypes"],
+    "backlog.updateIssueType": ["backlog.getIssueTypes"],
+    "backlog.deleteIssueType": ["backlog.getIssueTypes"],
+    "backlog.addVersion": ["backlog.getVersions"],
+    "backlog.updateVersion": ["backlog.getVersions"],
+    "backlog.deleteVersion": ["backlog.getVersions"],
+    "backlog.addComponent": ["backlog.getComponents"],
+    "backlog.updateComponent": ["backlog.getComponents"],
+    "backlog.deleteComponent": ["backlog.getComponents"],
+    "backlog.admin.addUser": ["backlog.getUsers"],
+    "backlog.admin.updateUser": ["backlog.getUsers"],
+    "backlog.admin.deleteUser": ["backlog.getUsers"],
+    "backlog.admin.addProjectUser": ["backlog.getUsers"],
+    "backlog.admin.updateProjectUsers": ["backlog.getUsers"],
+    "backlog.admin.deleteProjectUser": ["backlog.getUsers"],
+}
+
+
+class MemoryBackend(object):
+    """
+    プロセス内で保持するバックエンド。max_entries を超えると最も使われていないものから破棄する
+    """
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        (見つかったかどうか, 値) を返す
+        """
+        self._lock.acquire()
+        try:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return False, None
+            if entry[0] < time.time():
+                return False, None
+            self._entries[key] = entry
+            return True, entry[1]
+        finally:
+            self._lock.release()
+
+    def set(self, key, value, ttl):
+        self._lock.acquire()
+        try:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.time() + ttl, value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        finally:
+            self._lock.release()
+
+    def delete_prefix(self, prefix):
+        self._lock.acquire()
+        try:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                del self._entries[key]
+        finally:
+            self._lock.release()
+
+    def clear(self):
+        self._lock.acquire()
+        try:
+            self._entries.clear()
+        finally:
+            self._lock.release()
+
+
+class SqliteBackend(object):
+    """
+    SQLite のファイルに保持するバックエンド。同じファイルを指定したプロセス間でキャッシュを共有できる
+    """
+
+    def __init__(self, path, max_entries=10000):
+        self.max_entries = max_entries
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.text_factory = str
+        self._conn.execute("CREATE TABLE IF NOT EXISTS cache "
+                           "(key TEXT PRIMARY KEY, value BLOB, expires REAL, accessed REAL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)")
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.time()
+        self._lock.acquire()
+        try:
+            row = self._conn.execute("SELECT value, expires FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None or row[1] < now:
+                return False, None
+            self._conn.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+        finally:
+            self._lock.release()
+        return True, cPickle.loads(str(row[0]))
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        data = sqlite3.Binary(cPickle.dumps(value, cPickle.HIGHEST_PROTOCOL))
+        self._lock.acquire()
+        try:
+            self._conn.execute("INSERT OR REPLACE INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)",
+                               (key, data, now + ttl, now))
+            self._conn.execute("DELETE FROM cache WHERE key IN "
+                               "(SELECT key FROM cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                               (self.max_entries,))
+        finally:
+            self._lock.release()
+
+    def delete_prefix(self, prefix):
+        self._lock.acquire()
+        try:
+            self._conn.execute("DELETE FROM cache WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+        finally:
+            self._lock.release()
+
+    def clear(self):
+        self._lock.acquire()
+        try:
+            self._conn.execute("DELETE FROM cache")
+        finally:
+            self._lock.release()
+
+
+class MasterDataCache(object):
+    """
+    ttls に含まれるメソッドの結果をキャッシュし、INVALIDATIONS に従って破棄する。
+    ttls を指定した場合は DEFAULT_TTLS を上書きする。0 を指定したメソッドはキャッシュしない
+    """
+
+    def __init__(self, backend=None, ttls=None):
+        self.backend = backend or MemoryBackend()
+        self.ttls = dict(DEFAULT_TTLS)
+        self.ttls.update(ttls or {})
+
+    def call(self, namespace, methodname, params, request):
+        """
+        request(methodname, params) の結果を、必要に応じてキャッシュを使って返す。
+        namespace は (接続先, ユーザ名)
+        """
+        ttl = self.ttls.get(methodname)
+        if not ttl:
+            ret = request(methodname, params)
+            for target in INVALIDATIONS.get(methodname, []):
+                self.invalidate(namespace, target)
+            return ret
+
+        space, user = namespace
+        if methodname in SPACE_WIDE:
+            user = None
+        key = "%s%r:%r" % (self._prefix(namespace, methodname), user, params)
+        found, ret = self.backend.get(key)
+        if not found:
+            ret = request(methodname, params)
+            self.backend.set(key, ret, ttl)
+        return ret
+
+    def invalidate(self, namespace, methodname):
+        """
+        namespace と同じ接続先の、全てのユーザの methodname のエントリを破棄する
+        """
+        self.backend.delete_prefix(self._prefix(namespace, methodname))
+
+    def clear(self):
+        self.backend.clear()
+
+    def _prefix(self, namespace, methodname):
+        # 接続先とメソッド名までを共通の接頭辞にし、更新時にユーザをまたいで破棄できるようにする
+        return "%s %s:" % (namespace[0], methodname)
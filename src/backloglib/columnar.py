@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+"""
+課題の検索結果を、属性ごとの NumPy の配列 (列) として受け取るためのモジュールです。
+
+    batch = backlog.find_issue_batch({"projectId": 1}, page_size=100)
+    print batch.count_by("status", "assigner")
+    days = (batch.updated_on - batch.created_on) / numpy.timedelta64(1, "D")
+
+レスポンスの struct を解析した時点で列に追加するため、Issue などのモデルオブジェクトは作りません。
+各列の型は
+
+  * id: int64
+  * key: object (str)
+  * status, priority, issue_type, assigner: Categorical (int32 のコードと、コードに対応する id と名前)
+  * created_on, updated_on, start_date, due_date: datetime64[s]。値がない場合は NaT
+  * estimated_hours, actual_hours: float64。値がない場合は NaN
+
+となります。NumPy が必要です。
+"""
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def _require_numpy():
+    if numpy is None:
+        raise ImportError("numpy is required for columnar results")
+
+
+class Categorical(object):
+    """
+    カテゴリの列。codes[i] は i 番目の課題の値の ids / names 上の位置で、値がない場合は -1
+    """
+
+    def __init__(self, codes, ids, names):
+        self.codes = codes
+        self.ids = ids
+        self.names = names
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, i):
+        code = self.codes[i]
+        return self.names[code] if code >= 0 else None
+
+    def counts(self):
+        """
+        名前ごとの件数の dict を返す。値がない課題は None に数える
+        """
+        counts = numpy.bincount(self.codes + 1, minlength=len(self.names) + 1)
+        return dict([(([None] + self.names)[i], int(counts[i])) for i in numpy.nonzero(counts)[0]])
+
+    def __repr__(self):
+        return "Categorical(%d, %r)" % (len(self.codes), self.names)
+
+
+class IssueBatch(object):
+    """
+    課題の検索結果の列を持つバッチ
+    """
+    CATEGORICAL = ("status", "priority", "issue_type", "assigner")
+    DATETIMES = ("created_on", "updated_on", "start_date", "due_date")
+    FLOATS = ("estimated_hours", "actual_hours")
+
+    def __init__(self, columns):
+        self.columns = columns
+        for name, column in columns.iteritems():
+            setattr(self, name, column)
+
+    def __len__(self):
+        return len(self.id)
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def count_by(self, *names):
+        """
+        カテゴリの列の値 (の組) ごとの件数の dict を返す。
+        names が 1 つの場合はキーが名前、2 つ以上の場合は名前のタプルとなる
+        """
+        if len(names) == 1:
+            return self.columns[names[0]].counts()
+        columns = [self.columns[x] for x in names]
+        shape = tuple([len(x.names) + 1 for x in columns])
+        flat = numpy.ravel_multi_index([x.codes + 1 for x in columns], shape)
+        counts = numpy.bincount(flat, minlength=int(numpy.prod(shape)))
+        ret = {}
+        for i in numpy.nonzero(counts)[0]:
+            index = numpy.unravel_index(i, shape)
+            ret[tuple([([None] + c.names)[j] for c, j in zip(columns, index)])] = int(counts[i])
+        return ret
+
+    def __repr__(self):
+        return "IssueBatch(%d issues)" % len(self)
+
+
+def _datetime(value):
+    # Backlog の日時 (yyyyMMddHHmmss) と日付 (yyyyMMdd) を datetime64 の文字列にする
+    if not value:
+        return "NaT"
+    value = str(value)
+    date = "%s-%s-%s" % (value[:4], value[4:6], value[6:8])
+    if len(value) >= 14:
+        return "%sT%s:%s:%s" % (date, value[8:10], value[10:12], value[12:14])
+    return date
+
+
+class IssueBatchBuilder(object):
+    """
+    findIssue の struct を列に追加していき、build で IssueBatch を作る。
+    factory を proxy.stream などの factory に渡して使う
+    """
+
+    def __init__(self):
+        _require_numpy()
+        self._ids = array("l")
+        self._keys = []
+        self._categories = dict([(x, {}) for x in IssueBatch.CATEGORICAL])
+        self._codes = dict([(x, array("i")) for x in IssueBatch.CATEGORICAL])
+        self._datetimes = dict([(x, []) for x in IssueBatch.DATETIMES])
+        self._floats = dict([(x, array("d")) for x in IssueBatch.FLOATS])
+
+    def __len__(self):
+        return len(self._ids)
+
+    def factory(self, **struct):
+        self.add(struct)
+
+    def add(self, struct):
+        self._ids.append(struct["id"])
+        self._keys.append(struct.get("key"))
+        for name, field in (("status", "status"), ("priority", "priority"), ("issue_type", "issueType"),
+                            ("assigner", "assigner")):
+            value = struct.get(field)
+            if not value:
+                self._codes[name].append(-1)
+                continue
+            categories = self._categories[name]
+            code = categories.get(value["id"])
+            if code is None:
+                code = categories[value["id"]] = (len(categories), value.get("name"))
+            self._codes[name].append(code[0])
+        for name in IssueBatch.DATETIMES:
+            self._datetimes[name].append(_datetime(struct.get(name)))
+        for name in IssueBatch.FLOATS:
+            value = struct.get(name)
+            self._floats[name].append(float(value) if value not in (None, "") else numpy.nan)
+
+    def build(self):
+        # array から numpy の配列へはバッファ経由でまとめて変換する
+        columns = {"id": numpy.array(self._ids, dtype=numpy.int64),
+                   "key": numpy.array(self._keys, dtype=object)}
+        for name in IssueBatch.CATEGORICAL:
+            ordered = sorted(self._categories[name].iteritems(), key=lambda x: x[1][0])
+            columns[name] = Categorical(numpy.array(self._codes[name], dtype=numpy.int32),
+                                        [x[0] for x in ordered], [x[1][1] for x in ordered])
+        for name in IssueBatch.DATETIMES:
+            columns[name] = numpy.array(self._datetimes[name], dtype="datetime64[s]")
+        for name in IssueBatch.FLOATS:
+            columns[name] = numpy.array(self._floats[name], dtype=numpy.float64)
+        return IssueBatch(columns)
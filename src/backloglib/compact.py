@@ -0,0 +1,297 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+"""
+models のクラスと同じ名前・同じ属性を持ち、__slots__ で状態を保持するクラスです。
+
+インスタンスごとの __dict__ を持たないため、大量の課題やコメントを保持する場合に
+メモリ使用量を大きく減らせます。Backlog("space", "username", "password", compact=True)
+とすると、API の戻り値がこのモジュールのクラスになります。
+"""
+from models import Serializable, _serialize
+from utils import classwrap
+
+
+class CompactObject(Serializable):
+    """
+    _FIELDS_ に列挙した属性を __slots__ で保持するクラスの基底クラス
+
+    _DEFAULTS_: 省略可能な引数とその既定値。それ以外の引数は必須
+    _ALIASES_: 引数名と異なる名前の属性に格納する場合の対応 (models と属性名を揃えるため)
+    _CONVERTERS_: ネストした値を変換する関数
+    """
+    __slots__ = ()
+    _FIELDS_ = ()
+    _DEFAULTS_ = {}
+    _ALIASES_ = {}
+    _CONVERTERS_ = {}
+    _REPR_FORMAT_ = "[%(id)s] %(name)s"
+
+    def __init__(self, *args, **kwargs):
+        cls = self.__class__
+        if len(args) > len(cls._FIELDS_):
+            raise TypeError("%s takes at most %d arguments (%d given)" % (cls.__name__, len(cls._FIELDS_), len(args)))
+        for k, v in zip(cls._FIELDS_, args):
+            if k in kwargs:
+                raise TypeError("%s got multiple values for keyword argument '%s'" % (cls.__name__, k))
+            kwargs[k] = v
+        for k in cls._FIELDS_:
+            if k in kwargs:
+                v = kwargs.pop(k)
+            elif k in cls._DEFAULTS_:
+                v = cls._DEFAULTS_[k]
+            else:
+                self._missing(k)
+                continue
+            converter = cls._CONVERTERS_.get(k)
+            setattr(self, cls._ALIASES_.get(k, k), converter(v) if converter else v)
+        if kwargs:
+            self._unexpected(kwargs)
+
+    def _missing(self, k):
+        raise TypeError("%s requires argument '%s'" % (self.__class__.__name__, k))
+
+    def _unexpected(self, kwargs):
+        raise TypeError("%s got unexpected keyword arguments %s" % (self.__class__.__name__, ", ".join(kwargs)))
+
+    def __getstate__(self):
+        """
+        設定されている属性の dict を返す。vars() の代わりに使う
+        """
+        state = {}
+        for k in _slot_names(self.__class__):
+            if hasattr(self, k):
+                state[k] = getattr(self, k)
+        return state
+
+    def __setstate__(self, state):
+        for k, v in state.iteritems():
+            setattr(self, k, v)
+
+    def serialize(self):
+        return _serialize(self.__class__, self.__getstate__())
+
+    def __repr__(self):
+        return (self.__class__._REPR_FORMAT_ % self.__getstate__()).encode('utf-8')
+
+    __str__ = __repr__
+
+
+_SLOT_NAMES_ = {}
+
+
+def _slot_names(cls):
+    """
+    cls と基底クラスの __slots__ を全て返す
+    """
+    names = _SLOT_NAMES_.get(cls)
+    if names is None:
+        names = []
+        for c in reversed(cls.__mro__):
+            names.extend(c.__dict__.get("__slots__", ()))
+        _SLOT_NAMES_[cls] = names
+    return names
+
+
+def _compact(name, fields, base=CompactObject, defaults=None, aliases=None, converters=None,
+             repr_format=None, attrs=None):
+    """
+    _FIELDS_ などを設定した CompactObject のサブクラスを作る。
+    __init__ は models のクラスと同じ引数を取るように、フィールドから生成する
+    """
+    defaults = defaults or {}
+    aliases = aliases or {}
+    converters = converters or {}
+    inherited = _slot_names(base)
+    slots = [aliases.get(k, k) for k in fields if aliases.get(k, k) not in inherited]
+    body = {"__slots__": tuple(slots),
+            "_FIELDS_": tuple(fields),
+            "_DEFAULTS_": defaults,
+            "_ALIASES_": aliases,
+            "_CONVERTERS_": converters,
+            "__init__": _make_init(fields, defaults, aliases, converters)}
+    if repr_format:
+        body["_REPR_FORMAT_"] = repr_format
+    body.update(attrs or {})
+    return type(name, (base,), body)
+
+
+def _make_init(fields, defaults, aliases, converters):
+    namespace = {}
+    args = ["self"]
+    lines = []
+    for k in fields:
+        if k in defaults:
+            namespace["_d_" + k] = defaults[k]
+            args.append("%s=_d_%s" % (k, k))
+        else:
+            args.append(k)
+        if k in converters:
+            namespace["_c_" + k] = converters[k]
+            lines.append("    self.%s = _c_%s(%s)" % (aliases.get(k, k), k, k))
+        else:
+            lines.append("    self.%s = %s" % (aliases.get(k, k), k))
+    source = "def __init__(%s):\n%s\n" % (", ".join(args), "\n".join(lines or ["    pass"]))
+    exec source in namespace
+    return namespace["__init__"]
+
+
+def _wrap(name):
+    # クラスを定義する前に参照できるよう、名前で遅延して解決する
+    return lambda v: classwrap(v, globals()[name])
+
+
+def _wrap_each(name):
+    return lambda v: [classwrap(x, globals()[name]) for x in v] if v else None
+
+
+def _issue_field(name):
+    def convert(v):
+        cls = globals()[name]
+        if isinstance(v, (list, tuple)):
+            return [cls(**x) for x in v]
+        return cls(**v)
+
+    return convert
+
+
+BacklogObject = _compact("BacklogObject", ("id", "name"))
+
+Component = _compact("Component", ("id", "name"))
+User = _compact("User", ("id", "name"))
+Priority = _compact("Priority", ("id", "name"), attrs={"HIGH": 2, "MIDDLE": 3, "LOW": 4})
+Resolution = _compact("Resolution", ("id", "name"),
+                      attrs={"UNSET": -1, "DONE": 0, "IGNORE": 1, "INVALID": 2, "DUPLICATE": 3, "WORKWELL": 4,
+                             "availables": classmethod(lambda cls: [cls.DONE, cls.IGNORE, cls.INVALID,
+                                                                    cls.DUPLICATE, cls.WORKWELL])})
+Status = _compact("Status", ("id", "name"), attrs={"UNDONE": 1, "PROGRESS": 2, "COMPLETED": 3, "DONE": 4})
+ActivityType = _compact("ActivityType", ("id", "name"),
+                        attrs={"CREATE_ISSUE": 1, "UPDATE_ISSUE": 2, "CREATE_COMMENT": 3})
+
+Project = _compact("Project", ("id", "key", "name", "url", "archived", "text_formatting_rule",
+                               "use_parent_child_issue"),
+                   defaults={"text_formatting_rule": None, "use_parent_child_issue": False},
+                   repr_format="[%(id)s][%(key)s] %(url)s")
+Version = _compact("Version", ("id", "name", "date"), repr_format="[%(id)s] %(name)s %(date)s")
+Milestone = _compact("Milestone", Version._FIELDS_, base=Version)
+UpdateVersion = _compact("UpdateVersion", ("id", "name", "start_date", "due_date", "archived"),
+                         defaults={"start_date": None, "due_date": None, "archived": False},
+                         repr_format="[%(id)s] %(name)s %(start_date)s %(due_date)s %(archived)s")
+IssueType = _compact("IssueType", ("id", "name", "color"), defaults={"color": None},
+                     repr_format="[%(id)s] %(name)s %(color)s")
+
+
+class Issue(CompactObject):
+    """
+    課題の属性はサーバのバージョンによって増減するため、_FIELDS_ 以外の属性は _extra_ に保持する
+    """
+    __slots__ = ("id", "key", "summary", "description", "url", "projectId", "parent_issue_id",
+                 "start_date", "due_date", "estimated_hours", "actual_hours",
+                 "created_on", "updated_on", "issueType", "priority", "resolution", "status",
+                 "component", "components", "version", "versions", "milestone", "milestones",
+                 "created_user", "assigner", "_extra_")
+    _FIELDS_ = __slots__[:-1]
+    _REPR_FORMAT_ = "[%(id)s][%(key)s] %(summary)s"
+    _CONVERTERS_ = {"assigner": _issue_field("User"),
+                    "created_user": _issue_field("User"),
+                    "priority": _issue_field("Priority"),
+                    "version": _issue_field("Version"),
+                    "versions": _issue_field("Version"),
+                    "milestone": _issue_field("Milestone"),
+                    "milestones": _issue_field("Milestone"),
+                    "component": _issue_field("Component"),
+                    "components": _issue_field("Component"),
+                    "issueType": _issue_field("IssueType"),
+                    "status": _issue_field("Status"),
+                    "resolution": _issue_field("Resolution")}
+
+    def _missing(self, k):
+        # models.Issue と同様に、渡されなかった属性は設定しない
+        pass
+
+    def _unexpected(self, kwargs):
+        self._extra_ = kwargs
+
+    def __getattr__(self, name):
+        # __slots__ に無い属性は _extra_ から探す。_extra_ 自体が未設定の場合もここに来る
+        if name != "_extra_":
+            try:
+                return self._extra_[name]
+            except (AttributeError, KeyError):
+                pass
+        raise AttributeError("'%s' object has no attribute '%s'" % (self.__class__.__name__, name))
+
+    def __getstate__(self):
+        state = CompactObject.__getstate__(self)
+        state.update(state.pop("_extra_", {}))
+        return state
+
+    def __setstate__(self, state):
+        extra = {}
+        for k, v in state.iteritems():
+            if k in Issue._FIELDS_:
+                setattr(self, k, v)
+            else:
+                extra[k] = v
+        if extra:
+            self._extra_ = extra
+
+
+Comment = _compact("Comment", ("id", "content", "created_user", "created_on", "updated_on"),
+                   aliases={"updated_on": "udpated_on"},
+                   converters={"created_user": lambda v: User(**v)},
+                   repr_format="[%(id)s] %(content)s")
+DetailUser = _compact("DetailUser", ("id", "name", "lang", "updated_on"), base=User,
+                      repr_format="[%(id)s] %(name)s %(lang)s")
+UserIcon = _compact("UserIcon", ("id", "content_type", "data", "updated_on"),
+                    repr_format="[%(id)s] %(content_type)s")
+TimelineIssue = _compact("TimelineIssue", ("id", "key", "summary", "description", "priority"),
+                         converters={"priority": _wrap("Priority")},
+                         repr_format="[%(id)s][%(key)s] %(summary)s")
+Timeline = _compact("Timeline", ("type", "content", "updated_on", "user", "issue"),
+                    converters={"type": _wrap("ActivityType"), "user": _wrap("User"),
+                                "issue": _wrap("TimelineIssue")},
+                    repr_format="[%(updated_on)s] %(content)s %(user)s")
+StatusSummary = _compact("StatusSummary", ("id", "name", "count"), base=Status,
+                         repr_format="[%(id)s] %(name)s %(count)s")
+MilestoneSummary = _compact("MilestoneSummary", ("id", "name", "due_date", "statuses", "burndown_chart"),
+                            defaults={"statuses": None, "burndown_chart": None},
+                            converters={"statuses": _wrap_each("StatusSummary")},
+                            repr_format="[%(id)s] %(name)s %(due_date)s %(statuses)s")
+ProjectSummary = _compact("ProjectSummary", ("id", "name", "key", "url", "statuses", "milestones",
+                                             "current_milestone"),
+                          defaults={"current_milestone": None},
+                          converters={"statuses": _wrap_each("StatusSummary"),
+                                      "milestones": _wrap_each("MilestoneSummary"),
+                                      "current_milestone": _wrap("MilestoneSummary")},
+                          repr_format="[%(id)s] %(name)s %(key)s %(url)s %(statuses)s %(milestones)s "
+                                      "%(current_milestone)s")
+
+###
+### 以下 BacklogAdmin 用のモデルオブジェクト
+###
+
+AdminUser = _compact("AdminUser", ("id", "user_id", "name", "mail_address", "role", "mail_setting",
+                                   "created_on", "updated_on"),
+                     repr_format="[%(id)s] %(user_id)s %(mail_address)s %(role)s")
+AdminProject = _compact("AdminProject", ("id", "name", "key", "url", "use_chart", "archived", "created_on",
+                                         "updated_on", "text_formatting_rule", "use_parent_child_issue"),
+                        base=Project,
+                        defaults={"use_chart": False, "archived": False, "created_on": None, "updated_on": None,
+                                  "text_formatting_rule": None, "use_parent_child_issue": False})
+AdminProjectUser = _compact("AdminProjectUser", ("id", "user_id", "name"),
+                            repr_format="[%(id)s] %(user_id)s %(name)s")
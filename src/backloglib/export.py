@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+"""
+課題を JSONL または CSV に書き出すモジュールです。
+
+    f = open("issues.csv", "wb")
+    count = export_issues(backlog, {"projectId": 1}, f, format="csv")
+
+    $ backlog-export --space SPACE --username USER -p 1 -p 2 --format csv -o issues.csv
+
+findIssue をページごとに呼び出し、レスポンスの struct を解析した時点で Issue を作らずに列の値へ変換します。
+保持するのは 1 ページ分の解析中のデータと書き込みのバッファだけで、課題の数によらず使用するメモリは一定です。
+
+列は (列名, パス) のリストで指定します。パスは課題の struct のキーを "." でつなげたもので、
+"components[].name" のように [] を付けたキーは配列の各要素の値のリストとなります。
+CSV ではリストの値を "," でつなげて 1 つの列に、JSONL では配列として出力します。
+
+ページの取得中に課題が登録・更新されると offset がずれるため、condition に sort がない場合は
+登録日時の昇順 (sort=CREATED, order=True) で取得します。
+"""
+import cStringIO
+import csv
+import getpass
+import json
+import optparse
+import os
+import sys
+from collections import OrderedDict
+
+from models import FindCondition
+from utils import FIND_ISSUE_LIMIT, check_page_size
+
+# 既定の列。ネストしたフィールドは名前で出力する
+DEFAULT_COLUMNS = [
+    ("id", "id"),
+    ("key", "key"),
+    ("summary", "summary"),
+    ("description", "description"),
+    ("issue_type", "issueType.name"),
+    ("status", "status.name"),
+    ("priority", "priority.name"),
+    ("resolution", "resolution.name"),
+    ("assigner", "assigner.name"),
+    ("created_user", "created_user.name"),
+    ("components", "components[].name"),
+    ("versions", "versions[].name"),
+    ("milestones", "milestones[].name"),
+    ("start_date", "start_date"),
+    ("due_date", "due_date"),
+    ("estimated_hours", "estimated_hours"),
+    ("actual_hours", "actual_hours"),
+    ("created_on", "created_on"),
+    ("updated_on", "updated_on"),
+    ("url", "url"),
+]
+
+FORMATS = ("jsonl", "csv")
+
+
+def _getter(path):
+    """
+    パスの値を struct から取り出す関数を返す
+    """
+    head, _, rest = path.partition(".")
+    sub = _getter(rest) if rest else None
+    if head.endswith("[]"):
+        name = head[:-2]
+
+        def get_each(struct):
+            values = struct.get(name) or []
+            if not isinstance(values, list):
+                values = [values]
+            if sub is None:
+                return values
+            return [sub(x) for x in values if isinstance(x, dict)]
+
+        return get_each
+
+    def get(struct):
+        value = struct.get(head)
+        if sub is None or value is None:
+            return value
+        return sub(value) if isinstance(value, dict) else None
+
+    return get
+
+
+def row_factory(columns):
+    """
+    struct を列の値のタプルに変換する関数を返す。proxy.stream の factory として使う
+    """
+    getters = [_getter(path) for name, path in columns]
+
+    def factory(**struct):
+        return tuple([get(struct) for get in getters])
+
+    return factory
+
+
+def _encode(value):
+    if value is None:
+        return ""
+    if isinstance(value, unicode):
+        return value.encode("utf-8")
+    if isinstance(value, list):
+        return ",".join([_encode(x) for x in value])
+    return str(value)
+
+
+class _CsvWriter(object):
+    def __init__(self, columns, header):
+        self.buf = cStringIO.StringIO()
+        self.writer = csv.writer(self.buf)
+        if header:
+            self.writer.writerow([name for name, path in columns])
+
+    def write(self, row):
+        self.writer.writerow([_encode(x) for x in row])
+
+
+class _JsonlWriter(object):
+    def __init__(self, columns, header):
+        self.buf = cStringIO.StringIO()
+        self.names = [name for name, path in columns]
+
+    def write(self, row):
+        line = json.dumps(OrderedDict(zip(self.names, row)), ensure_ascii=False)
+        if isinstance(line, unicode):
+            line = line.encode("utf-8")
+        self.buf.write(line)
+        self.buf.write("\n")
+
+
+_WRITERS_ = {"csv": _CsvWriter, "jsonl": _JsonlWriter}
+
+
+def export_issues(backlog, conditions, out, format="jsonl", columns=None, page_size=100, buffer_size=65536,
+                  header=True):
+    """
+    conditions (FindCondition か dict、またはそれらのリスト) に一致する課題を out に書き出し、書き出した件数を返す
+
+    columns: (列名, パス) のリスト。省略した場合は DEFAULT_COLUMNS
+    page_size: 1 回の findIssue で取得する課題の数 (最大 100)
+    buffer_size: out に書き込む単位 (バイト)
+    header: CSV の場合に列名の行を出力するかどうか
+    """
+    check_page_size(page_size)
+    if format not in _WRITERS_:
+        raise ValueError("format must be one of %s : %s" % (", ".join(FORMATS), format))
+    if isinstance(conditions, (dict, FindCondition)):
+        conditions = [conditions]
+    columns = columns or DEFAULT_COLUMNS
+    factory = row_factory(columns)
+    writer = _WRITERS_[format](columns, header)
+    count = 0
+    for condition in conditions:
+        if not isinstance(condition, FindCondition):
+            condition = FindCondition(condition)
+        params = condition.serialize()
+        if "sort" not in params:
+            params["sort"] = "CREATED"
+            params["order"] = True
+        offset = params.get("offset", 0)
+        remaining = params.get("limit")
+        while remaining is None or remaining > 0:
+            size = page_size if remaining is None else min(page_size, remaining)
+            page_params = dict(params, offset=offset, limit=size)
+            fetched = 0
+            for row in backlog.server.stream("backlog.findIssue", (page_params,), factory=factory):
+                writer.write(row)
+                fetched += 1
+                if writer.buf.tell() >= buffer_size:
+                    out.write(writer.buf.getvalue())
+                    writer.buf.seek(0)
+                    writer.buf.truncate()
+            count += fetched
+            offset += fetched
+            if remaining is not None:
+                remaining -= fetched
+            if fetched < size:
+                break
+    out.write(writer.buf.getvalue())
+    out.flush()
+    return count
+
+
+def _parse_pairs(parser, values, option):
+    pairs = []
+    for value in values or []:
+        name, sep, path = value.partition("=")
+        if not sep or not name:
+            parser.error("%s must be NAME=VALUE : %s" % (option, value))
+        pairs.append((name, path))
+    return pairs
+
+
+def _value(value):
+    # 条件の値は数値であれば数値として、"," を含めばリストとして扱う
+    if "," in value:
+        return [_value(x) for x in value.split(",")]
+    try:
+        return int(value)
+    except ValueError:
+        return value.decode("utf-8")
+
+
+def main(argv=None):
+    """
+    backlog-export コマンドのエントリポイント
+    """
+    argv = argv or sys.argv
+    parser = optparse.OptionParser(usage="%prog [options] -p PROJECT_ID [-p PROJECT_ID ...]",
+                                   description="Export issues of Backlog projects to JSONL or CSV.")
+    parser.add_option("--space", help="space name")
+    parser.add_option("--username", help="user name")
+    parser.add_option("--password", help="password (default: $BACKLOG_PASSWORD or prompt)")
+    parser.add_option("--domain", default="backlog.jp", help="domain of the space [default: %default]")
+    parser.add_option("--uri", help="XML-RPC endpoint, instead of --space and --domain")
+    parser.add_option("-p", "--project-id", type="int", action="append", dest="project_ids", default=[],
+                      help="project to export (repeatable)")
+    parser.add_option("--condition", action="append", metavar="KEY=VALUE",
+                      help="additional FindCondition parameter, e.g. statusId=1,2 (repeatable)")
+    parser.add_option("--column", action="append", metavar="NAME=PATH",
+                      help="output column, e.g. status=status.name (repeatable, replaces the default columns)")
+    parser.add_option("-f", "--format", choices=FORMATS, default="jsonl", help="jsonl or csv [default: %default]")
+    parser.add_option("-o", "--output", help="output file [default: stdout]")
+    parser.add_option("--page-size", type="int", default=FIND_ISSUE_LIMIT,
+                      help="issues per findIssue call, at most %d [default: %%default]" % FIND_ISSUE_LIMIT)
+    parser.add_option("--no-header", action="store_false", dest="header", default=True,
+                      help="omit the CSV header row")
+    options, args = parser.parse_args(argv[1:])
+    if not options.project_ids:
+        parser.error("at least one --project-id is required")
+    if not 0 < options.page_size <= FIND_ISSUE_LIMIT:
+        parser.error("--page-size must be between 1 and %d : %s" % (FIND_ISSUE_LIMIT, options.page_size))
+    if not options.uri and not (options.space and options.username):
+        parser.error("--space and --username (or --uri) are required")
+    extra = dict([(k, _value(v)) for k, v in _parse_pairs(parser, options.condition, "--condition")])
+    columns = _parse_pairs(parser, options.column, "--column") or None
+
+    from backloglib import Backlog, PooledSafeTransport, PooledTransport
+    if options.uri:
+        transport = PooledSafeTransport() if options.uri.startswith("https") else PooledTransport()
+        backlog = Backlog(None, None, None, transport=transport, uri=options.uri)
+    else:
+        password = options.password or os.environ.get("BACKLOG_PASSWORD") or getpass.getpass()
+        transport = PooledSafeTransport()
+        backlog = Backlog(options.space, options.username, password, domain=options.domain, transport=transport)
+
+    out = open(options.output, "wb") if options.output else sys.stdout
+    try:
+        conditions = [dict(extra, projectId=x) for x in options.project_ids]
+        count = export_issues(backlog, conditions, out, format=options.format, columns=columns,
+                              page_size=options.page_size, header=options.header)
+    finally:
+        transport.close()
+        if options.output:
+            out.close()
+    print >> sys.stderr, "exported %d issues" % count
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
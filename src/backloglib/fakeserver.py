@@ -0,0 +1,622 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+"""
+Backlog の XML-RPC API を模したプロセス内のサーバです。
+
+実際のスペースを使わずに、クライアントのテストやベンチマークを行うためのもので、
+データは全てメモリ上に生成します。
+
+    with FakeBacklogServer(issues=1000, latency=0.01) as server:
+        backlog = server.client(Backlog, transport=PooledTransport())
+        print backlog.find_issue({"projectId": 1, "limit": 100})
+
+latency を指定すると、全ての呼び出しがその秒数だけ待ってから応答します。
+"""
+import copy
+import socket
+import threading
+import time
+import xmlrpclib
+from SimpleXMLRPCServer import SimpleXMLRPCServer, SimpleXMLRPCRequestHandler
+from SocketServer import ThreadingMixIn
+
+STATUSES = [(1, u"未対応"), (2, u"処理中"), (3, u"処理済み"), (4, u"完了")]
+PRIORITIES = [(2, u"高"), (3, u"中"), (4, u"低")]
+RESOLUTIONS = [(0, u"対応済み"), (1, u"対応しない"), (2, u"無効"), (3, u"重複"), (4, u"再現しない")]
+ACTIVITY_TYPES = [(1, u"課題"), (2, u"課題更新"), (3, u"コメント")]
+
+# 1x1 の透過 GIF
+ICON = "GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x01\x00\x00\x00\x00" \
+       ",\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;"
+# アイコンの更新日時。実際の API と同じく、ユーザの updated_on とは別の値とする
+ICON_UPDATED_ON = "20090101000000"
+
+# findIssue の sort に指定できる値と、課題のフィールド
+SORT_KEYS = {"ISSUE_TYPE": "issueType", "SUMMARY": "summary", "PRIORITY": "priority", "STATUS": "status",
+             "CREATED": "created_on", "UPDATED": "updated_on", "START_DATE": "start_date", "LIMIT_DATE": "due_date",
+             "ASSIGNER": "assigner", "CREATED_USER": "created_user"}
+
+
+# 標準の Transport のように 1 回ごとに接続を閉じるクライアントと、keep-alive のクライアントの両方を受け付ける
+class _Handler(SimpleXMLRPCRequestHandler):
+    protocol_version = "HTTP/1.1"
+    rpc_paths = ("/XML-RPC",)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(ThreadingMixIn, SimpleXMLRPCServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, *args, **kwargs):
+        SimpleXMLRPCServer.__init__(self, *args, **kwargs)
+        self.requests = set()
+
+    def process_request_thread(self, request, client_address):
+        self.requests.add(request)
+        try:
+            ThreadingMixIn.process_request_thread(self, request, client_address)
+        finally:
+            self.requests.discard(request)
+
+    def server_close(self):
+        SimpleXMLRPCServer.server_close(self)
+        # keep-alive で待機している接続も閉じ、処理中のスレッドを終わらせる
+        for request in list(self.requests):
+            try:
+                request.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+
+
+def _named(items):
+    return [{"id": id, "name": name} for id, name in items]
+
+
+def _find(items, id, kind):
+    for x in items:
+        if x["id"] == id:
+            return x
+    raise xmlrpclib.Fault(1, "%s not found : %s" % (kind, id))
+
+
+def _ids(value):
+    if value is None:
+        return None
+    if isinstance(value, (list, tuple)):
+        return set(value)
+    return set([value])
+
+
+class FakeBacklog(object):
+    """
+    FakeBacklogServer が保持するデータと、XML-RPC のメソッドの実装。
+    メソッド名は backlog. / backlog.admin. を除いたもので、_dispatch から呼び出す
+
+    projects: 生成するプロジェクトの数
+    issues: プロジェクトごとに生成する課題の数
+    comments: 課題ごとに生成するコメントの数
+    users: 生成するユーザの数 (全てのプロジェクトに参加する)
+    description_size: 課題の詳細とコメントの文字数
+    clock: 作成日時や更新日時に使う現在時刻 (エポック秒) を返す関数
+    """
+
+    def __init__(self, projects=1, issues=100, comments=10, users=10, description_size=100, clock=time.time):
+        self.description_size = description_size
+        self.clock = clock
+        self._lock = threading.RLock()
+        self._ids = {}
+        self.users = {}
+        self.projects = {}
+        self.issues = {}
+        self.issue_keys = {}
+        self.comments = {}
+        self.timeline = []
+        self.members = {}
+        # ユーザの id ごとのアイコンとその更新日時。無いユーザは ICON と ICON_UPDATED_ON を返す
+        self.icons = {}
+        self.icon_updated_on = {}
+        self.issue_types = {}
+        self.components = {}
+        self.versions = {}
+        for i in range(users):
+            self._add_user(u"user%d" % (i + 1), u"ユーザ%d" % (i + 1), "normal-user")
+        for i in range(projects):
+            project = self._add_project(u"プロジェクト%d" % (i + 1), "FAKE%d" % (i + 1) if i else "FAKE")
+            self.members[project["id"]] = sorted(self.users)
+            for name, color in [(u"バグ", "#990000"), (u"タスク", "#7ea800")]:
+                self._add_issue_type(project["id"], name, color)
+            self._add_component(project["id"], u"カテゴリ1")
+            self._add_version(project["id"], u"マイルストーン1", "20140101", "20140331")
+            for j in range(issues):
+                issue = self._create_issue(self._user(j), {"projectId": project["id"],
+                                                           "summary": u"課題 %d" % (j + 1),
+                                                           "description": self._text(j)})
+                for k in range(comments):
+                    self._add_comment(self._user(k), issue, self._text(k))
+
+    # 内部のヘルパー
+
+    def _next_id(self, kind):
+        self._ids[kind] = self._ids.get(kind, 0) + 1
+        return self._ids[kind]
+
+    def _now(self):
+        return time.strftime("%Y%m%d%H%M%S", time.localtime(self.clock()))
+
+    def _text(self, seed):
+        text = u"説明 %d " % seed
+        return (text * (self.description_size / len(text) + 1))[:self.description_size]
+
+    def _user(self, seed):
+        ids = sorted(self.users)
+        return self.users[ids[seed % len(ids)]]
+
+    def _ref(self, x):
+        return {"id": x["id"], "name": x["name"]}
+
+    def _add_user(self, user_id, name, role, mail_address=None, mail_setting=None):
+        now = self._now()
+        user = {"id": self._next_id("user"), "user_id": user_id, "name": name, "lang": "ja",
+                "mail_address": mail_address or "%s@example.com" % user_id, "role": role,
+                "mail_setting": mail_setting or {"mail_notify": True}, "created_on": now, "updated_on": now}
+        self.users[user["id"]] = user
+        return user
+
+    def _add_project(self, name, key, use_chart=False):
+        now = self._now()
+        project = {"id": self._next_id("project"), "key": key, "name": name,
+                   "url": "https://fake.backlog.jp/projects/%s" % key, "archived": False, "use_chart": use_chart,
+                   "text_formatting_rule": "backlog", "use_parent_child_issue": False,
+                   "created_on": now, "updated_on": now}
+        self.projects[project["id"]] = project
+        self.members[project["id"]] = []
+        return project
+
+    def _add_issue_type(self, project_id, name, color):
+        x = {"id": self._next_id("issueType"), "project_id": project_id, "name": name, "color": color}
+        self.issue_types[x["id"]] = x
+        return x
+
+    def _add_component(self, project_id, name):
+        x = {"id": self._next_id("component"), "project_id": project_id, "name": name}
+        self.components[x["id"]] = x
+        return x
+
+    def _add_version(self, project_id, name, start_date=None, due_date=None):
+        x = {"id": self._next_id("version"), "project_id": project_id, "name": name, "archived": False}
+        if start_date:
+            x["start_date"] = start_date
+        if due_date:
+            x["due_date"] = due_date
+        self.versions[x["id"]] = x
+        return x
+
+    def _project(self, key_or_id):
+        for project in self.projects.itervalues():
+            if key_or_id in (project["id"], project["key"]):
+                return project
+        raise xmlrpclib.Fault(1, "project not found : %s" % key_or_id)
+
+    def _issue(self, key_or_id):
+        issue = self.issues.get(self.issue_keys.get(key_or_id, key_or_id))
+        if issue is not None:
+            return issue
+        raise xmlrpclib.Fault(1, "issue not found : %s" % key_or_id)
+
+    def _of_project(self, items, project_id):
+        self._project(project_id)
+        return [x for x in sorted(items.values(), key=lambda x: x["id"]) if x["project_id"] == project_id]
+
+    def _apply(self, issue, params):
+        for k in ("summary", "description", "start_date", "due_date", "estimated_hours", "actual_hours"):
+            if k in params:
+                issue[k] = params[k]
+        project_id = issue["projectId"]
+        issue_types = self._of_project(self.issue_types, project_id)
+        if "issueTypeId" in params or "issueType" in params or "issueType" not in issue:
+            if "issueType" in params:
+                names = [x for x in issue_types if x["name"] == params["issueType"]]
+                if not names:
+                    raise xmlrpclib.Fault(1, "issueType not found : %s" % params["issueType"])
+                issue_type = names[0]
+            else:
+                issue_type = _find(issue_types, params.get("issueTypeId", issue_types[0]["id"]), "issueType")
+            issue["issueType"] = {"id": issue_type["id"], "name": issue_type["name"], "color": issue_type["color"]}
+        if "priorityId" in params or "priority" not in issue:
+            issue["priority"] = self._ref(_find(_named(PRIORITIES), params.get("priorityId", 3), "priority"))
+        for name, items in (("component", self.components), ("version", self.versions),
+                            ("milestone", self.versions)):
+            if name + "Id" in params:
+                x = _find(self._of_project(items, project_id), params[name + "Id"], name)
+                ref = self._ref(x)
+                if name != "component":
+                    ref["date"] = x.get("due_date", "")
+                issue[name + "s"] = [ref]
+        if params.get("assignerId"):
+            issue["assigner"] = self._ref(_find(self.users.values(), params["assignerId"], "user"))
+        if "statusId" in params:
+            issue["status"] = self._ref(_find(_named(STATUSES), params["statusId"], "status"))
+        if params.get("resolutionId") is not None:
+            issue["resolution"] = self._ref(_find(_named(RESOLUTIONS), params["resolutionId"], "resolution"))
+
+    def _create_issue(self, user, params):
+        project = self._project(params["projectId"])
+        now = self._now()
+        project["_seq"] = project.get("_seq", 0) + 1
+        issue = {"id": self._next_id("issue"), "key": "%s-%d" % (project["key"], project["_seq"]),
+                 "projectId": project["id"], "summary": params["summary"], "description": u"",
+                 "url": "https://fake.backlog.jp/view/%s-%d" % (project["key"], project["_seq"]),
+                 "status": self._ref(_named(STATUSES)[0]), "components": [], "versions": [], "milestones": [],
+                 "created_user": self._ref(user), "created_on": now, "updated_on": now}
+        self._apply(issue, params)
+        self.issues[issue["id"]] = issue
+        self.issue_keys[issue["key"]] = issue["id"]
+        self.comments[issue["id"]] = []
+        self._log(1, user, issue, issue["summary"])
+        return issue
+
+    def _update_issue(self, user, params):
+        issue = self._issue(params["key"])
+        self._apply(issue, params)
+        issue["updated_on"] = self._now()
+        if params.get("comment"):
+            self._add_comment(user, issue, params["comment"])
+        self._log(2, user, issue, params.get("comment", u""))
+        return issue
+
+    def _add_comment(self, user, issue, content):
+        now = self._now()
+        comment = {"id": self._next_id("comment"), "content": content, "created_user": self._ref(user),
+                   "created_on": now, "updated_on": now}
+        self.comments[issue["id"]].append(comment)
+        self._log(3, user, issue, content)
+        return comment
+
+    def _log(self, type, user, issue, content):
+        self.timeline.append({"type": self._ref(_named(ACTIVITY_TYPES)[type - 1]), "content": content,
+                              "updated_on": self._now(), "user": self._ref(user),
+                              "issue": {"id": issue["id"], "key": issue["key"], "summary": issue["summary"],
+                                        "description": issue["description"], "priority": issue["priority"]}})
+
+    def _match(self, issue, params):
+        if issue["projectId"] != params.get("projectId"):
+            return False
+        for name, field in (("statusId", "status"), ("priorityId", "priority"), ("assignerId", "assigner"),
+                            ("createdUserId", "created_user"), ("resolutionId", "resolution"),
+                            ("issueTypeId", "issueType")):
+            ids = _ids(params.get(name))
+            if ids is not None and issue.get(field, {}).get("id") not in ids:
+                return False
+        for name, field in (("componentId", "components"), ("versionId", "versions"),
+                            ("milestoneId", "milestones")):
+            ids = _ids(params.get(name))
+            if ids is not None and not ids.intersection([x["id"] for x in issue[field]]):
+                return False
+        for prefix, field in (("created_on", "created_on"), ("updated_on", "updated_on"),
+                              ("start_date", "start_date"), ("due_date", "due_date")):
+            value = issue.get(field, "")[:8]
+            if params.get(prefix + "_min") and (not value or value < params[prefix + "_min"]):
+                return False
+            if params.get(prefix + "_max") and (not value or value > params[prefix + "_max"]):
+                return False
+        query = params.get("query")
+        if query and query not in issue["summary"] and query not in issue["description"]:
+            return False
+        return True
+
+    def _search(self, params):
+        issues = [x for x in self.issues.itervalues() if self._match(x, params)]
+        field = SORT_KEYS.get(params.get("sort"), "created_on")
+
+        def key(x):
+            value = x.get(field)
+            if isinstance(value, dict):
+                value = value.get("id")
+            return value, x["id"]
+
+        issues.sort(key=key, reverse=not params.get("order", False))
+        return issues
+
+    def _admin_project(self, project):
+        return dict([(k, v) for k, v in project.iteritems() if not k.startswith("_")])
+
+    def _admin_project_users(self, project_id):
+        return [{"id": id, "user_id": self.users[id]["user_id"], "name": self.users[id]["name"]}
+                for id in self.members[project_id]]
+
+    # backlog.*
+
+    def getProjects(self):
+        return [self._project_dict(x) for x in sorted(self.projects.values(), key=lambda x: x["id"])]
+
+    def _project_dict(self, project):
+        return dict([(k, project[k]) for k in ("id", "key", "name", "url", "archived", "text_formatting_rule",
+                                               "use_parent_child_issue")])
+
+    def getProject(self, key):
+        return self._project_dict(self._project(key))
+
+    def getComponents(self, project_id):
+        return [{"id": x["id"], "name": x["name"]} for x in self._of_project(self.components, project_id)]
+
+    def getVersions(self, project_id):
+        return [{"id": x["id"], "name": x["name"], "date": x.get("due_date", "")}
+                for x in self._of_project(self.versions, project_id)]
+
+    def getUsers(self, project_id):
+        self._project(project_id)
+        return [self._ref(self.users[id]) for id in self.members[project_id]]
+
+    def getIssueTypes(self, project_id):
+        return [{"id": x["id"], "name": x["name"], "color": x["color"]}
+                for x in self._of_project(self.issue_types, project_id)]
+
+    def getIssue(self, key):
+        return self._issue(key)
+
+    def getComments(self, issue_id):
+        return self.comments.get(issue_id, [])
+
+    def countIssue(self, params):
+        return len(self._search(params))
+
+    def findIssue(self, params):
+        offset = params.get("offset", 0)
+        limit = min(params.get("limit", 20), 100)
+        return self._search(params)[offset:offset + limit]
+
+    def createIssue(self, params):
+        return self._create_issue(self._login, params)
+
+    def updateIssue(self, params):
+        return self._update_issue(self._login, params)
+
+    def switchStatus(self, params):
+        return self._update_issue(self._login, params)
+
+    def addIssueType(self, params):
+        self._project(params["project_id"])
+        x = self._add_issue_type(params["project_id"], params["name"], params["color"])
+        return {"id": x["id"], "name": x["name"], "color": x["color"]}
+
+    def updateIssueType(self, params):
+        x = _find(self.issue_types.values(), params["id"], "issueType")
+        x.update([(k, params[k]) for k in ("name", "color") if k in params])
+        return {"id": x["id"], "name": x["name"], "color": x["color"]}
+
+    def deleteIssueType(self, params):
+        x = self.issue_types.pop(_find(self.issue_types.values(), params["id"], "issueType")["id"])
+        return {"id": x["id"], "name": x["name"], "color": x["color"]}
+
+    def addVersion(self, params):
+        self._project(params["project_id"])
+        x = self._add_version(params["project_id"], params["name"], params.get("start_date"), params.get("due_date"))
+        return self._version_dict(x)
+
+    def _version_dict(self, x):
+        return dict([(k, v) for k, v in x.iteritems() if k != "project_id"])
+
+    def updateVersion(self, params):
+        x = _find(self.versions.values(), params["id"], "version")
+        x.update([(k, params[k]) for k in ("name", "start_date", "due_date", "archived") if k in params])
+        return self._version_dict(x)
+
+    def deleteVersion(self, id):
+        return self._version_dict(self.versions.pop(_find(self.versions.values(), id, "version")["id"]))
+
+    def addComponent(self, params):
+        self._project(params["project_id"])
+        return self._ref(self._add_component(params["project_id"], params["name"]))
+
+    def updateComponent(self, params):
+        x = _find(self.components.values(), params["id"], "component")
+        x["name"] = params["name"]
+        return self._ref(x)
+
+    def deleteComponent(self, id):
+        return self._ref(self.components.pop(_find(self.components.values(), id, "component")["id"]))
+
+    def getTimeline(self):
+        return list(reversed(self.timeline[-50:]))
+
+    def getActivityTypes(self):
+        return _named(ACTIVITY_TYPES)
+
+    def addComment(self, params):
+        return self._add_comment(self._login, self._issue(params["key"]), params["content"])
+
+    def getProjectSummary(self, project_id):
+        project = self._project(project_id)
+        issues = [x for x in self.issues.itervalues() if x["projectId"] == project["id"]]
+        statuses = [{"id": id, "name": name, "count": len([x for x in issues if x["status"]["id"] == id])}
+                    for id, name in STATUSES]
+        milestones = [{"id": x["id"], "name": x["name"], "due_date": x.get("due_date", ""),
+                       "statuses": [dict(s, count=len([i for i in issues if i["status"]["id"] == s["id"] and
+                                                      x["id"] in [m["id"] for m in i["milestones"]]]))
+                                    for s in statuses]}
+                      for x in self._of_project(self.versions, project["id"])]
+        return {"id": project["id"], "name": project["name"], "key": project["key"], "url": project["url"],
+                "statuses": statuses, "milestones": milestones}
+
+    def getProjectSummaries(self):
+        return [self.getProjectSummary(id) for id in sorted(self.projects)]
+
+    def getUser(self, user_id):
+        user = _find(self.users.values(), user_id, "user")
+        return {"id": user["id"], "name": user["name"], "lang": user["lang"], "updated_on": user["updated_on"]}
+
+    def getUserIcon(self, user_id):
+        user = _find(self.users.values(), user_id, "user")
+        return {"id": user["id"], "content_type": "image/gif", "data": xmlrpclib.Binary(self.icons.get(user["id"], ICON)),
+                "updated_on": self.icon_updated_on.get(user["id"], ICON_UPDATED_ON)}
+
+    def getStatuses(self):
+        return _named(STATUSES)
+
+    def getResolutions(self):
+        return _named(RESOLUTIONS)
+
+    def getPriorities(self):
+        return _named(PRIORITIES)
+
+    # backlog.admin.*
+
+    def admin_getUsers(self):
+        return [self._admin_user(self.users[id]) for id in sorted(self.users)]
+
+    def _admin_user(self, user):
+        return dict([(k, v) for k, v in user.iteritems() if k != "lang"])
+
+    def admin_addUser(self, params):
+        user = self._add_user(params["user_id"], params["name"], params["role"], params["mail_address"],
+                              params.get("mail_setting"))
+        return self._admin_user(user)
+
+    def admin_updateUser(self, params):
+        user = _find(self.users.values(), params["id"], "user")
+        user.update([(k, params[k]) for k in ("name", "mail_address", "role", "mail_setting") if k in params])
+        user["updated_on"] = self._now()
+        return self._admin_user(user)
+
+    def admin_deleteUser(self, id):
+        user = self.users.pop(_find(self.users.values(), id, "user")["id"])
+        for members in self.members.itervalues():
+            if id in members:
+                members.remove(id)
+        return self._admin_user(user)
+
+    def admin_getProjects(self):
+        return [self._admin_project(self.projects[id]) for id in sorted(self.projects)]
+
+    def admin_addProject(self, params):
+        return self._admin_project(self._add_project(params["name"], params["key"], params.get("use_chart", False)))
+
+    def admin_updateProject(self, params):
+        project = self._project(params["id"])
+        project.update([(k, params[k]) for k in ("name", "key", "use_chart", "archived") if k in params])
+        project["updated_on"] = self._now()
+        return self._admin_project(project)
+
+    def admin_deleteProject(self, id):
+        project = self.projects.pop(self._project(id)["id"])
+        del self.members[project["id"]]
+        return self._admin_project(project)
+
+    def admin_getProjectUsers(self, project_id):
+        self._project(project_id)
+        return self._admin_project_users(project_id)
+
+    def admin_addProjectUser(self, params):
+        project_id = self._project(params["project_id"])["id"]
+        _find(self.users.values(), params["user_id"], "user")
+        if params["user_id"] not in self.members[project_id]:
+            self.members[project_id].append(params["user_id"])
+        return self._admin_project_users(project_id)
+
+    def admin_updateProjectUsers(self, params):
+        project_id = self._project(params["project_id"])["id"]
+        user_ids = params["user_id"]
+        for user_id in user_ids:
+            _find(self.users.values(), user_id, "user")
+        self.members[project_id] = list(user_ids)
+        return self._admin_project_users(project_id)
+
+    def admin_deleteProjectUser(self, params):
+        project_id = self._project(params["project_id"])["id"]
+        if params["user_id"] in self.members[project_id]:
+            self.members[project_id].remove(params["user_id"])
+        return self._admin_project_users(project_id)
+
+    @property
+    def _login(self):
+        # 書き込みは全て最初のユーザが行ったものとして記録する
+        return self.users[min(self.users)]
+
+
+class FakeBacklogServer(object):
+    """
+    FakeBacklog を XML-RPC で公開するサーバ。start で別スレッドで待ち受けを始める
+
+    latency: 各呼び出しの応答を遅らせる秒数
+    それ以外のキーワード引数は FakeBacklog に渡す
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, **options):
+        self.latency = latency
+        self.backlog = FakeBacklog(**options)
+        self.calls = {}
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), _Handler, logRequests=False, allow_none=False)
+        self._server.register_instance(self)
+        self._server.register_function(self._multicall, "system.multicall")
+        self._thread = None
+
+    @property
+    def uri(self):
+        host, port = self._server.server_address
+        return "http://user:password@%s:%d/XML-RPC" % (host, port)
+
+    def client(self, clazz, **options):
+        """
+        このサーバに接続する Backlog / BacklogAdmin などを作る
+        """
+        return clazz("fake", "user", "password", uri=self.uri, **options)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.setDaemon(True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _multicall(self, calls):
+        # 個々の呼び出しとは別に、system.multicall の呼び出し回数も数える
+        with self._lock:
+            self.calls["system.multicall"] = self.calls.get("system.multicall", 0) + 1
+        return self._server.system_multicall(calls)
+
+    def _dispatch(self, method, params):
+        if method.startswith("backlog.admin."):
+            name = "admin_" + method[len("backlog.admin."):]
+        elif method.startswith("backlog."):
+            name = method[len("backlog."):]
+        else:
+            name = None
+        func = getattr(self.backlog, name, None) if name and not name.startswith("_") else None
+        if func is None:
+            raise xmlrpclib.Fault(1, 'method "%s" is not supported' % method)
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+        with self.backlog._lock:
+            # 応答の marshal 中に他の呼び出しから書き換えられないよう、保持しているデータとは切り離す
+            return copy.deepcopy(func(*params))
@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+"""
+ユーザのアイコンをディスクにキャッシュするモジュールです。
+
+    icons = IconCache(backlog, "/var/cache/backlog/icons", max_bytes=64 * 1024 * 1024)
+    icon = icons.get(user.id, user.updated_on)
+    response.write(icon.data)
+
+アイコンは base64 を復号した画像のバイト列を、その SHA-1 をファイル名として保存します (同じ画像は 1 つだけ保存します)。
+ユーザとファイルの対応と、保存時のユーザの updated_on (DetailUser.updated_on) は同じディレクトリの SQLite に保持し、
+
+  * get に updated_on (DetailUser.updated_on など) を渡した場合は、それが保存時のユーザの updated_on と
+    一致すれば API を呼び出さずにファイルから返します
+  * updated_on を渡さない場合は getUser で updated_on を確認し、変わっていなければ getUserIcon を呼び出しません
+
+UserIcon.updated_on はアイコンの更新日時で、ユーザの updated_on とは別の値です。
+ファイルは mmap で読み込むため、返す UserIcon の data はコピーせずにソケットなどへ書き出せます。
+保存しているファイルの合計が max_bytes を超えた場合は、最後に参照された時刻が古いものから削除します。
+"""
+import hashlib
+import mmap
+import os
+import sqlite3
+import tempfile
+import threading
+from xmlrpclib import Binary
+
+
+class IconCache(object):
+    """
+    backlog.get_user_icon の結果を directory に保持するキャッシュ
+
+    max_bytes: 保存するファイルの合計の上限 (バイト)
+    """
+
+    def __init__(self, backlog, directory, max_bytes=64 * 1024 * 1024):
+        self.backlog = backlog
+        self.directory = directory
+        self.max_bytes = max_bytes
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._conn = sqlite3.connect(os.path.join(directory, "index.db"), check_same_thread=False,
+                                     isolation_level=None)
+        # user_updated_on は保存時のユーザの updated_on で、キャッシュの検証に使う。updated_on はアイコンのもの
+        self._conn.execute("CREATE TABLE IF NOT EXISTS icons (user_id INTEGER PRIMARY KEY, user_updated_on TEXT, "
+                           "updated_on TEXT, content_type TEXT, digest TEXT, size INTEGER, accessed INTEGER)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS icons_accessed ON icons (accessed)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS icons_digest ON icons (digest)")
+        self._lock = threading.Lock()
+        # 参照の順序。時刻では同じ値になり得るため、参照ごとに増やす
+        self._tick = self._conn.execute("SELECT MAX(accessed) FROM icons").fetchone()[0] or 0
+
+    def get(self, user_id, updated_on=None):
+        """
+        user_id のアイコンを UserIcon で返す。data は画像のバイト列 (mmap)
+
+        updated_on: ユーザの updated_on (DetailUser.updated_on)。省略した場合は getUser で取得する
+        """
+        if updated_on is None:
+            updated_on = self.backlog.get_user(user_id).updated_on
+        entry = self._lookup(user_id)
+        if entry is not None and entry[0] == updated_on:
+            data = self._read(entry[3])
+            if data is not None:
+                return self.backlog.models.UserIcon(user_id, entry[2], data, entry[1])
+        return self.refresh(user_id, updated_on)
+
+    def refresh(self, user_id, updated_on=None):
+        """
+        getUserIcon でアイコンを取得し直して保存する。
+        updated_on (ユーザの updated_on) を省略した場合は getUser で取得する
+        """
+        if updated_on is None:
+            updated_on = self.backlog.get_user(user_id).updated_on
+        icon = self.backlog.get_user_icon(user_id)
+        data = icon.data.data if isinstance(icon.data, Binary) else icon.data
+        digest = hashlib.sha1(data).hexdigest()
+        self._write(digest, data)
+        # キャッシュから返す場合と同じく mmap で返す。直後に削除されても読み込めるよう、索引の更新より先に開く
+        mapped = self._read(digest)
+        self._lock.acquire()
+        try:
+            old = self._conn.execute("SELECT digest FROM icons WHERE user_id = ?", (user_id,)).fetchone()
+            self._tick += 1
+            self._conn.execute("INSERT OR REPLACE INTO icons (user_id, user_updated_on, updated_on, content_type, "
+                               "digest, size, accessed) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                               (user_id, updated_on, icon.updated_on, icon.content_type, digest, len(data),
+                                self._tick))
+            if old and old[0] != digest:
+                self._release(old[0])
+            self._evict()
+        finally:
+            self._lock.release()
+        return self.backlog.models.UserIcon(icon.id, icon.content_type, mapped if mapped is not None else data,
+                                            icon.updated_on)
+
+    def path(self, user_id):
+        """
+        キャッシュしている user_id のアイコンのファイルのパス。無い場合は None
+        """
+        entry = self._lookup(user_id)
+        return self._path(entry[3]) if entry else None
+
+    def size(self):
+        """
+        保存しているファイルの合計 (バイト)
+        """
+        self._lock.acquire()
+        try:
+            return self._total()
+        finally:
+            self._lock.release()
+
+    def clear(self):
+        self._lock.acquire()
+        try:
+            for (digest,) in self._conn.execute("SELECT DISTINCT digest FROM icons").fetchall():
+                self._remove(digest)
+            self._conn.execute("DELETE FROM icons")
+        finally:
+            self._lock.release()
+
+    def close(self):
+        self._conn.close()
+
+    def _lookup(self, user_id):
+        self._lock.acquire()
+        try:
+            row = self._conn.execute("SELECT user_updated_on, updated_on, content_type, digest FROM icons "
+                                     "WHERE user_id = ?", (user_id,)).fetchone()
+            if row is not None:
+                self._tick += 1
+                self._conn.execute("UPDATE icons SET accessed = ? WHERE user_id = ?", (self._tick, user_id))
+            return row
+        finally:
+            self._lock.release()
+
+    def _path(self, digest):
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def _read(self, digest):
+        try:
+            f = open(self._path(digest), "rb")
+        except IOError:
+            return None
+        try:
+            if os.fstat(f.fileno()).st_size == 0:
+                return ""
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            f.close()
+
+    def _write(self, digest, data):
+        path = self._path(digest)
+        if os.path.exists(path):
+            return
+        parent = os.path.dirname(path)
+        if not os.path.isdir(parent):
+            try:
+                os.makedirs(parent)
+            except OSError:
+                if not os.path.isdir(parent):
+                    raise
+        # 読み込み中のプロセスに書きかけのファイルを見せないよう、一時ファイルから置き換える
+        fd, tmp = tempfile.mkstemp(dir=parent)
+        # os.write は一部しか書き込まないことがあるため、ファイルオブジェクトで全て書き込む
+        f = os.fdopen(fd, "wb")
+        try:
+            f.write(data)
+        finally:
+            f.close()
+        os.rename(tmp, path)
+
+    def _total(self):
+        row = self._conn.execute("SELECT SUM(size) FROM (SELECT MAX(size) AS size FROM icons GROUP BY digest)")
+        return row.fetchone()[0] or 0
+
+    def _evict(self):
+        total = self._total()
+        while total > self.max_bytes:
+            row = self._conn.execute("SELECT user_id, digest FROM icons ORDER BY accessed LIMIT 1").fetchone()
+            if row is None:
+                return
+            self._conn.execute("DELETE FROM icons WHERE user_id = ?", (row[0],))
+            self._release(row[1])
+            total = self._total()
+
+    def _release(self, digest):
+        # 他のユーザが同じ画像を参照していなければファイルを削除する
+        if self._conn.execute("SELECT 1 FROM icons WHERE digest = ? LIMIT 1", (digest,)).fetchone() is None:
+            self._remove(digest)
+
+    def _remove(self, digest):
+        try:
+            os.remove(self._path(digest))
+        except OSError:
+            pass
@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+"""
+XML-RPC のメソッドごとに、呼び出しの所要時間や送受信したバイト数を記録するモジュールです。
+
+    histogram = HistogramSink()
+    backlog = Backlog("space", "username", "password", transport=PooledSafeTransport(),
+                      instrumentation=Instrumentation(histogram, LogSink()))
+    backlog.find_issue({"projectId": 1})
+    print histogram.snapshot()["backlog.findIssue"]
+
+1 回の呼び出しごとに CallRecord を作り、登録した sink に渡します。CallRecord の所要時間は
+
+  * network: リクエストの送信からレスポンスの受信まで
+  * unmarshal: レスポンスの XML の解析 (factories に登録したメソッドではモデルオブジェクトの生成を含む)
+  * model: Backlog のメソッドが XML-RPC の戻り値をモデルオブジェクトに変換する時間
+
+に分けて記録します。unmarshal と response_bytes は PooledTransport を使っている場合だけ計測し、
+それ以外のトランスポートでは解析の時間も network に含まれます。
+find_issue_stream などのストリームで取得する呼び出しは、呼び出し元が要素を処理している時間を含めずに計測し、
+レスポンスを読み終えた時点で記録します。
+instrumentation を渡さない場合は、メソッドの置き換えなども行わないため、ほとんどコストはかかりません。
+"""
+import bisect
+import logging
+import threading
+import time
+
+from models import Serializable
+
+_local = threading.local()
+
+
+def current():
+    """
+    このスレッドで実行中の XML-RPC の呼び出しの CallRecord を返す。計測していない場合は None
+    """
+    return getattr(_local, "record", None)
+
+
+def activate(record):
+    """
+    このスレッドで実行中の CallRecord を record にし、それまでのものを返す。
+    ストリームのように呼び出し元と交互に実行する呼び出しで、計測する区間を切り替えるために使う
+    """
+    previous = current()
+    _local.record = record
+    return previous
+
+
+class CallRecord(object):
+    """
+    1 回の XML-RPC の呼び出しの計測結果。時間の単位は秒
+    """
+    __slots__ = ("method", "wall", "network", "unmarshal", "model", "request_bytes", "response_bytes",
+                 "objects", "error", "cached")
+
+    def __init__(self, method):
+        self.method = method
+        self.wall = 0.0
+        self.network = 0.0
+        self.unmarshal = 0.0
+        self.model = 0.0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.objects = 0
+        self.error = None
+        # キャッシュから返した場合は True。network などは 0 のままとなる
+        self.cached = True
+
+    def __repr__(self):
+        return ("%s wall=%.1fms network=%.1fms unmarshal=%.1fms model=%.1fms request=%dB response=%dB "
+                "objects=%d%s%s" % (self.method, self.wall * 1000, self.network * 1000, self.unmarshal * 1000,
+                                    self.model * 1000, self.request_bytes, self.response_bytes, self.objects,
+                                    " cached" if self.cached else "", " error=%s" % self.error if self.error else ""))
+
+
+class Instrumentation(object):
+    """
+    BacklogBase の instrumentation に渡すオブジェクト。記録した CallRecord を全ての sink に渡す
+    """
+
+    def __init__(self, *sinks):
+        self.sinks = list(sinks)
+
+    def begin(self, methodname):
+        record = CallRecord(methodname)
+        _local.record = record
+        return record
+
+    def end(self, record, start, error=None):
+        _local.record = None
+        record.wall = time.time() - start
+        if error is not None:
+            record.error = error.__class__.__name__
+        scope = getattr(_local, "scope", None)
+        if scope is not None:
+            # Backlog のメソッドの中での呼び出しは、モデルオブジェクトへの変換を計測してから出力する
+            scope.append(record)
+        else:
+            self.emit(record)
+
+    def emit(self, record):
+        for sink in self.sinks:
+            sink.record(record)
+
+    def wrap(self, method):
+        """
+        Backlog のメソッドを、XML-RPC の戻り値の変換にかかった時間と生成したオブジェクトの数を
+        そのメソッド内の最後の呼び出しの CallRecord に計上するよう置き換える
+        """
+
+        def wrapper(*args, **kwargs):
+            outer = getattr(_local, "scope", None)
+            scope = _local.scope = []
+            start = time.time()
+            ret = None
+            try:
+                ret = method(*args, **kwargs)
+                return ret
+            finally:
+                _local.scope = outer
+                if scope:
+                    last = scope[-1]
+                    last.model = max(0.0, time.time() - start - sum([x.wall for x in scope]))
+                    # ストリームで取得した場合など、戻り値から数えられないときは呼び出しで数えた数を残す
+                    last.objects = _count(ret) or last.objects
+                for record in scope:
+                    if outer is not None:
+                        outer.append(record)
+                    else:
+                        self.emit(record)
+
+        wrapper.__name__ = method.__name__
+        wrapper.__doc__ = method.__doc__
+        return wrapper
+
+
+def _count(ret):
+    if isinstance(ret, Serializable):
+        return 1
+    if isinstance(ret, list):
+        return len([x for x in ret if isinstance(x, Serializable)])
+    return 0
+
+
+class HistogramSink(object):
+    """
+    メソッドごとに CallRecord を集計し、wall の分布を対数の幅のバケットで保持する sink
+    """
+
+    # バケットの上限 (秒)。1ms から 2 倍ずつ、約 65 秒まで
+    BOUNDS = [0.001 * (2 ** i) for i in range(17)]
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, record):
+        self._lock.acquire()
+        try:
+            stats = self._stats.get(record.method)
+            if stats is None:
+                stats = self._stats[record.method] = {
+                    "calls": 0, "errors": 0, "cached": 0, "wall": 0.0, "network": 0.0, "unmarshal": 0.0,
+                    "model": 0.0, "request_bytes": 0, "response_bytes": 0, "objects": 0,
+                    "buckets": [0] * (len(self.BOUNDS) + 1)}
+            stats["calls"] += 1
+            stats["errors"] += record.error is not None
+            stats["cached"] += record.cached
+            for k in ("wall", "network", "unmarshal", "model", "request_bytes", "response_bytes", "objects"):
+                stats[k] += getattr(record, k)
+            stats["buckets"][bisect.bisect_left(self.BOUNDS, record.wall)] += 1
+        finally:
+            self._lock.release()
+
+    def snapshot(self):
+        """
+        メソッド名と、その集計結果の dict を返す
+        """
+        self._lock.acquire()
+        try:
+            ret = {}
+            for method, stats in self._stats.iteritems():
+                ret[method] = dict(stats, buckets=list(stats["buckets"]))
+            return ret
+        finally:
+            self._lock.release()
+
+    def percentile(self, method, p):
+        """
+        method の wall の p (0 - 1) 分位点を、それを含むバケットの上限で返す
+        """
+        stats = self.snapshot().get(method)
+        if not stats:
+            return None
+        rank = p * stats["calls"]
+        seen = 0
+        for i, count in enumerate(stats["buckets"]):
+            seen += count
+            if count and seen >= rank:
+                return self.BOUNDS[i] if i < len(self.BOUNDS) else float("inf")
+
+    def reset(self):
+        self._lock.acquire()
+        try:
+            self._stats.clear()
+        finally:
+            self._lock.release()
+
+
+class LogSink(object):
+    """
+    CallRecord を 1 行のログとして出力する sink
+    """
+
+    def __init__(self, logger=None, level=logging.INFO):
+        self.logger = logger or logging.getLogger("backloglib.instrument")
+        self.level = level
+
+    def record(self, record):
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, "%r", record)
+
+
+class CallbackSink(object):
+    """
+    CallRecord ごとに callback(record) を呼び出す sink
+    """
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def record(self, record):
+        self.callback(record)
@@ -0,0 +1,314 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+"""
+課題やマスタデータを SQLite に複製し、手元で検索するためのモジュールです。
+
+    mirror = IssueMirror("/var/lib/backlog/mirror.db")
+    mirror.refresh_master(backlog, project_id)
+    IssueSync(backlog, SqliteWatermarkStore("/var/lib/backlog/sync.db"), mirror.put_issues).run(project_id)
+
+    issues = mirror.find_issue({"projectId": project_id, "statusId": [1, 2], "due_date_max": "20140331"})
+    count = mirror.count_issue({"projectId": project_id, "assignerId": 3})
+
+find_issue / count_issue は Backlog の同名のメソッドと同じ FindCondition の条件を受け付け、
+同じモデルクラスのオブジェクトを返します。ただし limit を省略した場合は、条件に一致する全ての課題を返します。
+"""
+import json
+import sqlite3
+import threading
+
+import compact
+import models
+from models import FindCondition
+
+# findIssue の sort に指定できる値と、並べ替えに使う列
+SORT_COLUMNS = {"ISSUE_TYPE": "issue_type_id", "SUMMARY": "summary", "PRIORITY": "priority_id",
+                "STATUS": "status_id", "CREATED": "created_on", "UPDATED": "updated_on", "START_DATE": "start_date",
+                "LIMIT_DATE": "due_date", "ASSIGNER": "assigner_id", "CREATED_USER": "created_user_id"}
+
+# FindCondition の条件と、それを比較する列
+_ID_COLUMNS_ = {"issueTypeId": "issue_type_id", "statusId": "status_id", "priorityId": "priority_id",
+                "assignerId": "assigner_id", "createdUserId": "created_user_id", "resolutionId": "resolution_id"}
+_LINK_TABLES_ = {"componentId": "issue_components", "versionId": "issue_versions", "milestoneId": "issue_milestones"}
+_DATE_COLUMNS_ = ["created_on", "updated_on", "start_date", "due_date"]
+
+# compact 引数に応じて検索結果に使うクラスのモジュール
+_MODELS_ = {False: models, True: compact}
+
+_SCHEMA_ = [
+    "CREATE TABLE IF NOT EXISTS issues (id INTEGER PRIMARY KEY, key TEXT UNIQUE, project_id INTEGER, "
+    "issue_type_id INTEGER, issue_type TEXT, status_id INTEGER, priority_id INTEGER, assigner_id INTEGER, "
+    "created_user_id INTEGER, resolution_id INTEGER, start_date TEXT, due_date TEXT, created_on TEXT, "
+    "updated_on TEXT, summary TEXT, description TEXT, data TEXT)",
+    "CREATE INDEX IF NOT EXISTS issues_status ON issues (project_id, status_id)",
+    "CREATE INDEX IF NOT EXISTS issues_assigner ON issues (project_id, assigner_id)",
+    "CREATE INDEX IF NOT EXISTS issues_issue_type ON issues (project_id, issue_type_id)",
+    "CREATE INDEX IF NOT EXISTS issues_priority ON issues (project_id, priority_id)",
+    "CREATE INDEX IF NOT EXISTS issues_created_user ON issues (project_id, created_user_id)",
+    "CREATE INDEX IF NOT EXISTS issues_resolution ON issues (project_id, resolution_id)",
+    "CREATE INDEX IF NOT EXISTS issues_created_on ON issues (project_id, created_on)",
+    "CREATE INDEX IF NOT EXISTS issues_updated_on ON issues (project_id, updated_on)",
+    "CREATE INDEX IF NOT EXISTS issues_start_date ON issues (project_id, start_date)",
+    "CREATE INDEX IF NOT EXISTS issues_due_date ON issues (project_id, due_date)",
+    "CREATE TABLE IF NOT EXISTS comments (id INTEGER PRIMARY KEY, issue_id INTEGER, created_on TEXT, data TEXT)",
+    "CREATE INDEX IF NOT EXISTS comments_issue ON comments (issue_id, created_on)",
+    "CREATE TABLE IF NOT EXISTS projects (id INTEGER PRIMARY KEY, key TEXT UNIQUE, data TEXT)",
+    "CREATE TABLE IF NOT EXISTS versions (id INTEGER PRIMARY KEY, project_id INTEGER, data TEXT)",
+    "CREATE INDEX IF NOT EXISTS versions_project ON versions (project_id)",
+    "CREATE TABLE IF NOT EXISTS components (id INTEGER PRIMARY KEY, project_id INTEGER, data TEXT)",
+    "CREATE INDEX IF NOT EXISTS components_project ON components (project_id)",
+    "CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY, data TEXT)",
+    "CREATE TABLE IF NOT EXISTS project_users (project_id INTEGER, user_id INTEGER, "
+    "PRIMARY KEY (project_id, user_id))",
+]
+# 課題とカテゴリ / 発生バージョン / マイルストーンの関連
+for _table in _LINK_TABLES_.itervalues():
+    _SCHEMA_.append("CREATE TABLE IF NOT EXISTS %s (issue_id INTEGER, ref_id INTEGER, "
+                    "PRIMARY KEY (issue_id, ref_id))" % _table)
+    _SCHEMA_.append("CREATE INDEX IF NOT EXISTS %s_ref ON %s (ref_id)" % (_table, _table))
+
+
+def _raw(obj):
+    """
+    モデルオブジェクトを、XML-RPC のレスポンスと同じ形の dict に戻す
+    """
+    if isinstance(obj, dict):
+        return obj
+    ret = obj.serialize()
+    if "udpated_on" in ret:
+        # Comment は updated_on を udpated_on という属性で保持している
+        ret["updated_on"] = ret.pop("udpated_on")
+    return ret
+
+
+def _id(value):
+    return value.get("id") if value else None
+
+
+def _ids(value):
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+
+class IssueMirror(object):
+    """
+    課題、コメント、プロジェクト、バージョン、カテゴリ、ユーザを保持する SQLite のデータベース
+
+    compact を True にすると、検索結果を compact モジュールのクラスで返す
+    """
+
+    def __init__(self, path=":memory:", compact=False):
+        self.models = _MODELS_[bool(compact)]
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        for statement in _SCHEMA_:
+            self._conn.execute(statement)
+
+    def close(self):
+        self._conn.close()
+
+    # 書き込み
+
+    def put_issues(self, issues):
+        """
+        課題を追加または更新する。IssueSync の sink としてそのまま使える
+        """
+        rows = []
+        links = dict([(table, []) for table in _LINK_TABLES_.itervalues()])
+        for issue in issues:
+            x = _raw(issue)
+            issue_type = x.get("issueType") or {}
+            rows.append((x["id"], x["key"], x.get("projectId"), issue_type.get("id"), issue_type.get("name"),
+                         _id(x.get("status")), _id(x.get("priority")), _id(x.get("assigner")),
+                         _id(x.get("created_user")), _id(x.get("resolution")), x.get("start_date"),
+                         x.get("due_date"), x.get("created_on"), x.get("updated_on"), x.get("summary"),
+                         x.get("description"), json.dumps(x)))
+            for field, table in (("components", "issue_components"), ("versions", "issue_versions"),
+                                 ("milestones", "issue_milestones")):
+                links[table].extend([(x["id"], ref["id"]) for ref in x.get(field) or []])
+        ids = [(row[0],) for row in rows]
+
+        def write(conn):
+            conn.executemany("INSERT OR REPLACE INTO issues VALUES (%s)" % ", ".join(["?"] * 17), rows)
+            for table, values in links.iteritems():
+                conn.executemany("DELETE FROM %s WHERE issue_id = ?" % table, ids)
+                conn.executemany("INSERT OR IGNORE INTO %s (issue_id, ref_id) VALUES (?, ?)" % table, values)
+
+        self._write(write)
+
+    def put_comments(self, issue_id, comments):
+        rows = []
+        for comment in comments:
+            x = _raw(comment)
+            rows.append((x["id"], issue_id, x.get("created_on"), json.dumps(x)))
+        self._write(lambda conn: conn.executemany("INSERT OR REPLACE INTO comments VALUES (?, ?, ?, ?)", rows))
+
+    def put_projects(self, projects):
+        rows = [(x["id"], x["key"], json.dumps(x)) for x in map(_raw, projects)]
+        self._write(lambda conn: conn.executemany("INSERT OR REPLACE INTO projects VALUES (?, ?, ?)", rows))
+
+    def put_versions(self, project_id, versions):
+        rows = [(x["id"], project_id, json.dumps(x)) for x in map(_raw, versions)]
+        self._write(lambda conn: conn.executemany("INSERT OR REPLACE INTO versions VALUES (?, ?, ?)", rows))
+
+    def put_components(self, project_id, components):
+        rows = [(x["id"], project_id, json.dumps(x)) for x in map(_raw, components)]
+        self._write(lambda conn: conn.executemany("INSERT OR REPLACE INTO components VALUES (?, ?, ?)", rows))
+
+    def put_users(self, users, project_id=None):
+        """
+        ユーザを追加または更新する。project_id を指定した場合は、そのプロジェクトの参加者を置き換える
+        """
+        rows = [(x["id"], json.dumps(x)) for x in map(_raw, users)]
+
+        def write(conn):
+            conn.executemany("INSERT OR REPLACE INTO users VALUES (?, ?)", rows)
+            if project_id is not None:
+                conn.execute("DELETE FROM project_users WHERE project_id = ?", (project_id,))
+                conn.executemany("INSERT INTO project_users VALUES (?, ?)", [(project_id, row[0]) for row in rows])
+
+        self._write(write)
+
+    def delete_issues(self, ids):
+        ids = [(x,) for x in ids]
+
+        def write(conn):
+            conn.executemany("DELETE FROM issues WHERE id = ?", ids)
+            conn.executemany("DELETE FROM comments WHERE issue_id = ?", ids)
+            for table in _LINK_TABLES_.itervalues():
+                conn.executemany("DELETE FROM %s WHERE issue_id = ?" % table, ids)
+
+        self._write(write)
+
+    def refresh_master(self, backlog, project_id):
+        """
+        project_id のプロジェクト、バージョン、カテゴリ、ユーザを backlog から取得し直す
+        """
+        self.put_projects([backlog.get_project(project_id)])
+        self.put_versions(project_id, backlog.get_versions(project_id))
+        self.put_components(project_id, backlog.get_components(project_id))
+        self.put_users(backlog.get_users(project_id), project_id)
+
+    # 検索
+
+    def get_issue(self, key):
+        column = "id" if isinstance(key, (int, long)) else "key"
+        rows = self._query("SELECT data FROM issues WHERE %s = ?" % column, (key,))
+        return self.models.Issue(**json.loads(rows[0][0])) if rows else None
+
+    def get_comments(self, issue_id):
+        rows = self._query("SELECT data FROM comments WHERE issue_id = ? ORDER BY created_on, id", (issue_id,))
+        return [self.models.Comment(**json.loads(row[0])) for row in rows]
+
+    def get_projects(self):
+        return [self.models.Project(**json.loads(row[0])) for row in self._query("SELECT data FROM projects "
+                                                                                 "ORDER BY id")]
+
+    def get_project(self, key):
+        column = "id" if isinstance(key, (int, long)) else "key"
+        rows = self._query("SELECT data FROM projects WHERE %s = ?" % column, (key,))
+        return self.models.Project(**json.loads(rows[0][0])) if rows else None
+
+    def get_versions(self, project_id):
+        rows = self._query("SELECT data FROM versions WHERE project_id = ? ORDER BY id", (project_id,))
+        return [self.models.Version(**json.loads(row[0])) for row in rows]
+
+    def get_components(self, project_id):
+        rows = self._query("SELECT data FROM components WHERE project_id = ? ORDER BY id", (project_id,))
+        return [self.models.Component(**json.loads(row[0])) for row in rows]
+
+    def get_users(self, project_id=None):
+        if project_id is None:
+            rows = self._query("SELECT data FROM users ORDER BY id")
+        else:
+            rows = self._query("SELECT u.data FROM users u JOIN project_users p ON u.id = p.user_id "
+                               "WHERE p.project_id = ? ORDER BY u.id", (project_id,))
+        return [self.models.User(**json.loads(row[0])) for row in rows]
+
+    def count_issue(self, condition):
+        if not isinstance(condition, FindCondition):
+            condition = FindCondition(condition)
+        where, args = self._where(condition.serialize())
+        return self._query("SELECT COUNT(*) FROM issues i" + where, args)[0][0]
+
+    def find_issue(self, condition):
+        if not isinstance(condition, FindCondition):
+            condition = FindCondition(condition)
+        params = condition.serialize()
+        where, args = self._where(params)
+        column = SORT_COLUMNS.get(params.get("sort"), "created_on")
+        direction = "ASC" if params.get("order") else "DESC"
+        sql = "SELECT data FROM issues i%s ORDER BY i.%s %s, i.id %s" % (where, column, direction, direction)
+        if params.get("limit") is not None or params.get("offset"):
+            sql += " LIMIT ? OFFSET ?"
+            args += [params.get("limit", -1), params.get("offset", 0)]
+        return [self.models.Issue(**json.loads(row[0])) for row in self._query(sql, args)]
+
+    def _where(self, params):
+        clauses = []
+        args = []
+        if params.get("projectId") is not None:
+            clauses.append("i.project_id = ?")
+            args.append(params["projectId"])
+        for name, column in _ID_COLUMNS_.iteritems():
+            if params.get(name) is not None:
+                ids = _ids(params[name])
+                clauses.append("i.%s IN (%s)" % (column, ", ".join(["?"] * len(ids))))
+                args.extend(ids)
+        if params.get("issueType") is not None:
+            clauses.append("i.issue_type = ?")
+            args.append(params["issueType"])
+        for name, table in _LINK_TABLES_.iteritems():
+            if params.get(name) is not None:
+                ids = _ids(params[name])
+                clauses.append("i.id IN (SELECT issue_id FROM %s WHERE ref_id IN (%s))"
+                               % (table, ", ".join(["?"] * len(ids))))
+                args.extend(ids)
+        for column in _DATE_COLUMNS_:
+            # 条件は yyyyMMdd なので、yyyyMMddHHmmss の列はその日の終わりまでを含める
+            if params.get(column + "_min"):
+                clauses.append("i.%s >= ?" % column)
+                args.append(params[column + "_min"])
+            if params.get(column + "_max"):
+                clauses.append("i.%s <= ?" % column)
+                args.append(params[column + "_max"] + "999999")
+        if params.get("query"):
+            clauses.append("(i.summary LIKE ? OR i.description LIKE ?)")
+            args.extend(["%%%s%%" % params["query"]] * 2)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), args
+
+    def _query(self, sql, args=()):
+        self._lock.acquire()
+        try:
+            return self._conn.execute(sql, args).fetchall()
+        finally:
+            self._lock.release()
+
+    def _write(self, write):
+        self._lock.acquire()
+        try:
+            self._conn.execute("BEGIN")
+            try:
+                write(self._conn)
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        finally:
+            self._lock.release()
@@ -30,9 +30,11 @@ class Serializable(object):
     """
     XML-RPC 用に marshall するためのメソッドを持つクラス
     """
+    # compact モジュールのクラスが __dict__ を持たずに済むよう、ここでは属性を定義しない
+    __slots__ = ()
 
     def serialize(self):
-        return self._do_convert(vars(self))
+        return _serialize(self.__class__, vars(self))
 
     def _do_convert(self, obj):
         if isinstance(obj, types.DictType):
@@ -41,10 +43,61 @@ class Serializable(object):
             return [self._do_convert(v) for v in obj]
         elif hasattr(obj, "__dict__"):
             return self._do_convert(vars(obj))
+        elif isinstance(obj, Serializable):
+            return self._do_convert(obj.__getstate__())
         else:
             return obj
 
 
+# そのまま marshall できる値の型
+_SCALAR_TYPES_ = frozenset([types.IntType, types.LongType, types.FloatType, types.BooleanType,
+                            types.StringType, types.UnicodeType])
+
+# (クラス, 属性名の並び) ごとに生成した serialize 用の関数
+_SERIALIZERS_ = {}
+_MAX_SERIALIZERS_ = 1024
+
+
+def _serialize(cls, attrs):
+    """
+    attrs を Serializable._do_convert と同じ dict に変換する。
+    クラスと属性名の並びごとに専用の関数を生成して使い回すため、
+    結果のキーの順序 (= marshall した結果) も _do_convert と同じになる
+    """
+    key = (cls, tuple(attrs))
+    serializer = _SERIALIZERS_.get(key)
+    if serializer is None:
+        if len(_SERIALIZERS_) >= _MAX_SERIALIZERS_:
+            return _do_convert(attrs)
+        serializer = _SERIALIZERS_[key] = _compile_serializer(key[1])
+    return serializer(attrs)
+
+
+def _compile_serializer(names):
+    lines = ["def serializer(attrs):",
+             "    ret = {}"]
+    for name in names:
+        lines.append("    v = attrs[%r]" % name)
+        lines.append("    if v is not None:")
+        lines.append("        ret[%r] = v if v.__class__ in _SCALAR_TYPES_ else _convert(v)" % name)
+    lines.append("    return ret")
+    namespace = {"_SCALAR_TYPES_": _SCALAR_TYPES_, "_convert": _convert}
+    exec "\n".join(lines) + "\n" in namespace
+    return namespace["serializer"]
+
+
+def _convert(v):
+    if isinstance(v, Serializable):
+        return v.serialize()
+    elif isinstance(v, types.ListType) or isinstance(v, types.TupleType):
+        return [x if x.__class__ in _SCALAR_TYPES_ else _convert(x) for x in v]
+    else:
+        return _do_convert(v)
+
+
+_do_convert = Serializable()._do_convert
+
+
 class BacklogObject(Serializable):
     _REPR_FORMAT_ = "[%(id)s] %(name)s"
 
@@ -177,14 +230,82 @@ class Issue(BacklogObject):
 
     def __init__(self, **kwargs):
         for k, v in kwargs.iteritems():
-            val = v
+            self.__dict__[k] = Issue._convert(k, v)
+
+    @staticmethod
+    def _convert(k, v):
+        if not Issue._CONVERTERS_.has_key(k):
+            return v
+        converter = Issue._CONVERTERS_[k]
+        if isinstance(v, types.ListType) or isinstance(v, types.TupleType):
+            return [converter(**x) for x in v]
+        return converter(**v)
+
+
+class LazyIssue(Issue):
+    """
+    ネストしたフィールド (assigner, status, versions など) を XML-RPC の値のまま保持しておき、
+    最初にアクセスされた時点で Issue と同じモデルオブジェクトに変換する Issue
+    """
+
+    def __init__(self, **kwargs):
+        raw = {}
+        for k, v in kwargs.iteritems():
             if Issue._CONVERTERS_.has_key(k):
-                converter = Issue._CONVERTERS_[k]
-                if isinstance(v, types.ListType) or isinstance(v, types.TupleType):
-                    val = [converter(**x) for x in v]
-                else:
-                    val = converter(**v)
-            self.__dict__[k] = val
+                raw[k] = v
+            else:
+                self.__dict__[k] = v
+        if raw:
+            # serialize の結果を Issue と同じ順序にするため、フィールドの順序も保持しておく
+            self.__dict__["_lazy_"] = (kwargs.keys(), raw)
+
+    def __getattr__(self, name):
+        lazy = self.__dict__.get("_lazy_")
+        if not lazy or name not in lazy[1]:
+            raise AttributeError("'%s' object has no attribute '%s'" % (self.__class__.__name__, name))
+        val = Issue._convert(name, lazy[1].pop(name))
+        self.__dict__[name] = val
+        return val
+
+    def __setattr__(self, name, value):
+        # 代入した値を hydrate で未変換の値に戻さないよう、未変換の値を捨てる
+        self._discard(name)
+        self.__dict__[name] = value
+
+    def __delattr__(self, name):
+        if not self._discard(name) or name in self.__dict__:
+            object.__delattr__(self, name)
+
+    def _discard(self, name):
+        """
+        未変換の name を捨て、捨てたかどうかを返す
+        """
+        lazy = self.__dict__.get("_lazy_")
+        if not lazy or name not in lazy[1]:
+            return False
+        del lazy[1][name]
+        return True
+
+    def hydrate(self):
+        """
+        未変換のフィールドを全て変換し、Issue と同じ状態にする
+        """
+        lazy = self.__dict__.pop("_lazy_", None)
+        if not lazy:
+            return
+        keys, raw = lazy
+        for k, v in raw.iteritems():
+            self.__dict__[k] = Issue._convert(k, v)
+        attrs = self.__dict__.copy()
+        self.__dict__.clear()
+        for k in keys:
+            if k in attrs:
+                self.__dict__[k] = attrs.pop(k)
+        self.__dict__.update(attrs)
+
+    def serialize(self):
+        self.hydrate()
+        return super(LazyIssue, self).serialize()
 
 
 class Comment(BacklogObject):
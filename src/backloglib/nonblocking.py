@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+"""
+呼び出し元をブロックしない Backlog / BacklogAdmin のクライアントです。
+
+各メソッドは Backlog / BacklogAdmin と同じ名前・引数で、すぐに Future を返します。
+API の呼び出しはワーカースレッドで PooledSafeTransport の接続を使い回して行い、
+Future の結果は models のクラスとなります。
+
+    backlog = AsyncBacklog("space", "username", "password", max_workers=16)
+    future = backlog.get_projects()
+    future.add_done_callback(lambda f: handle(f.result()))
+"""
+import types
+
+from backloglib import Backlog, BacklogAdmin
+from transport import PooledSafeTransport
+from workers import WorkerPool
+
+# 結果を逐次返すものや、呼び出し元で組み立てるものは対象外。
+# ジェネレータを返すメソッドを Future にすると、取得は結果を取り出す呼び出し元のスレッドで行われてしまう
+_EXCLUDES_ = ["batch", "iter_issues", "find_issue_stream", "get_timeline_stream"]
+
+
+class AsyncBacklogBase(object):
+    _CLIENT_CLASS_ = None
+
+    def __init__(self, space, username, password, domain="backlog.jp", max_workers=8, transport=None, **options):
+        """
+        options は cache など、Backlog / BacklogAdmin にそのまま渡す引数
+        """
+        if transport is None:
+            transport = PooledSafeTransport(pool_size=max_workers)
+        self.client = self._CLIENT_CLASS_(space, username, password, domain=domain, transport=transport, **options)
+        self._pool = WorkerPool(max_workers)
+
+    def close(self):
+        """
+        ワーカースレッドを止め、プールしている接続を閉じる
+        """
+        self._pool.shutdown()
+        if self.client.transport:
+            self.client.transport.close()
+
+    def _submit(self, name, args, kwargs):
+        return self._pool.submit(getattr(self.client, name), *args, **kwargs)
+
+
+def _async_method(name, method):
+    def call(self, *args, **kwargs):
+        return self._submit(name, args, kwargs)
+
+    call.__name__ = name
+    call.__doc__ = method.__doc__
+    return call
+
+
+def _asyncify(name, clazz):
+    """
+    clazz の公開メソッドを、Future を返すメソッドに置き換えたクラスを作る
+    """
+    attrs = {"_CLIENT_CLASS_": clazz}
+    for attr in dir(clazz):
+        value = getattr(clazz, attr)
+        if attr.startswith("_") or attr in _EXCLUDES_:
+            continue
+        if isinstance(value, types.MethodType):
+            attrs[attr] = _async_method(attr, value)
+        elif attr.isupper():
+            # BacklogAdmin.ROLE_ADMIN などの定数
+            attrs[attr] = value
+    return type(name, (AsyncBacklogBase,), attrs)
+
+
+AsyncBacklog = _asyncify("AsyncBacklog", Backlog)
+AsyncBacklogAdmin = _asyncify("AsyncBacklogAdmin", BacklogAdmin)
@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+"""
+BacklogBase が利用する ServerProxy です。
+
+全ての XML-RPC の呼び出しは _invoke を通るため、キャッシュや流量の制限など呼び出し単位の処理はここで行います。
+factories に登録したメソッドのレスポンスは、PooledTransport を使っている場合は解析しながら
+モデルオブジェクトに変換します。
+"""
+import httplib
+import socket
+import time
+import urllib
+from xmlrpclib import ProtocolError, ServerProxy, _Method, dumps
+
+import instrument
+from throttle import is_read_method
+from transport import PooledTransport
+
+
+class BacklogServerProxy(ServerProxy):
+    def __init__(self, uri, transport=None, cache=None, limiter=None, controller=None, retry=None,
+                 instrumentation=None):
+        ServerProxy.__init__(self, uri, transport=transport)
+        self.cache = cache
+        self.instrumentation = instrumentation
+        self.retry = retry
+        self.limiter = limiter
+        self.controller = controller
+        # XML-RPC のメソッド名と、そのレスポンスの struct を変換するクラス
+        self.factories = {}
+        # 取得できるマスタデータはユーザのプロジェクトの権限で変わるため、キャッシュは (接続先, ユーザ名) ごとに分ける。
+        # パスワードはキーに含めない
+        userinfo, host = urllib.splituser(self._ServerProxy__host)
+        self.cache_namespace = (host, userinfo and urllib.unquote(urllib.splitpasswd(userinfo)[0]))
+
+    def __getattr__(self, name):
+        return _Method(self._invoke, name)
+
+    def _invoke(self, methodname, params):
+        if self.instrumentation is None:
+            return self._fetch(methodname, params)
+
+        record = self.instrumentation.begin(methodname)
+        start = time.time()
+        try:
+            ret = self._fetch(methodname, params)
+        except Exception, e:
+            self.instrumentation.end(record, start, e)
+            raise
+        self.instrumentation.end(record, start)
+        return ret
+
+    def _fetch(self, methodname, params):
+        if self.cache is not None:
+            return self.cache.call(self.cache_namespace, methodname, params, self._call)
+        return self._call(methodname, params)
+
+    def _call(self, methodname, params):
+        if self.retry is not None:
+            return self.retry.call(methodname, params, self._attempt)
+        return self._attempt(methodname, params)
+
+    def _attempt(self, methodname, params):
+        # キャッシュから返せなかった呼び出しだけを流量の制限の対象にする。やり直す場合は試行ごとに数える
+        if self.limiter is not None:
+            self.limiter.acquire(methodname)
+        if self.controller is None:
+            return self._request(methodname, params)
+
+        self.controller.acquire()
+        start = time.time()
+        congested = False
+        try:
+            return self._request(methodname, params)
+        except (ProtocolError, socket.error, httplib.HTTPException):
+            congested = True
+            raise
+        finally:
+            self.controller.release(time.time() - start, congested)
+
+    def _is_idempotent(self, methodname):
+        # RetryPolicy があればその判定に従い、無ければ参照系だけを冪等とする
+        if self.retry is not None:
+            return self.retry.is_idempotent(methodname)
+        return is_read_method(methodname)
+
+    def _request(self, methodname, params):
+        transport = self._ServerProxy__transport
+        body = self._dumps(methodname, params)
+        options = {}
+        if isinstance(transport, PooledTransport):
+            options["idempotent"] = self._is_idempotent(methodname)
+            factory = self.factories.get(methodname)
+            if factory is not None:
+                options["factory"] = factory
+
+        record = instrument.current()
+        if record is None:
+            response = transport.request(self._ServerProxy__host, self._ServerProxy__handler, body,
+                                         verbose=self._ServerProxy__verbose, **options)
+        else:
+            # unmarshal は PooledTransport が計測して加算するので、それ以外を network とする
+            record.cached = False
+            record.request_bytes = len(body)
+            unmarshal = record.unmarshal
+            start = time.time()
+            try:
+                response = transport.request(self._ServerProxy__host, self._ServerProxy__handler, body,
+                                             verbose=self._ServerProxy__verbose, **options)
+            finally:
+                record.network += time.time() - start - (record.unmarshal - unmarshal)
+        if len(response) == 1:
+            response = response[0]
+        return response
+
+    def stream(self, methodname, params, factory=None):
+        """
+        配列を返すメソッドを呼び出し、要素を受信した順にモデルオブジェクトに変換して返すジェネレータ。
+        factory を渡すと、factories に登録したクラスの代わりに factory(**struct) で変換する。
+        PooledTransport 以外の場合は、レスポンス全体を受信してから変換する。
+        PooledTransport の場合は、要素を返し始めた後に失敗してもやり直さない。
+        instrumentation の CallRecord の wall / network / unmarshal は、呼び出し元が要素を処理している時間を含まない。
+        要素を処理している間は PooledTransport と AIMDController の枠を手放すため、ループの中で他の API を呼び出せる
+        """
+        transport = self._ServerProxy__transport
+        if factory is None:
+            factory = self.factories[methodname]
+        if not isinstance(transport, PooledTransport):
+            for x in self._invoke(methodname, params):
+                yield factory(**x)
+            return
+
+        body = self._dumps(methodname, params)
+        record = None
+        if self.instrumentation is not None:
+            record = self.instrumentation.begin(methodname)
+            # begin で切り替わった計測中の CallRecord は、transport を実行している間だけ record にする
+            instrument.activate(None)
+            record.cached = False
+            record.request_bytes = len(body)
+        if self.limiter is not None:
+            self.limiter.acquire(methodname)
+        if self.controller is not None:
+            self.controller.acquire()
+        held = True
+        # 呼び出し元が要素を処理している時間を除いた所要時間
+        elapsed = 0.0
+        error = None
+        congested = False
+        batches = transport.stream_batches(self._ServerProxy__host, self._ServerProxy__handler, body, factory,
+                                           verbose=self._ServerProxy__verbose,
+                                           idempotent=self._is_idempotent(methodname))
+        try:
+            while 1:
+                if not held:
+                    self.controller.acquire()
+                    held = True
+                previous = instrument.activate(record)
+                start = time.time()
+                try:
+                    batch = next(batches, None)
+                finally:
+                    elapsed += time.time() - start
+                    instrument.activate(previous)
+                if batch is None:
+                    break
+                if record is not None:
+                    record.objects += len(batch)
+                # 呼び出し元の処理中に他の API を呼び出せるよう、同時実行数の枠を手放しておく
+                if self.controller is not None:
+                    self.controller.suspend()
+                    held = False
+                for x in batch:
+                    yield x
+        except (ProtocolError, socket.error, httplib.HTTPException), e:
+            congested = True
+            error = e
+            raise
+        except Exception, e:
+            error = e
+            raise
+        finally:
+            batches.close()
+            if self.controller is not None:
+                if held:
+                    self.controller.release(elapsed, congested)
+                else:
+                    self.controller.report(elapsed, congested)
+            if record is not None:
+                # wall と network も呼び出し元の処理の時間を除く
+                record.network = max(0.0, elapsed - record.unmarshal)
+                previous = instrument.current()
+                self.instrumentation.end(record, time.time() - elapsed, error)
+                instrument.activate(previous)
+
+    def _dumps(self, methodname, params):
+        return dumps(params, methodname, encoding=self._ServerProxy__encoding,
+                     allow_none=self._ServerProxy__allow_none)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+"""
+一時的な通信エラーで失敗した API 呼び出しをやり直すためのモジュールです。
+
+    retry = RetryPolicy(max_attempts=5, base_delay=0.5, deadline=60)
+    backlog = Backlog("space", "username", "password", retry=retry)
+    ...
+    print retry.snapshot()
+
+参照系の呼び出し (get*, count*, find*) は冪等なので、通信エラーや 5xx の応答であればやり直します。
+それ以外の呼び出しはサーバで処理された可能性があるため、接続できなかった場合と
+429 (Too Many Requests) の応答のように、リクエストが処理されていないことが明らかな場合だけやり直します。
+XML-RPC の Fault はやり直しません。
+"""
+import errno
+import httplib
+import random
+import socket
+import threading
+import time
+from xmlrpclib import ProtocolError
+
+from throttle import is_read_method
+
+# 冪等な呼び出しでやり直す HTTP のステータス
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# リクエストが処理されていないことが明らかな HTTP のステータスと、ソケットのエラー
+NOT_PROCESSED_STATUSES = (429,)
+NOT_PROCESSED_ERRNOS = (errno.ECONNREFUSED,)
+
+
+class RetryPolicy(object):
+    """
+    失敗した呼び出しを、指数的に伸ばした上限までのランダムな時間 (full jitter) だけ待ってからやり直す
+
+    max_attempts: 最初の呼び出しを含めた最大の試行回数
+    base_delay: 1 回目のやり直しまでの待ち時間の上限。以降は 2 倍ずつ増やす
+    max_delay: 待ち時間の上限
+    deadline: 最初の呼び出しからこの秒数を過ぎる場合はやり直さない。None の場合は無制限
+    idempotent: 参照系以外で冪等とみなす XML-RPC のメソッド名
+    """
+
+    def __init__(self, max_attempts=4, base_delay=0.5, max_delay=30.0, deadline=60.0, idempotent=(),
+                 clock=time.time, sleep=time.sleep, random=random.random):
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be positive : %s" % max_attempts)
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.idempotent = frozenset(idempotent)
+        self.clock = clock
+        self.sleep = sleep
+        self.random = random
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def call(self, methodname, params, request):
+        """
+        request(methodname, params) を呼び出し、やり直せる失敗であれば規定の回数までやり直す
+        """
+        started = self.clock()
+        attempt = 1
+        while 1:
+            try:
+                return request(methodname, params)
+            except Exception, e:
+                if not self.retryable(methodname, e) or attempt >= self.max_attempts:
+                    self._record(methodname, failures=1)
+                    raise
+                delay = self.random() * min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+                if self.deadline is not None and self.clock() + delay - started > self.deadline:
+                    self._record(methodname, failures=1)
+                    raise
+                self.sleep(delay)
+                self._record(methodname, retries=1, retry_time=delay)
+                attempt += 1
+
+    def is_idempotent(self, methodname):
+        """
+        methodname の呼び出しを、サーバで処理された可能性があってもやり直してよいかを返す
+        """
+        return is_read_method(methodname) or methodname in self.idempotent
+
+    def retryable(self, methodname, e):
+        """
+        methodname の呼び出しが e で失敗した場合にやり直してよいかを返す
+        """
+        if self.is_idempotent(methodname):
+            if isinstance(e, ProtocolError):
+                return e.errcode in RETRY_STATUSES
+            return isinstance(e, (socket.error, httplib.HTTPException))
+        if isinstance(e, ProtocolError):
+            return e.errcode in NOT_PROCESSED_STATUSES
+        return isinstance(e, socket.error) and e.errno in NOT_PROCESSED_ERRNOS
+
+    def snapshot(self):
+        """
+        メソッドごとの retries (やり直した回数)、retry_time (やり直すまでに待った秒数)、
+        failures (やり直さずに失敗とした回数) を返す
+        """
+        self._lock.acquire()
+        try:
+            return dict([(k, dict(v)) for k, v in self._stats.iteritems()])
+        finally:
+            self._lock.release()
+
+    def reset(self):
+        self._lock.acquire()
+        try:
+            self._stats.clear()
+        finally:
+            self._lock.release()
+
+    def _record(self, methodname, retries=0, retry_time=0.0, failures=0):
+        self._lock.acquire()
+        try:
+            stats = self._stats.get(methodname)
+            if stats is None:
+                stats = self._stats[methodname] = {"retries": 0, "retry_time": 0.0, "failures": 0}
+            stats["retries"] += retries
+            stats["retry_time"] += retry_time
+            stats["failures"] += failures
+        finally:
+            self._lock.release()
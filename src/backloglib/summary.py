@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+"""
+スペース全体のプロジェクトのサマリを、状態ごとの課題数の行列として集計するモジュールです。
+
+    aggregator = SummaryAggregator(backlog)
+    before = aggregator.refresh()
+    ...
+    after = aggregator.refresh()
+    print after.totals(), after.delta(before).by_project()
+
+プロジェクト × 状態、マイルストーン × 状態の課題数を NumPy の int64 の行列で保持します。NumPy が必要です。
+
+SummaryAggregator.refresh は、2 回目以降はタイムラインから前回以降に課題が更新されたプロジェクトを求め、
+それらだけを getProjectSummary で取得し直します。タイムラインの件数を超える更新があった場合や、
+知らないプロジェクトの課題が更新された場合は getProjectSummaries で全て取得し直します。
+マイルストーンの名前の変更などはタイムラインに現れないため、必要であれば refresh(full=True) を呼び出してください。
+"""
+import threading
+
+from timeline import event_key
+from workers import WorkerPool
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def _require_numpy():
+    if numpy is None:
+        raise ImportError("numpy is required for summary matrices")
+
+
+def _statuses(summary):
+    return summary.statuses or []
+
+
+class SummaryMatrix(object):
+    """
+    プロジェクト × 状態 (projects) と、マイルストーン × 状態 (milestones) の課題数の行列
+
+    project_ids: projects の行のプロジェクトの id
+    milestone_ids: milestones の行の (プロジェクトの id, マイルストーンの id)
+    status_ids, status_names: 列の状態の id と名前
+    """
+
+    def __init__(self, project_ids, project_names, milestone_ids, milestone_names, status_ids, status_names,
+                 projects, milestones):
+        self.project_ids = project_ids
+        self.project_names = project_names
+        self.milestone_ids = milestone_ids
+        self.milestone_names = milestone_names
+        self.status_ids = status_ids
+        self.status_names = status_names
+        self.projects = projects
+        self.milestones = milestones
+
+    @classmethod
+    def from_summaries(cls, summaries):
+        """
+        ProjectSummary のリストから行列を作る
+        """
+        _require_numpy()
+        summaries = sorted(summaries, key=lambda x: x.id)
+        statuses = {}
+        for summary in summaries:
+            for status in _statuses(summary):
+                statuses.setdefault(status.id, status.name)
+            for milestone in summary.milestones or []:
+                for status in milestone.statuses or []:
+                    statuses.setdefault(status.id, status.name)
+        status_ids = sorted(statuses)
+        column = dict([(id, i) for i, id in enumerate(status_ids)])
+
+        milestones = [(summary.id, x) for summary in summaries for x in summary.milestones or []]
+        projects_matrix = numpy.zeros((len(summaries), len(status_ids)), dtype=numpy.int64)
+        milestones_matrix = numpy.zeros((len(milestones), len(status_ids)), dtype=numpy.int64)
+        for i, summary in enumerate(summaries):
+            for status in _statuses(summary):
+                projects_matrix[i, column[status.id]] = status.count
+        for i, (project_id, milestone) in enumerate(milestones):
+            for status in milestone.statuses or []:
+                milestones_matrix[i, column[status.id]] = status.count
+        return cls([x.id for x in summaries], [x.name for x in summaries],
+                   [(project_id, x.id) for project_id, x in milestones], [x.name for project_id, x in milestones],
+                   status_ids, [statuses[x] for x in status_ids], projects_matrix, milestones_matrix)
+
+    def totals(self):
+        """
+        スペース全体の状態ごとの課題数を、状態の名前の dict で返す
+        """
+        return dict(zip(self.status_names, self.projects.sum(axis=0).tolist()))
+
+    def by_project(self):
+        """
+        プロジェクトの id と、その状態ごとの課題数の dict の dict を返す
+        """
+        return dict([(id, dict(zip(self.status_names, row))) for id, row in zip(self.project_ids,
+                                                                              self.projects.tolist())])
+
+    def project_totals(self):
+        """
+        プロジェクトごとの課題数の配列 (project_ids の順)
+        """
+        return self.projects.sum(axis=1)
+
+    def ratio(self, status_ids, milestones=False):
+        """
+        status_ids のいずれかの状態にある課題の割合を、行ごとの配列で返す。課題がない行は 0
+        """
+        matrix = self.milestones if milestones else self.projects
+        columns = [self.status_ids.index(x) for x in status_ids if x in self.status_ids]
+        selected = matrix[:, columns].sum(axis=1).astype(numpy.float64)
+        totals = matrix.sum(axis=1)
+        return numpy.where(totals > 0, selected / numpy.maximum(totals, 1), 0.0)
+
+    def delta(self, other):
+        """
+        other (前回の SummaryMatrix) からの課題数の増減を SummaryMatrix で返す。
+        行と列は両方の和集合で、片方にしかないプロジェクトや状態は 0 として扱う
+        """
+        project_ids = sorted(set(self.project_ids) | set(other.project_ids))
+        milestone_ids = sorted(set(self.milestone_ids) | set(other.milestone_ids))
+        status_ids = sorted(set(self.status_ids) | set(other.status_ids))
+        names = dict(zip(other.status_ids, other.status_names) + zip(self.status_ids, self.status_names))
+        project_names = dict(zip(other.project_ids, other.project_names) +
+                             zip(self.project_ids, self.project_names))
+        milestone_names = dict(zip(other.milestone_ids, other.milestone_names) +
+                               zip(self.milestone_ids, self.milestone_names))
+        return SummaryMatrix(project_ids, [project_names[x] for x in project_ids],
+                             milestone_ids, [milestone_names[x] for x in milestone_ids],
+                             status_ids, [names[x] for x in status_ids],
+                             self._align("projects", project_ids, status_ids) -
+                             other._align("projects", project_ids, status_ids),
+                             self._align("milestones", milestone_ids, status_ids) -
+                             other._align("milestones", milestone_ids, status_ids))
+
+    def _align(self, name, row_ids, status_ids):
+        matrix = getattr(self, name)
+        ids = self.project_ids if name == "projects" else self.milestone_ids
+        ret = numpy.zeros((len(row_ids), len(status_ids)), dtype=numpy.int64)
+        rows = dict([(id, i) for i, id in enumerate(row_ids)])
+        columns = [status_ids.index(x) for x in self.status_ids]
+        if len(ids) and len(columns):
+            ret[numpy.ix_([rows[x] for x in ids], columns)] = matrix
+        return ret
+
+    def __repr__(self):
+        return "SummaryMatrix(%d projects, %d milestones, %d statuses)" % (
+            len(self.project_ids), len(self.milestone_ids), len(self.status_ids))
+
+
+class SummaryAggregator(object):
+    """
+    プロジェクトのサマリを保持し、変更のあったプロジェクトだけを取得し直して SummaryMatrix を作る
+    """
+
+    def __init__(self, backlog, max_workers=None):
+        _require_numpy()
+        self.backlog = backlog
+        self.max_workers = backlog._max_workers(max_workers)
+        self._summaries = {}
+        self._keys = {}
+        self._seen = set()
+        self._window = 0
+        self._lock = threading.Lock()
+        # 直近の refresh で取得し直したプロジェクトの id。全て取得し直した場合は None
+        self.refreshed = None
+
+    def refresh(self, full=False):
+        """
+        サマリを最新にして SummaryMatrix を返す
+        """
+        self._lock.acquire()
+        try:
+            # 取得中の更新を次回に拾えるよう、タイムラインを先に取得する
+            events = self.backlog.get_timeline()
+            self._window = max(self._window, len(events))
+            changed = None if full or not self._summaries else self._changed(events)
+            if changed is None:
+                self._summaries = dict([(x.id, x) for x in self.backlog.get_project_summaries()])
+                self._keys = dict([(x.key, x.id) for x in self._summaries.itervalues()])
+            elif changed:
+                for summary in self._fetch(sorted(changed)):
+                    self._summaries[summary.id] = summary
+            self.refreshed = None if changed is None else sorted(changed)
+            # 取得済みのイベントは次回の判定から除く
+            self._seen = set([event_key(x) for x in events])
+            return SummaryMatrix.from_summaries(self._summaries.values())
+        finally:
+            self._lock.release()
+
+    def _changed(self, events):
+        """
+        前回以降に課題が更新されたプロジェクトの id を返す。全て取得し直す必要がある場合は None
+        """
+        fresh = [x for x in events if event_key(x) not in self._seen]
+        if fresh and len(fresh) == len(events) and len(events) >= self._window:
+            return None
+        changed = set()
+        for event in fresh:
+            if not event.issue or not event.issue.key:
+                continue
+            project_id = self._keys.get(event.issue.key.rsplit("-", 1)[0])
+            if project_id is None:
+                return None
+            changed.add(project_id)
+        return changed
+
+    def _fetch(self, project_ids):
+        if self.max_workers > 1 and len(project_ids) > 1:
+            pool = WorkerPool(min(self.max_workers, len(project_ids)))
+            try:
+                return pool.map(self.backlog.get_project_summary, project_ids)
+            finally:
+                pool.shutdown(wait=False)
+        return [self.backlog.get_project_summary(x) for x in project_ids]
@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+"""
+前回の同期以降に更新された課題だけを取得する差分同期のモジュールです。
+
+    sync = IssueSync(backlog, SqliteWatermarkStore("/var/lib/backlog/sync.db"), sink)
+    result = sync.run(project_id)
+
+プロジェクトごとに、これまでに取得した課題の updated_on の最大値 (watermark) を保存しておき、
+次回は FindCondition の updated_on_min でそれ以降に更新された課題だけを検索します。
+sink には更新された課題のリストがページごとに渡されます。
+
+  * updated_on_min は日付単位でしか指定できないため、watermark より前の課題も返ります。
+    これらは updated_on と、watermark と同時刻に取得済みの課題から除外します
+  * サーバとの時刻のずれや、同じ時刻に後から書き込まれる課題に備え、
+    watermark から overlap 秒だけ遡った区間は取得済みの課題を記録しておき、再度確認します
+  * ページの取得中に課題が更新されると並び順がずれるため、前のページの最後の課題を含むように
+    ページを少しずつ重ねて取得します
+
+watermark は全てのページを sink に渡し終えてから保存します。途中で失敗した場合は、次回の同期で
+同じ課題が再び sink に渡されることがあります。
+"""
+import datetime
+import json
+import sqlite3
+import threading
+
+from models import FindCondition
+from utils import check_page_size
+
+_TIME_FORMAT_ = "%Y%m%d%H%M%S"
+_DATE_FORMAT_ = "%Y%m%d"
+
+
+class SyncState(object):
+    """
+    プロジェクトごとの同期の状態
+
+    watermark: これまでに取得した課題の updated_on の最大値。未同期の場合は None
+    seen: watermark から overlap 秒以内に更新された取得済みの課題の id と updated_on
+    """
+
+    def __init__(self, watermark=None, seen=None):
+        self.watermark = watermark
+        self.seen = seen or {}
+
+    def to_json(self):
+        return json.dumps({"watermark": self.watermark, "seen": [[k, v] for k, v in self.seen.iteritems()]})
+
+    @classmethod
+    def from_json(cls, data):
+        data = json.loads(data)
+        return cls(data["watermark"], dict([(k, v) for k, v in data["seen"]]))
+
+
+class MemoryWatermarkStore(object):
+    """
+    プロセス内のメモリに同期の状態を保持するストア
+    """
+
+    def __init__(self):
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def get(self, project_id):
+        self._lock.acquire()
+        try:
+            data = self._states.get(project_id)
+        finally:
+            self._lock.release()
+        return SyncState.from_json(data) if data else SyncState()
+
+    def set(self, project_id, state):
+        data = state.to_json()
+        self._lock.acquire()
+        try:
+            self._states[project_id] = data
+        finally:
+            self._lock.release()
+
+
+class SqliteWatermarkStore(object):
+    """
+    SQLite のファイルに同期の状態を保持するストア
+    """
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS watermarks (project_id INTEGER PRIMARY KEY, state TEXT)")
+        self._lock = threading.Lock()
+
+    def get(self, project_id):
+        self._lock.acquire()
+        try:
+            row = self._conn.execute("SELECT state FROM watermarks WHERE project_id = ?", (project_id,)).fetchone()
+        finally:
+            self._lock.release()
+        return SyncState.from_json(row[0]) if row else SyncState()
+
+    def set(self, project_id, state):
+        data = state.to_json()
+        self._lock.acquire()
+        try:
+            self._conn.execute("INSERT OR REPLACE INTO watermarks (project_id, state) VALUES (?, ?)",
+                               (project_id, data))
+        finally:
+            self._lock.release()
+
+    def close(self):
+        self._conn.close()
+
+
+class SyncResult(object):
+    """
+    1 回の同期の結果
+    """
+
+    def __init__(self, project_id, fetched, changed, watermark):
+        self.project_id = project_id
+        # 検索で取得した課題の数と、そのうち sink に渡した課題の数
+        self.fetched = fetched
+        self.changed = changed
+        self.watermark = watermark
+
+    def __repr__(self):
+        return "[%s] fetched=%d changed=%d watermark=%s" % (self.project_id, self.fetched, self.changed,
+                                                            self.watermark)
+
+
+def _shift(updated_on, seconds):
+    return datetime.datetime.strptime(updated_on, _TIME_FORMAT_) - datetime.timedelta(seconds=seconds)
+
+
+class IssueSync(object):
+    """
+    Backlog からプロジェクトの課題を差分で取得し、sink(issues) に渡す
+
+    overlap: watermark から遡って再確認する秒数。サーバとの時刻のずれより大きな値を指定する
+    page_size: 1 回の findIssue で取得する課題の数 (最大 100)
+    page_overlap: 前のページと重ねて取得する課題の数
+    """
+
+    def __init__(self, backlog, store, sink, overlap=600, page_size=100, page_overlap=5):
+        check_page_size(page_size)
+        if not 0 < page_overlap < page_size:
+            raise ValueError("page_overlap must be between 1 and page_size - 1 : %s" % page_overlap)
+        self.backlog = backlog
+        self.store = store
+        self.sink = sink
+        self.overlap = overlap
+        self.page_size = page_size
+        self.page_overlap = page_overlap
+
+    def run(self, project_id, condition=None):
+        """
+        project_id の課題を前回の同期以降の差分だけ取得する。condition には検索の条件を追加できる
+        """
+        state = self.store.get(project_id)
+        params = dict(condition or {})
+        params.update({"projectId": project_id, "sort": "UPDATED", "order": True})
+        if state.watermark:
+            since = _shift(state.watermark, self.overlap)
+            params["updated_on_min"] = since.strftime(_DATE_FORMAT_)
+            lower = since.strftime(_TIME_FORMAT_)
+        else:
+            lower = None
+
+        fetched = changed = 0
+        watermark = state.watermark
+        seen = dict(state.seen)
+        for page in self._pages(params):
+            fetched += len(page)
+            issues = []
+            for issue in page:
+                key = str(issue.id)
+                if lower is not None and issue.updated_on < lower:
+                    continue
+                if seen.get(key) == issue.updated_on:
+                    continue
+                seen[key] = issue.updated_on
+                issues.append(issue)
+                if watermark is None or issue.updated_on > watermark:
+                    watermark = issue.updated_on
+            if issues:
+                self.sink(issues)
+                changed += len(issues)
+
+        if watermark is not None:
+            horizon = _shift(watermark, self.overlap).strftime(_TIME_FORMAT_)
+            seen = dict([(k, v) for k, v in seen.iteritems() if v >= horizon])
+            self.store.set(project_id, SyncState(watermark, seen))
+        return SyncResult(project_id, fetched, changed, watermark)
+
+    def run_all(self, project_ids, condition=None):
+        return [self.run(project_id, condition) for project_id in project_ids]
+
+    def _pages(self, params):
+        # 前のページの最後の課題 (anchor) を含むように page_overlap 件ずつ重ねて取得する。
+        # anchor が見つからない場合は、取得中の更新で並びが大きくずれたとみなし、1 ページ分遡って取り直す
+        condition = FindCondition(params)
+        offset = 0
+        anchor = None
+        retreats = 0
+        while 1:
+            page_params = condition.serialize()
+            page_params["offset"] = offset
+            page_params["limit"] = self.page_size
+            page = self.backlog.find_issue(page_params)
+            if anchor is not None and anchor not in [(x.id, x.updated_on) for x in page]:
+                if offset > 0 and retreats < 3:
+                    retreats += 1
+                    offset = max(0, offset - self.page_size)
+                    continue
+            retreats = 0
+            yield page
+            if len(page) < self.page_size:
+                return
+            anchor = (page[-1].id, page[-1].updated_on)
+            offset += len(page) - self.page_overlap
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+"""
+API 呼び出しの流量を抑えるためのモジュールです。
+
+RateLimiter は参照系と更新系で別々のトークンバケットを持ち、1 秒あたりの呼び出し数を制限します。
+AIMDController は応答時間とエラーを見ながら、同時に実行できる呼び出しの数を増減させます。
+どちらもスレッドセーフなので、同じインスタンスを複数の Backlog / BacklogAdmin に渡すと、
+それらの呼び出し全体で制限を共有します。
+
+    limiter = RateLimiter(read_rate=10, write_rate=2)
+    controller = AIMDController(initial=4, maximum=16, target_latency=1.0)
+    backlog = Backlog("space", "username", "password", limiter=limiter, controller=controller)
+
+キャッシュから返した呼び出しは、どちらの制限の対象にもなりません。
+"""
+import threading
+import time
+
+# 参照系とみなすメソッド名 (backlog. / backlog.admin. を除いた部分) の接頭辞
+READ_PREFIXES = ("get", "count", "find")
+
+
+def is_read_method(methodname):
+    """
+    XML-RPC のメソッドが参照系かどうかを返す。
+    system.multicall は参照系のメソッドをまとめるためだけに使っているので参照系とする
+    """
+    if methodname == "system.multicall":
+        return True
+    return methodname.rsplit(".", 1)[-1].startswith(READ_PREFIXES)
+
+
+class TokenBucket(object):
+    """
+    rate 個 / 秒でトークンが補充され、最大 capacity 個まで溜まるバケット
+
+    capacity を省略した場合は rate と同じ (1 秒分) になる
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.time, sleep=time.sleep):
+        if rate <= 0:
+            raise ValueError("rate must be positive : %s" % rate)
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1, rate))
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, tokens=1):
+        """
+        トークンを取得できれば True を返す。取得できなければ待たずに False を返す
+        """
+        return self._take(tokens) == 0
+
+    def acquire(self, tokens=1):
+        """
+        トークンを取得できるまで待つ。待った秒数を返す
+        """
+        waited = 0.0
+        while 1:
+            wait = self._take(tokens)
+            if wait == 0:
+                return waited
+            self.sleep(wait)
+            waited += wait
+
+    def _take(self, tokens):
+        # 取得できた場合は 0 を、できなかった場合は足りない分が補充されるまでの秒数を返す
+        self._lock.acquire()
+        try:
+            now = self.clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0
+            return (tokens - self._tokens) / self.rate
+        finally:
+            self._lock.release()
+
+
+class RateLimiter(object):
+    """
+    参照系と更新系の呼び出しをそれぞれ read_rate / write_rate 回 / 秒に制限する。
+    None を指定した方は制限しない
+    """
+
+    def __init__(self, read_rate=None, write_rate=None, read_burst=None, write_burst=None,
+                 clock=time.time, sleep=time.sleep):
+        self.read = TokenBucket(read_rate, read_burst, clock, sleep) if read_rate else None
+        self.write = TokenBucket(write_rate, write_burst, clock, sleep) if write_rate else None
+
+    def acquire(self, methodname):
+        """
+        methodname の呼び出しが許可されるまで待つ。待った秒数を返す
+        """
+        bucket = self.read if is_read_method(methodname) else self.write
+        if bucket is None:
+            return 0.0
+        return bucket.acquire()
+
+
+class AIMDController(object):
+    """
+    同時に実行できる呼び出しの数 (limit) を AIMD で調整する。
+
+    応答時間が target_latency 以下で成功した呼び出しごとに limit を increase / limit ずつ
+    (limit 個の呼び出しが成功するごとにおよそ increase ずつ) 増やし、
+    target_latency を超えた場合や、接続エラーなど混雑を示す失敗の場合は limit に decrease を掛ける。
+    同じ混雑で何度も減らさないよう、減らしてから target_latency が経つまでは再び減らさない
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=32, target_latency=1.0, increase=1.0, decrease=0.5,
+                 clock=time.time):
+        if not 1 <= minimum <= initial <= maximum:
+            raise ValueError("minimum <= initial <= maximum is required : %s, %s, %s" % (minimum, initial, maximum))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.increase = increase
+        self.decrease = decrease
+        self.clock = clock
+        self._limit = float(initial)
+        self._in_flight = 0
+        self._decreased = None
+        self._cond = threading.Condition(threading.Lock())
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def acquire(self):
+        """
+        実行中の呼び出しが limit 未満になるまで待つ
+        """
+        self._cond.acquire()
+        try:
+            while self._in_flight >= int(self._limit):
+                self._cond.wait()
+            self._in_flight += 1
+        finally:
+            self._cond.release()
+
+    def suspend(self):
+        """
+        limit を調整せずに呼び出しの枠を一時的に手放す。再開する前に acquire を呼び、
+        再開せずに終了する場合は release の代わりに report を呼ぶ
+        """
+        self._cond.acquire()
+        try:
+            self._in_flight -= 1
+            self._cond.notify_all()
+        finally:
+            self._cond.release()
+
+    def release(self, latency, congested=False):
+        """
+        呼び出しの終了を通知し、その応答時間と混雑していたかどうかから limit を調整する
+        """
+        self._finish(latency, congested, 1)
+
+    def report(self, latency, congested=False):
+        """
+        suspend で枠を手放したまま終了した呼び出しの、応答時間と混雑していたかどうかから limit を調整する
+        """
+        self._finish(latency, congested, 0)
+
+    def _finish(self, latency, congested, released):
+        self._cond.acquire()
+        try:
+            self._in_flight -= released
+            now = self.clock()
+            if congested or latency > self.target_latency:
+                if self._decreased is None or now - self._decreased >= self.target_latency:
+                    self._limit = max(self.minimum, self._limit * self.decrease)
+                    self._decreased = now
+            else:
+                self._limit = min(self.maximum, self._limit + self.increase / self._limit)
+            self._cond.notify_all()
+        finally:
+            self._cond.release()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+"""
+タイムラインを定期的に取得し、新しいイベントだけを購読者に渡すモジュールです。
+
+    poller = TimelinePoller(backlog, min_interval=5, max_interval=300)
+    subscription = poller.subscribe(maxsize=1000)
+    poller.start()
+    for event in subscription:
+        print event.updated_on, event.issue.key
+
+getTimeline は直近の一定件数のイベントしか返さないため、取得済みのイベントを
+(updated_on, 種別, 課題キー, 内容) で記録しておき、新しいものだけを古い順に渡します。
+
+  * 新しいイベントがあれば取得の間隔を min_interval まで縮め、なければ backoff 倍ずつ max_interval まで伸ばします
+  * 購読者のキューが一杯の場合は、空くまで次の取得を待ちます (backpressure)
+  * 取得できる件数いっぱいのイベントが全て新しいものだった場合は、前回の取得との間に
+    件数を超えるイベントがあり、取りこぼした可能性があるため on_gap(since, until) で通知します
+"""
+import Queue
+import logging
+import threading
+
+_log = logging.getLogger(__name__)
+
+
+def event_key(event):
+    """
+    重複を判定するためのイベントのキー
+    """
+    return (event.updated_on, event.type and event.type.id, event.issue and event.issue.key, event.content)
+
+
+class Subscription(object):
+    """
+    TimelinePoller の購読。新しいイベントを maxsize 件まで保持するキュー
+    """
+
+    def __init__(self, poller, maxsize):
+        self.poller = poller
+        self.queue = Queue.Queue(maxsize)
+
+    def get(self, block=True, timeout=None):
+        """
+        次のイベントを返す。timeout 秒待ってもイベントがない場合は Queue.Empty を送出する
+        """
+        return self.queue.get(block, timeout)
+
+    def __iter__(self):
+        while 1:
+            try:
+                yield self.queue.get(True, 0.5)
+            except Queue.Empty:
+                if not self.poller.running:
+                    return
+
+    def close(self):
+        self.poller.unsubscribe(self)
+
+
+class TimelinePoller(object):
+    """
+    backlog.get_timeline を適応的な間隔で呼び出し、新しい Timeline を購読者に渡す
+
+    min_interval, max_interval: 取得の間隔 (秒) の下限と上限
+    backoff: 新しいイベントがなかった場合に間隔を伸ばす倍率
+    on_gap: イベントを取りこぼした可能性がある場合に (前回の最新の updated_on, 今回の最古の updated_on) で呼ぶ
+    """
+
+    def __init__(self, backlog, min_interval=5.0, max_interval=300.0, backoff=2.0, on_gap=None):
+        if not 0 < min_interval <= max_interval:
+            raise ValueError("min_interval must be between 0 and max_interval : %s" % min_interval)
+        self.backlog = backlog
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.on_gap = on_gap
+        self.interval = min_interval
+        # 取りこぼした可能性がある回数
+        self.gaps = 0
+        self._seen = set()
+        self._latest = None
+        self._window = 0
+        # 一部の購読者にだけ配信したイベントのキーと、受け取り済みの購読者
+        self._partial = None
+        self._subscriptions = []
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and not self._stopped.isSet()
+
+    def subscribe(self, maxsize=1000):
+        subscription = Subscription(self, maxsize)
+        self._lock.acquire()
+        try:
+            self._subscriptions.append(subscription)
+        finally:
+            self._lock.release()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self._lock.acquire()
+        try:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+        finally:
+            self._lock.release()
+
+    def poll(self):
+        """
+        タイムラインを 1 回取得し、新しいイベントを古い順に返す。購読者への配信と間隔の調整も行う。
+        購読者のキューが一杯の場合は、空くか stop が呼ばれるまで待つ。
+        stop で配信を打ち切った場合は配信したイベントだけを返し、残りは次の取得で配信する
+        """
+        events = self.backlog.get_timeline()
+        # 返る件数が最大のときだけ、窓からあふれたイベントがある可能性がある
+        self._window = max(self._window, len(events))
+        fresh = [x for x in reversed(events) if event_key(x) not in self._seen]
+        if self._latest is not None and events and len(events) >= self._window and len(fresh) == len(events):
+            self.gaps += 1
+            _log.warning("timeline may have missed events between %s and %s", self._latest, fresh[0].updated_on)
+            if self.on_gap:
+                self.on_gap(self._latest, fresh[0].updated_on)
+
+        # 窓の最古のイベントより前のものは二度と返らないため、記録から除く
+        if events:
+            oldest = min([x.updated_on for x in events])
+            self._seen = set([x for x in self._seen if x[0] >= oldest])
+
+        if fresh:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.max_interval, self.interval * self.backoff)
+
+        published = []
+        try:
+            subscriptions = self._snapshot()
+            for event in fresh:
+                if not self._publish(event, subscriptions):
+                    break
+                published.append(event)
+        finally:
+            # 配信し終えたイベントだけを記録し、残りは次の取得で配信し直す
+            for event in published:
+                self._seen.add(event_key(event))
+                if self._latest is None or event.updated_on > self._latest:
+                    self._latest = event.updated_on
+        return published
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="TimelinePoller")
+        self._thread.setDaemon(True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stopped.isSet():
+            try:
+                self.poll()
+            except Exception:
+                _log.exception("failed to get timeline")
+                self.interval = min(self.max_interval, self.interval * self.backoff)
+            self._stopped.wait(self.interval)
+
+    def _snapshot(self):
+        self._lock.acquire()
+        try:
+            return list(self._subscriptions)
+        finally:
+            self._lock.release()
+
+    def _publish(self, event, subscriptions):
+        """
+        event を全ての購読者のキューに入れる。キューが空く前に停止した場合は False を返す
+        """
+        key = event_key(event)
+        # 前回配信しきれなかったイベントは、受け取り済みの購読者に再び渡さない
+        if self._partial is None or self._partial[0] != key:
+            self._partial = (key, set())
+        delivered = self._partial[1]
+        for subscription in subscriptions:
+            if subscription in delivered:
+                continue
+            # キューが空くまで待つ
+            while 1:
+                try:
+                    subscription.queue.put(event, True, 0.1)
+                    break
+                except Queue.Full:
+                    if self._stopped.isSet():
+                        return False
+            delivered.add(subscription)
+        self._partial = None
+        return True
@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+"""
+keep-alive の接続をプールして使い回す XML-RPC のトランスポートです。
+
+標準の Transport は 1 つの接続しか保持せず、スレッドからの同時利用もできないため、
+大量に API を呼び出す場合は TCP / TLS のハンドシェイクのコストが支配的になります。
+
+    transport = PooledSafeTransport(pool_size=8, idle_timeout=30, max_requests=100)
+    backlog = Backlog("space", "username", "password", transport=transport)
+"""
+import errno
+import httplib
+import socket
+import threading
+import time
+from xmlrpclib import Fault, GzipDecodedResponse, ProtocolError, Transport
+
+import instrument
+import unmarshal
+
+
+class _PooledConnection(object):
+    """
+    プール内の接続と、その利用状況
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.requests = 0
+        self.last_used = time.time()
+
+
+class PooledTransport(Transport):
+    """
+    接続をホストごとにプールする HTTP 用のトランスポート
+
+    pool_size: 同時に開く接続の最大数。これを超える呼び出しは接続が空くまで待つ
+    idle_timeout: この秒数以上使われていない接続は再利用せずに閉じる
+    max_requests: 1 つの接続で送るリクエストの最大数。None の場合は無制限
+    """
+
+    def __init__(self, use_datetime=0, pool_size=4, idle_timeout=30.0, max_requests=100):
+        Transport.__init__(self, use_datetime=use_datetime)
+        if pool_size < 1:
+            raise ValueError("pool_size must be positive : %s" % pool_size)
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.max_requests = max_requests
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(pool_size)
+
+    def request(self, host, handler, request_body, verbose=0, factory=None, idempotent=False):
+        """
+        factory を渡すと、レスポンスの struct を解析しながら factory(**struct) に変換する。
+        idempotent が True の呼び出しは、再利用した接続で送信後に応答を受け取れなかった場合もやり直す
+        """
+        return self.single_request(host, handler, request_body, verbose, factory, idempotent)
+
+    def single_request(self, host, handler, request_body, verbose=0, factory=None, idempotent=False):
+        self._slots.acquire()
+        try:
+            pooled, response = self._send(host, handler, request_body, verbose, idempotent)
+            try:
+                if response.status == 200:
+                    ret = self.parse_response(response, factory)
+                    self._checkin(host, pooled, not response.will_close)
+                    return ret
+            except Fault:
+                self._checkin(host, pooled, not response.will_close)
+                raise
+            except Exception:
+                pooled.connection.close()
+                raise
+
+            self._reject(host, handler, pooled, response)
+        finally:
+            self._slots.release()
+
+    def stream_request(self, host, handler, request_body, factory, verbose=0, idempotent=False):
+        """
+        レスポンスの struct の配列を、受信と解析が済んだ要素から順に factory(**struct) に変換して返すジェネレータ
+        """
+        for batch in self.stream_batches(host, handler, request_body, factory, verbose, idempotent):
+            for x in batch:
+                yield x
+
+    def stream_batches(self, host, handler, request_body, factory, verbose=0, idempotent=False):
+        """
+        stream_request と同じ要素を、受信したデータごとにまとめたリストで返すジェネレータ。
+        呼び出し側がリストを処理している間は同時に実行できる呼び出しの枠を手放すため、
+        その間に pool_size を使い切っていても他の API を呼び出せる (接続はこの呼び出しが使い続ける)
+        """
+        self._slots.acquire()
+        held = True
+        try:
+            pooled, response = self._send(host, handler, request_body, verbose, idempotent)
+            if response.status != 200:
+                self._reject(host, handler, pooled, response)
+            stream = self._body(response)
+            p, u = unmarshal.getparser(factory, use_datetime=self._use_datetime, stream=True)
+            finished = False
+            try:
+                while 1:
+                    data = stream.read(8192)
+                    if not data:
+                        break
+                    # 呼び出し元と交互に実行するため、計測中の CallRecord は読み込みごとに確認する
+                    record = instrument.current()
+                    if record is None:
+                        p.feed(data)
+                    else:
+                        record.response_bytes += len(data)
+                        start = time.time()
+                        p.feed(data)
+                        record.unmarshal += time.time() - start
+                    ready, u.ready = u.ready, []
+                    if ready:
+                        self._slots.release()
+                        held = False
+                        yield ready
+                        self._slots.acquire()
+                        held = True
+                record = instrument.current()
+                start = time.time()
+                p.close()
+                finished = True
+                u.close()
+                if record is not None:
+                    record.unmarshal += time.time() - start
+                if u.ready:
+                    self._slots.release()
+                    held = False
+                    yield u.ready
+            finally:
+                if stream is not response:
+                    stream.close()
+                # 途中で打ち切られた場合は、読み残しのある接続を再利用しない
+                self._checkin(host, pooled, finished and not response.will_close)
+        finally:
+            if held:
+                self._slots.release()
+
+    def parse_response(self, response, factory=None):
+        stream = self._body(response)
+        if factory is None:
+            p, u = self.getparser()
+        else:
+            p, u = unmarshal.getparser(factory, use_datetime=self._use_datetime)
+        record = instrument.current()
+        size = 0
+        parse = 0.0
+        while 1:
+            data = stream.read(8192)
+            if not data:
+                break
+            if self.verbose:
+                print "body:", repr(data)
+            if record is None:
+                p.feed(data)
+            else:
+                size += len(data)
+                start = time.time()
+                p.feed(data)
+                parse += time.time() - start
+        if stream is not response:
+            stream.close()
+        start = time.time()
+        p.close()
+        ret = u.close()
+        if record is not None:
+            record.response_bytes += size
+            record.unmarshal += parse + time.time() - start
+        return ret
+
+    def _send(self, host, handler, request_body, verbose, idempotent=False):
+        # 再利用した接続がサーバ側で既に閉じられていた場合に限り 1 度だけやり直す。
+        # リクエストを送り終えた後の失敗はサーバで処理された可能性があるため、冪等な呼び出しに限る
+        for i in (0, 1):
+            pooled = self._checkout(host)
+            h = pooled.connection
+            if verbose:
+                h.set_debuglevel(1)
+            sent = False
+            try:
+                self.send_request(h, handler, request_body)
+                self.send_host(h, host)
+                self.send_user_agent(h)
+                self.send_content(h, request_body)
+                sent = True
+                response = h.getresponse(buffering=True)
+                self.verbose = verbose
+                return pooled, response
+            except socket.error, e:
+                h.close()
+                if i or not self._stale(pooled, sent, idempotent) or \
+                        e.errno not in (errno.ECONNRESET, errno.ECONNABORTED, errno.EPIPE):
+                    raise
+            except httplib.BadStatusLine:
+                h.close()
+                if i or not self._stale(pooled, sent, idempotent):
+                    raise
+            except Exception:
+                h.close()
+                raise
+
+    def _stale(self, pooled, sent, idempotent):
+        """
+        失敗を、プールから取り出した接続がサーバ側で閉じられていたためとみなしてやり直せるかを返す
+        """
+        # 新しく開いた接続 (requests が 1) での失敗は、接続の再利用とは関係がない
+        return pooled.requests > 1 and (not sent or idempotent)
+
+    def _body(self, response):
+        if response.getheader("Content-Encoding", "") == "gzip":
+            return GzipDecodedResponse(response)
+        return response
+
+    def _reject(self, host, handler, pooled, response):
+        if response.getheader("content-length", 0):
+            response.read()
+        self._checkin(host, pooled, not response.will_close)
+        raise ProtocolError(host + handler, response.status, response.reason, response.msg)
+
+    def send_host(self, connection, host):
+        # 接続を共有するため、認証ヘッダはインスタンスに保持せず毎回組み立てる
+        chost, extra_headers, x509 = self.get_host_info(host)
+        for key, value in extra_headers or []:
+            connection.putheader(key, value)
+
+    def make_connection(self, host):
+        chost, extra_headers, x509 = self.get_host_info(host)
+        return httplib.HTTPConnection(chost)
+
+    def close(self):
+        self._lock.acquire()
+        try:
+            idle, self._idle = self._idle, {}
+        finally:
+            self._lock.release()
+        for connections in idle.itervalues():
+            for pooled in connections:
+                pooled.connection.close()
+
+    def _checkout(self, host):
+        now = time.time()
+        expired = []
+        pooled = None
+        self._lock.acquire()
+        try:
+            connections = self._idle.get(host, [])
+            while connections:
+                candidate = connections.pop()
+                if self.idle_timeout is not None and now - candidate.last_used > self.idle_timeout:
+                    expired.append(candidate)
+                else:
+                    pooled = candidate
+                    break
+        finally:
+            self._lock.release()
+        for candidate in expired:
+            candidate.connection.close()
+        if pooled is None:
+            pooled = _PooledConnection(self.make_connection(host))
+        pooled.requests += 1
+        return pooled
+
+    def _checkin(self, host, pooled, reusable):
+        if not reusable or (self.max_requests is not None and pooled.requests >= self.max_requests):
+            pooled.connection.close()
+            return
+        pooled.last_used = time.time()
+        self._lock.acquire()
+        try:
+            self._idle.setdefault(host, []).append(pooled)
+        finally:
+            self._lock.release()
+
+
+class PooledSafeTransport(PooledTransport):
+    """
+    接続をホストごとにプールする HTTPS 用のトランスポート
+    """
+
+    def __init__(self, use_datetime=0, pool_size=4, idle_timeout=30.0, max_requests=100, context=None):
+        PooledTransport.__init__(self, use_datetime=use_datetime, pool_size=pool_size,
+                                 idle_timeout=idle_timeout, max_requests=max_requests)
+        self.context = context
+
+    def make_connection(self, host):
+        chost, extra_headers, x509 = self.get_host_info(host)
+        return httplib.HTTPSConnection(chost, None, context=self.context, **(x509 or {}))
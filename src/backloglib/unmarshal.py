@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+"""
+XML-RPC のレスポンスを解析しながらモデルオブジェクトを作る Unmarshaller です。
+
+xmlrpclib の標準の Unmarshaller はレスポンス全体を dict と list に変換するため、
+その後にモデルオブジェクトへ変換すると、大きなレスポンスのコピーを一度に 2 つ持つことになります。
+ModelUnmarshaller はレスポンスの値 (またはその配列の要素) となる struct が閉じた時点で
+factory(**struct) を呼び出し、dict をすぐに手放します。
+"""
+from xmlrpclib import ExpatParser, Unmarshaller
+
+
+class ModelUnmarshaller(Unmarshaller):
+    """
+    レスポンスの値が struct の場合はそれを、struct の配列の場合は各要素を factory で変換する。
+    stream を True にすると、配列の要素は変換した順に ready に溜め、レスポンスの配列には残さない
+    """
+
+    def __init__(self, factory, use_datetime=0, stream=False):
+        Unmarshaller.__init__(self, use_datetime)
+        self.factory = factory
+        self.stream = stream
+        self.ready = []
+        self._containers = []
+        self._fault = False
+
+    def start(self, tag, attrs):
+        Unmarshaller.start(self, tag, attrs)
+        if tag == "array" or tag == "struct":
+            self._containers.append(tag)
+        elif tag == "fault":
+            self._fault = True
+
+    def end_array(self, data):
+        self._containers.pop()
+        Unmarshaller.end_array(self, data)
+
+    def end_struct(self, data):
+        self._containers.pop()
+        Unmarshaller.end_struct(self, data)
+        if self._fault:
+            return
+        if not self._containers:
+            self._stack[-1] = self.factory(**self._stack[-1])
+        elif self._containers == ["array"]:
+            if self.stream:
+                self.ready.append(self.factory(**self._stack.pop()))
+            else:
+                self._stack[-1] = self.factory(**self._stack[-1])
+
+    dispatch = dict(Unmarshaller.dispatch)
+    dispatch["array"] = end_array
+    dispatch["struct"] = end_struct
+
+
+def getparser(factory, use_datetime=0, stream=False):
+    """
+    xmlrpclib.getparser と同様に (parser, unmarshaller) を返す
+    """
+    target = ModelUnmarshaller(factory, use_datetime=use_datetime, stream=stream)
+    return ExpatParser(target), target
@@ -15,6 +15,20 @@
 # either express or implied. See the License for the specific language
 # governing permissions and limitations under the License.
 
+# findIssue が 1 回の呼び出しで返す課題の最大数
+FIND_ISSUE_LIMIT = 100
+
+
+def check_page_size(page_size):
+    """
+    findIssue の 1 ページの件数として page_size を確かめて返す。
+    上限を超えるとサーバは上限の件数で返し、ページの終わりと区別できなくなるため ValueError とする
+    """
+    if not 0 < page_size <= FIND_ISSUE_LIMIT:
+        raise ValueError("page_size must be between 1 and %d : %s" % (FIND_ISSUE_LIMIT, page_size))
+    return page_size
+
+
 def classwrap(obj, clazz):
     """
     dict 型のオブジェクトを clazz にラップして返す
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+"""
+API 呼び出しをバックグラウンドのスレッドで実行するためのユーティリティです。
+"""
+import Queue
+import logging
+import sys
+import threading
+
+_log = logging.getLogger(__name__)
+
+
+class Future(object):
+    """
+    バックグラウンドで実行している処理の結果
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._result = None
+        self._exc_info = None
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def set_result(self, result):
+        self._result = result
+        self._finish()
+
+    def set_exc_info(self, exc_info):
+        self._exc_info = exc_info
+        self._finish()
+
+    def done(self):
+        return self._event.isSet()
+
+    def exception(self):
+        """
+        処理中に発生した例外を返す。正常に終了した場合は None
+        """
+        self._event.wait()
+        return self._exc_info and self._exc_info[1]
+
+    def add_done_callback(self, callback):
+        """
+        処理の完了時に callback(future) を呼び出す。既に完了している場合はその場で呼び出す
+        """
+        self._lock.acquire()
+        try:
+            if not self._event.isSet():
+                self._callbacks.append(callback)
+                return
+        finally:
+            self._lock.release()
+        callback(self)
+
+    def _finish(self):
+        self._lock.acquire()
+        try:
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        finally:
+            self._lock.release()
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception:
+                _log.exception("callback %r raised an exception", callback)
+
+    def result(self, timeout=None):
+        """
+        処理の完了を待って結果を返す。処理中に発生した例外はここで再送出する
+        """
+        self._event.wait(timeout)
+        if not self._event.isSet():
+            raise RuntimeError("timed out waiting for result")
+        if self._exc_info:
+            raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+        return self._result
+
+
+def _run(future, func, args, kwargs):
+    try:
+        result = func(*args, **kwargs)
+    except:
+        future.set_exc_info(sys.exc_info())
+    else:
+        future.set_result(result)
+
+
+def inline(func, *args, **kwargs):
+    """
+    func をその場で実行し、その結果を Future として返す
+    """
+    future = Future()
+    _run(future, func, args, kwargs)
+    return future
+
+
+def spawn(func, *args, **kwargs):
+    """
+    func をデーモンスレッドで実行し、その Future を返す
+    """
+    future = Future()
+    thread = threading.Thread(target=_run, args=(future, func, args, kwargs))
+    thread.setDaemon(True)
+    thread.start()
+    return future
+
+
+class WorkerPool(object):
+    """
+    最大 max_workers 本のスレッドで処理を実行するプール。スレッドは必要になった時点で起動する
+    """
+
+    def __init__(self, max_workers=4):
+        if max_workers < 1:
+            raise ValueError("max_workers must be positive : %s" % max_workers)
+        self.max_workers = max_workers
+        self._tasks = Queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args, **kwargs):
+        future = Future()
+        self._tasks.put((future, func, args, kwargs))
+        self._lock.acquire()
+        try:
+            if len(self._threads) < self.max_workers:
+                thread = threading.Thread(target=self._work)
+                thread.setDaemon(True)
+                thread.start()
+                self._threads.append(thread)
+        finally:
+            self._lock.release()
+        return future
+
+    def map(self, func, iterable):
+        """
+        iterable の各要素に func を並列に適用し、結果を iterable の順序で返す
+        """
+        futures = [self.submit(func, x) for x in iterable]
+        return [f.result() for f in futures]
+
+    def shutdown(self, wait=True):
+        self._lock.acquire()
+        try:
+            threads, self._threads = self._threads, []
+        finally:
+            self._lock.release()
+        for t in threads:
+            self._tasks.put(None)
+        if wait:
+            for t in threads:
+                t.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+    def _work(self):
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                return
+            future, func, args, kwargs = task
+            _run(future, func, args, kwargs)
@@ -16,6 +16,7 @@
 # governing permissions and limitations under the License.
 
 import unittest
+import xmlrpclib
 
 import backloglib
 
@@ -36,3 +37,62 @@ class BacklogTestCase(BacklogTestBase):
 class BacklogAdminTestCase(BacklogTestBase):
     def _createBacklog(self):
         return backloglib.BacklogAdmin("space", "admin", "password")
+
+
+class _StubMethod(object):
+    def __init__(self, stub, name):
+        self._stub = stub
+        self._name = name
+
+    def __getattr__(self, name):
+        return _StubMethod(self._stub, "%s.%s" % (self._name, name))
+
+    def __call__(self, *args):
+        self._stub.calls.append((self._name, args))
+        return self._stub.handlers[self._name](*args)
+
+
+class StubServer(object):
+    """
+    Backlog.server の代わりに使うスタブ。handlers に XML-RPC のメソッド名と処理を登録する
+    """
+
+    def __init__(self, handlers=None):
+        self.handlers = handlers or {}
+        self.calls = []
+
+    def __getattr__(self, name):
+        return _StubMethod(self, name)
+
+
+def issue_structs(count, project_id=1, key="STUB"):
+    return [{"id": i, "key": "%s-%d" % (key, i), "summary": u"summary %d" % i, "projectId": project_id,
+             "status": {"id": 1, "name": u"Open"}, "priority": {"id": 3, "name": u"Middle"}}
+            for i in range(1, count + 1)]
+
+
+def find_handler(issues):
+    def findIssue(params):
+        offset = params.get("offset", 0)
+        limit = params.get("limit", 20)
+        return [dict(x) for x in issues[offset:offset + limit]]
+
+    return findIssue
+
+
+class StubTransport(object):
+    """
+    XML-RPC のリクエストを解析して handlers に渡すトランスポートのスタブ
+    """
+
+    def __init__(self, handlers=None):
+        self.handlers = handlers or {}
+        self.calls = []
+
+    def request(self, host, handler, request_body, verbose=0):
+        params, method = xmlrpclib.loads(request_body)
+        self.calls.append((method, params))
+        return (self.handlers[method](*params),)
+
+    def close(self):
+        pass
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+import unittest
+import xmlrpclib
+from test import test_support
+
+from backloglib.models import Comment, DetailUser, Issue
+
+from backloglibtest import BacklogTestCase, StubServer, issue_structs
+
+
+class BatchTest(BacklogTestCase):
+    def setUp(self):
+        super(BatchTest, self).setUp()
+        self.issues = dict([(x["key"], x) for x in issue_structs(5)])
+        self.stub = StubServer({"backlog.getIssue": self._get_issue,
+                                "backlog.getComments": self._get_comments,
+                                "backlog.getUser": self._get_user,
+                                "system.multicall": self._multicall})
+        self.backlog.server = self.stub
+
+    def _get_issue(self, key):
+        if key not in self.issues:
+            raise xmlrpclib.Fault(1, "no such issue %s" % key)
+        return self.issues[key]
+
+    def _get_comments(self, issue_id):
+        return [{"id": 1, "content": u"comment", "created_user": {"id": 1, "name": u"user"},
+                 "created_on": "20140101000000", "updated_on": "20140101000000"}]
+
+    def _get_user(self, user_id):
+        return {"id": user_id, "name": u"user", "lang": "ja", "updated_on": "20140101000000"}
+
+    def _multicall(self, calls):
+        ret = []
+        for call in calls:
+            try:
+                ret.append([self.stub.handlers[call["methodName"]](*call["params"])])
+            except xmlrpclib.Fault, e:
+                ret.append({"faultCode": e.faultCode, "faultString": e.faultString})
+        return ret
+
+    def _called(self):
+        return [name for name, args in self.stub.calls]
+
+    def test_get_issues1(self):
+        actual = self.backlog.get_issues(["STUB-1", "NONE-1", "STUB-3"], chunk_size=2)
+        self.assertTrue(isinstance(actual[0], Issue))
+        self.assertTrue(isinstance(actual[1], xmlrpclib.Fault))
+        self.assertEquals("STUB-3", actual[2].key)
+        self.assertEquals(["system.multicall", "system.multicall"], self._called())
+
+    def test_batch1(self):
+        with self.backlog.batch() as batch:
+            issue = batch.get_issue("STUB-2")
+            comments = batch.get_comments(2)
+            user = batch.get_user(3)
+        self.assertEquals("STUB-2", issue.value.key)
+        self.assertTrue(isinstance(comments.value[0], Comment))
+        self.assertTrue(isinstance(user.value, DetailUser))
+        self.assertEquals(["system.multicall"], self._called())
+
+    def test_batch2(self):
+        def reject(calls):
+            raise xmlrpclib.Fault(-32601, "server error. requested method not found")
+
+        self.stub.handlers["system.multicall"] = reject
+        actual = self.backlog.get_issues(["STUB-1", "NONE-1"])
+        self.assertEquals("STUB-1", actual[0].key)
+        self.assertTrue(isinstance(actual[1], xmlrpclib.Fault))
+        self.assertFalse(self.backlog.multicall_supported)
+        self.backlog.get_issues(["STUB-2"])
+        self.assertEquals(["system.multicall", "backlog.getIssue", "backlog.getIssue", "backlog.getIssue"],
+                          self._called())
+
+    def test_batch3(self):
+        batch = self.backlog.batch()
+        result = batch.get_issue("NONE-1")
+        batch.execute()
+        try:
+            result.value
+            self.fail()
+        except xmlrpclib.Fault:
+            pass
+
+    def test_batch4(self):
+        # system.multicall が無いこと以外の Fault では個別の呼び出しに切り替えない
+        def reject(calls):
+            raise xmlrpclib.Fault(401, "unauthorized")
+
+        self.stub.handlers["system.multicall"] = reject
+        self.assertRaises(xmlrpclib.Fault, self.backlog.get_issues, ["STUB-1"])
+        self.assertTrue(self.backlog.multicall_supported)
+        self.assertEquals(["system.multicall"], self._called())
+
+
+def test_main():
+    test_support.run_unittest(BatchTest)
+
+
+if __name__ == '__main__':
+    test_main()
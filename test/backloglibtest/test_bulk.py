@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+import os
+import tempfile
+import unittest
+from test import test_support
+from xmlrpclib import Fault
+
+from backloglib import AddIssue, Backlog, BacklogAdmin, Issue, PooledTransport, RateLimiter, UpdateIssue, UpdateStatus
+from backloglib.fakeserver import FakeBacklogServer
+
+
+class CreateIssuesTest(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeBacklogServer(issues=0, comments=0, latency=0.01).start()
+        self.transport = PooledTransport(pool_size=4)
+        self.backlog = self.server.client(Backlog, transport=self.transport)
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+        os.remove(self.path)
+
+    def tearDown(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.transport.close()
+        self.server.stop()
+
+    def _issues(self, count):
+        for i in range(count):
+            if i % 2:
+                yield AddIssue(1, u"課題 %d" % i)
+            else:
+                yield {"projectId": 1, "summary": u"課題 %d" % i}
+
+    def test_create_issues1(self):
+        results = self.backlog.create_issues(self._issues(20))
+        self.assertEquals(range(20), [x.index for x in results])
+        self.assertTrue(all([x.ok and isinstance(x.issue, Issue) for x in results]))
+        self.assertEquals([u"課題 %d" % i for i in range(20)], [x.issue.summary for x in results])
+        self.assertEquals(20, self.backlog.count_issue({"projectId": 1}))
+
+    def test_create_issues2(self):
+        # 検証に失敗したものは送らず、サーバのエラーは Fault として返す
+        issues = [{"projectId": 1, "summary": u"a"}, {"projectId": 1}, {"projectId": 99, "summary": u"c"},
+                  {"projectId": 1, "summary": u"d", "unknown": 1}, {"projectId": 1, "summary": u"e"}]
+        results = self.backlog.create_issues(issues, max_in_flight=2)
+        self.assertEquals([True, False, False, False, True], [x.ok for x in results])
+        self.assertTrue(isinstance(results[1].error, TypeError))
+        self.assertTrue(isinstance(results[2].fault, Fault))
+        self.assertRaises(Fault, lambda: results[2].value)
+        self.assertTrue(isinstance(results[3].error, TypeError))
+        self.assertEquals(3, self.server.calls["backlog.createIssue"])
+
+    def test_checkpoint1(self):
+        issues = [{"projectId": 1 if i != 3 else 99, "summary": u"課題 %d" % i} for i in range(10)]
+        first = self.backlog.create_issues(issues, checkpoint=self.path)
+        self.assertEquals(9, len([x for x in first if x.ok]))
+        # 再実行では失敗したものだけを登録する
+        issues[3]["projectId"] = 1
+        second = self.backlog.create_issues(issues, checkpoint=self.path)
+        self.assertEquals([3], [x.index for x in second if not x.skipped])
+        self.assertTrue(all([x.ok for x in second]))
+        self.assertEquals(first[5].key, second[5].key)
+        self.assertEquals(10, self.backlog.count_issue({"projectId": 1}))
+        # 途中で中断した行は無視する
+        f = open(self.path, "a")
+        f.write('{"index": 1')
+        f.close()
+        issues.append({"projectId": 1, "summary": u"課題 10"})
+        third = self.backlog.create_issues(issues, checkpoint=self.path)
+        self.assertEquals([10], [x.index for x in third if not x.skipped])
+        fourth = self.backlog.create_issues(issues, checkpoint=self.path)
+        self.assertTrue(all([x.skipped for x in fourth]))
+
+
+class UpdateIssuesTest(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeBacklogServer(issues=10, comments=0).start()
+        self.transport = PooledTransport(pool_size=4)
+        self.backlog = self.server.client(Backlog, transport=self.transport)
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.stop()
+
+    def test_update_issues1(self):
+        updates = [UpdateIssue("FAKE-1", summary=u"a"),
+                   {"key": "FAKE-2", "summary": u"b"},
+                   {"key": "FAKE-1", "description": u"c", "milestoneId": 1},
+                   UpdateStatus("FAKE-1", 4, None, 0, u"完了"),
+                   UpdateStatus("FAKE-2", 2, None, None, None),
+                   {"key": "FAKE-1", "summary": u"d"}]
+        report = self.backlog.update_issues(updates)
+        self.assertEquals(6, len(report.results))
+        self.assertEquals([], report.failed)
+        # FAKE-1 は 3 回、FAKE-2 は 2 回の呼び出しにまとまる
+        self.assertEquals(5, report.calls)
+        self.assertEquals(3, self.server.calls["backlog.updateIssue"])
+        self.assertEquals(2, self.server.calls["backlog.switchStatus"])
+        self.assertTrue(report.results[0].issue is report.results[2].issue)
+        self.assertTrue(report.throughput > 0)
+        issue = self.backlog.get_issue("FAKE-1")
+        self.assertEquals(u"d", issue.summary)
+        self.assertEquals(u"c", issue.description)
+        self.assertEquals(1, issue.milestones[0].id)
+        self.assertEquals(4, issue.status.id)
+        self.assertEquals(2, self.backlog.get_issue("FAKE-2").status.id)
+
+    def test_update_issues2(self):
+        # コメントを持つ更新同士はまとめない
+        updates = [{"key": "FAKE-3", "comment": u"1"}, {"key": "FAKE-3", "comment": u"2"}]
+        report = self.backlog.update_issues(updates)
+        self.assertEquals(2, report.calls)
+        self.assertEquals([u"1", u"2"], [x.content for x in self.backlog.get_comments(
+            self.backlog.get_issue("FAKE-3").id)])
+
+    def test_update_issues3(self):
+        # 失敗した課題キーのそれ以降の更新は行わず、他の課題キーは続ける
+        updates = [{"key": "FAKE-99", "summary": u"a"}, {"key": "FAKE-4", "summary": u"b"},
+                   UpdateStatus("FAKE-99", 4, None, None, None), {"key": "FAKE-5", "unknown": 1}]
+        report = self.backlog.update_issues(updates, max_in_flight=2)
+        self.assertEquals([0, 2, 3], [x.index for x in report.failed])
+        self.assertTrue(isinstance(report.results[0].fault, Fault))
+        self.assertTrue(isinstance(report.results[2].error, RuntimeError))
+        self.assertTrue(isinstance(report.results[3].error, TypeError))
+        self.assertEquals(u"b", report.results[1].value.summary)
+        self.assertEquals(0, self.server.calls.get("backlog.switchStatus", 0))
+
+    def test_rate_limit1(self):
+        limiter = RateLimiter(read_rate=100, write_rate=20, write_burst=1)
+        backlog = self.server.client(Backlog, transport=self.transport, limiter=limiter)
+        report = backlog.update_issues([{"key": "FAKE-%d" % i, "summary": u"x"} for i in range(1, 11)])
+        self.assertEquals([], report.failed)
+        self.assertTrue(report.elapsed >= 0.4)
+        self.assertTrue(report.throughput <= 25)
+
+
+class SyncProjectMembersTest(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeBacklogServer(projects=3, issues=0, comments=0, users=6).start()
+        self.transport = PooledTransport(pool_size=4)
+        self.admin = self.server.client(BacklogAdmin, transport=self.transport)
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.stop()
+
+    def _members(self, project_id):
+        return sorted([x.id for x in self.admin.get_project_users(project_id)])
+
+    def _writes(self):
+        return sum([self.server.calls.get("backlog.admin.%s" % x, 0)
+                    for x in ("addProjectUser", "deleteProjectUser", "updateProjectUsers")])
+
+    def test_sync1(self):
+        result = self.admin.sync_project_members(1, [1, 2, 3, 4, 5, 6])
+        self.assertEquals(0, result.calls)
+        self.assertFalse(result.changed)
+        self.assertEquals(0, self._writes())
+
+        result = self.admin.sync_project_members(1, [1, 2, 3, 4, 5])
+        self.assertEquals([6], result.removed)
+        self.assertEquals(1, self.server.calls["backlog.admin.deleteProjectUser"])
+        result = self.admin.sync_project_members(1, [1, 2, 3, 4, 5, 6])
+        self.assertEquals([6], result.added)
+        self.assertEquals(1, self.server.calls["backlog.admin.addProjectUser"])
+
+        result = self.admin.sync_project_members(1, [2, 4, 6])
+        self.assertEquals([1, 3, 5], result.removed)
+        self.assertEquals(1, self.server.calls["backlog.admin.updateProjectUsers"])
+        self.assertEquals([2, 4, 6], sorted([x.id for x in result.users]))
+        self.assertEquals([2, 4, 6], self._members(1))
+
+    def test_sync2(self):
+        result = self.admin.sync_project_members(1, [1], dry_run=True)
+        self.assertEquals([2, 3, 4, 5, 6], result.removed)
+        self.assertEquals(0, self._writes())
+        result = self.admin.sync_project_members(1, [1, 99])
+        self.assertFalse(result.ok)
+        self.assertTrue(isinstance(result.fault, Fault))
+
+    def test_sync_all1(self):
+        results = self.admin.sync_all_project_members({3: [1, 2], 1: [1, 2, 3, 4, 5, 6], 2: [6]})
+        self.assertEquals([1, 2, 3], [x.project_id for x in results])
+        self.assertEquals([0, 1, 1], [x.calls for x in results])
+        self.assertEquals(2, self._writes())
+        self.assertEquals([6], self._members(2))
+        self.assertEquals([1, 2], self._members(3))
+
+
+def test_main():
+    test_support.run_unittest(CreateIssuesTest, UpdateIssuesTest, SyncProjectMembersTest)
+
+
+if __name__ == '__main__':
+    test_main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+import os
+import tempfile
+import time
+import unittest
+from test import test_support
+
+import backloglib
+from backloglib.cache import MasterDataCache, MemoryBackend, SqliteBackend
+from backloglib.models import Component, Status
+
+from backloglibtest import StubTransport
+
+
+class MasterDataCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.components = [{"id": 1, "name": u"component"}]
+        self.transport = StubTransport({
+            "backlog.getStatuses": lambda: [{"id": 1, "name": u"Open"}],
+            "backlog.getComponents": lambda project_id: self.components,
+            "backlog.addComponent": self._add_component,
+            "backlog.getIssue": lambda key: {"id": 1, "key": key},
+            "backlog.admin.addProjectUser": lambda args: [],
+        })
+        self.cache = self._createCache()
+        self.backlog = backloglib.Backlog("space", "user", "password", transport=self.transport, cache=self.cache)
+
+    def _createCache(self):
+        return MasterDataCache(MemoryBackend())
+
+    def _add_component(self, args):
+        component = {"id": len(self.components) + 1, "name": args["name"]}
+        self.components = self.components + [component]
+        return component
+
+    def _called(self):
+        return [name for name, args in self.transport.calls]
+
+    def test_cache1(self):
+        for i in range(3):
+            actual = self.backlog.get_statuses()
+            self.assertTrue(isinstance(actual[0], Status))
+        self.assertEquals(["backlog.getStatuses"], self._called())
+
+    def test_cache2(self):
+        self.backlog.get_issue("STUB-1")
+        self.backlog.get_issue("STUB-1")
+        self.assertEquals(2, len(self.transport.calls))
+
+    def test_params1(self):
+        self.backlog.get_components(1)
+        self.backlog.get_components(2)
+        self.backlog.get_components(1)
+        self.assertEquals(["backlog.getComponents", "backlog.getComponents"], self._called())
+
+    def test_invalidate1(self):
+        self.assertEquals(1, len(self.backlog.get_components(1)))
+        self.backlog.get_statuses()
+        self.backlog.add_component({"project_id": 1, "name": u"added"})
+        actual = self.backlog.get_components(1)
+        self.assertEquals(2, len(actual))
+        self.assertTrue(isinstance(actual[1], Component))
+        self.backlog.get_statuses()
+        self.assertEquals(["backlog.getComponents", "backlog.getStatuses", "backlog.addComponent",
+                           "backlog.getComponents"], self._called())
+
+    def test_invalidate2(self):
+        # 別ユーザの BacklogAdmin からの更新でも破棄される
+        self.transport.handlers["backlog.getUsers"] = lambda project_id: []
+        backlog = backloglib.Backlog("space", "user", "password", transport=self.transport, cache=self.cache)
+        admin = backloglib.BacklogAdmin("space", "admin", "secret", transport=self.transport, cache=self.cache)
+        backlog.get_users(1)
+        admin.add_project_user({"project_id": 1, "user_id": 2})
+        backlog.get_users(1)
+        self.assertEquals(["backlog.getUsers", "backlog.admin.addProjectUser", "backlog.getUsers"], self._called())
+
+    def test_user1(self):
+        # 取得できる内容はユーザの権限で変わるため、別ユーザとは共有しない
+        other = backloglib.Backlog("space", "other", "password", transport=self.transport, cache=self.cache)
+        self.backlog.get_components(1)
+        other.get_components(1)
+        other.get_components(1)
+        self.backlog.get_components(1)
+        self.assertEquals(["backlog.getComponents", "backlog.getComponents"], self._called())
+        # 更新は全てのユーザのエントリを破棄する
+        self.backlog.add_component({"project_id": 1, "name": u"added"})
+        self.assertEquals(2, len(other.get_components(1)))
+        self.assertEquals(["backlog.getComponents", "backlog.getComponents", "backlog.addComponent",
+                           "backlog.getComponents"], self._called())
+
+    def test_user2(self):
+        # 状態などのスペースで共通のマスタデータはユーザ間で共有する
+        other = backloglib.Backlog("space", "other", "password", transport=self.transport, cache=self.cache)
+        self.backlog.get_statuses()
+        other.get_statuses()
+        self.assertEquals(["backlog.getStatuses"], self._called())
+
+    def test_ttl1(self):
+        self.cache.ttls["backlog.getStatuses"] = 0.01
+        self.backlog.get_statuses()
+        time.sleep(0.02)
+        self.backlog.get_statuses()
+        self.assertEquals(2, len(self.transport.calls))
+
+
+class SqliteMasterDataCacheTest(MasterDataCacheTest):
+    def _createCache(self):
+        fd, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        return MasterDataCache(SqliteBackend(self.path))
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_shared1(self):
+        self.backlog.get_statuses()
+        other = backloglib.Backlog("space", "user", "password", transport=self.transport,
+                                   cache=MasterDataCache(SqliteBackend(self.path)))
+        actual = other.get_statuses()
+        self.assertEquals(u"Open", actual[0].name)
+        self.assertEquals(1, len(self.transport.calls))
+
+
+class BackendTest(unittest.TestCase):
+    def test_lru1(self):
+        backend = MemoryBackend(max_entries=2)
+        backend.set("a", 1, 60)
+        backend.set("b", 2, 60)
+        backend.get("a")
+        backend.set("c", 3, 60)
+        self.assertEquals((True, 1), backend.get("a"))
+        self.assertEquals((False, None), backend.get("b"))
+
+    def test_lru2(self):
+        fd, path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        try:
+            backend = SqliteBackend(path, max_entries=2)
+            backend.set("a", 1, 60)
+            time.sleep(0.01)
+            backend.set("b", 2, 60)
+            time.sleep(0.01)
+            backend.get("a")
+            time.sleep(0.01)
+            backend.set("c", 3, 60)
+            self.assertEquals((True, 1), backend.get("a"))
+            self.assertEquals((False, None), backend.get("b"))
+        finally:
+            os.remove(path)
+
+
+def test_main():
+    test_support.run_unittest(MasterDataCacheTest, SqliteMasterDataCacheTest, BackendTest)
+
+
+if __name__ == '__main__':
+    test_main()
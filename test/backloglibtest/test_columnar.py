@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+import unittest
+from test import test_support
+
+from backloglib import Backlog, PooledTransport, columnar
+from backloglib.fakeserver import FakeBacklogServer
+
+numpy = columnar.numpy
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class IssueBatchTest(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeBacklogServer(issues=30, comments=0, users=3).start()
+        self.transport = PooledTransport()
+        self.backlog = self.server.client(Backlog, transport=self.transport)
+        fake = self.server.backlog
+        for i in range(1, 31):
+            self.backlog.update_issue({"key": "FAKE-%d" % i, "estimated_hours": i % 4 if i % 2 else None,
+                                       "due_date": "201403%02d" % (i % 28 + 1)})
+            if i % 5:
+                fake.issues[fake.issue_keys["FAKE-%d" % i]]["assigner"] = fake._ref(fake.users[i % 3 + 1])
+        self.issues = self.backlog.find_issue({"projectId": 1, "sort": "CREATED", "order": True, "limit": 100})
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.stop()
+
+    def test_find_issue_batch1(self):
+        batch = self.backlog.find_issue_batch({"projectId": 1, "sort": "CREATED", "order": True, "limit": 100})
+        self.assertEquals(30, len(batch))
+        self.assertEquals(numpy.int64, batch.id.dtype)
+        self.assertEquals([x.id for x in self.issues], batch.id.tolist())
+        self.assertEquals([x.key for x in self.issues], batch.key.tolist())
+        self.assertEquals([x.status.name for x in self.issues], [batch.status[i] for i in range(30)])
+        self.assertEquals([getattr(x, "assigner", None) and x.assigner.name for x in self.issues],
+                          [batch.assigner[i] for i in range(30)])
+        self.assertEquals(numpy.dtype("datetime64[s]"), batch.created_on.dtype)
+        created = self.issues[0].created_on
+        self.assertEquals("%s-%s-%sT%s:%s:%s" % (created[:4], created[4:6], created[6:8], created[8:10],
+                                                 created[10:12], created[12:14]), str(batch.created_on[0]))
+        self.assertEquals(numpy.datetime64("2014-03-03"), batch.due_date[1])
+        self.assertTrue(numpy.isnan(batch.estimated_hours[1]))
+        self.assertEquals(1.0, batch.estimated_hours[0])
+
+    def test_count_by1(self):
+        batch = self.backlog.find_issue_batch({"projectId": 1}, page_size=7)
+        self.assertEquals(30, len(batch))
+        expected = {}
+        for issue in self.issues:
+            expected[issue.status.name] = expected.get(issue.status.name, 0) + 1
+        self.assertEquals(expected, batch.count_by("status"))
+        actual = batch.count_by("status", "assigner")
+        self.assertEquals(30, sum(actual.values()))
+        self.assertEquals(6, sum([v for k, v in actual.items() if k[1] is None]))
+        # 経過時間のような集計は配列の演算で行える
+        days = (batch.updated_on - batch.created_on) / numpy.timedelta64(1, "D")
+        self.assertEquals(30, len(days))
+
+    def test_page_size1(self):
+        server = FakeBacklogServer(issues=250, comments=0).start()
+        try:
+            backlog = server.client(Backlog, transport=self.transport)
+            batch = backlog.find_issue_batch({"projectId": 1, "sort": "CREATED", "order": True}, page_size=100)
+            self.assertEquals(range(1, 251), batch.id.tolist())
+            self.assertRaises(ValueError, backlog.find_issue_batch, {"projectId": 1}, page_size=200)
+        finally:
+            server.stop()
+
+    def test_empty1(self):
+        batch = self.backlog.find_issue_batch({"projectId": 1, "statusId": 99})
+        self.assertEquals(0, len(batch))
+        self.assertEquals({}, batch.count_by("status"))
+        self.assertEquals({}, batch.count_by("status", "priority"))
+
+
+def test_main():
+    test_support.run_unittest(IssueBatchTest)
+
+
+if __name__ == '__main__':
+    test_main()
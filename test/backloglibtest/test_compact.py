@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+import pickle
+import unittest
+from test import test_support
+
+import backloglib
+from backloglib import compact, models, utils
+
+from backloglibtest import StubServer
+from backloglibtest.test_models import ISSUE
+
+COMMENT = {"id": 1, "content": u"comment", "created_user": {"id": 1, "name": u"user"},
+           "created_on": "20140101000000", "updated_on": "20140102000000"}
+
+PROJECT_SUMMARY = {"id": 1, "name": u"project", "key": "STUB", "url": "http://example.com",
+                   "statuses": [{"id": 1, "name": u"Open", "count": 3}],
+                   "milestones": [{"id": 2, "name": u"1.0", "due_date": "20140101",
+                                   "statuses": [{"id": 1, "name": u"Open", "count": 1}]}]}
+
+
+class CompactTest(unittest.TestCase):
+    def _assertSame(self, name, struct):
+        expected = getattr(models, name)(**struct)
+        actual = getattr(compact, name)(**struct)
+        self.assertFalse(hasattr(actual, "__dict__"))
+        self.assertEquals(expected.serialize(), actual.serialize())
+        self.assertEquals(repr(expected), repr(actual))
+        return actual
+
+    def test_issue1(self):
+        actual = self._assertSame("Issue", ISSUE)
+        self.assertTrue(isinstance(actual.status, compact.Status))
+        self.assertTrue(isinstance(actual.versions[0], compact.Version))
+        self.assertFalse(hasattr(actual, "resolution"))
+
+    def test_issue2(self):
+        struct = dict(ISSUE, custom_field=u"value")
+        actual = self._assertSame("Issue", struct)
+        self.assertEquals(u"value", actual.custom_field)
+
+    def test_comment1(self):
+        actual = self._assertSame("Comment", COMMENT)
+        self.assertEquals("20140102000000", actual.udpated_on)
+
+    def test_project_summary1(self):
+        actual = self._assertSame("ProjectSummary", PROJECT_SUMMARY)
+        self.assertTrue(isinstance(actual.milestones[0].statuses[0], compact.StatusSummary))
+
+    def test_constants1(self):
+        self.assertEquals(models.Status.COMPLETED, compact.Status.COMPLETED)
+        self.assertEquals(models.Resolution.availables(), compact.Resolution.availables())
+
+    def test_classwrap1(self):
+        status = utils.classwrap({"id": 1, "name": u"Open"}, compact.Status)
+        self.assertTrue(utils.classwrap(status, compact.Status) is status)
+
+    def test_args1(self):
+        self.assertRaises(TypeError, compact.Project, id=1)
+        self.assertEquals(None, compact.IssueType(1, u"Bug").color)
+
+    def test_pickle1(self):
+        issue = compact.Issue(**dict(ISSUE, custom_field=u"value"))
+        actual = pickle.loads(pickle.dumps(issue, pickle.HIGHEST_PROTOCOL))
+        self.assertEquals(issue.serialize(), actual.serialize())
+
+    def test_backlog1(self):
+        backlog = backloglib.Backlog("space", "user", "password", compact=True)
+        backlog.server = StubServer({"backlog.getIssue": lambda key: dict(ISSUE),
+                                     "backlog.getComments": lambda issue_id: [COMMENT]})
+        self.assertTrue(isinstance(backlog.get_issue("STUB-1"), compact.Issue))
+        self.assertTrue(isinstance(backlog.get_comments(1)[0], compact.Comment))
+
+    def test_backlog2(self):
+        self.assertRaises(ValueError, backloglib.Backlog, "space", "user", "password", lazy=True, compact=True)
+
+
+def test_main():
+    test_support.run_unittest(CompactTest)
+
+
+if __name__ == '__main__':
+    test_main()
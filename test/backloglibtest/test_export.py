@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+import StringIO
+import csv
+import json
+import os
+import sys
+import tempfile
+import unittest
+from collections import OrderedDict
+from test import test_support
+
+from backloglib import Backlog, PooledTransport
+from backloglib.export import DEFAULT_COLUMNS, export_issues, main
+from backloglib.fakeserver import FakeBacklogServer
+
+
+class _Output(object):
+    def __init__(self):
+        self.writes = []
+
+    def write(self, data):
+        self.writes.append(data)
+
+    def flush(self):
+        pass
+
+    def getvalue(self):
+        return "".join(self.writes)
+
+
+class ExportTest(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeBacklogServer(projects=2, issues=30, comments=0).start()
+        self.transport = PooledTransport()
+        self.backlog = self.server.client(Backlog, transport=self.transport)
+        self.backlog.update_issue({"key": "FAKE-2", "versionId": 1, "milestoneId": 1})
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.stop()
+
+    def test_jsonl1(self):
+        out = _Output()
+        count = export_issues(self.backlog, {"projectId": 1}, out, page_size=7)
+        self.assertEquals(30, count)
+        rows = [json.loads(x, object_pairs_hook=OrderedDict) for x in out.getvalue().splitlines()]
+        self.assertEquals([x[0] for x in DEFAULT_COLUMNS], rows[0].keys())
+        expected = self.backlog.find_issue({"projectId": 1, "sort": "CREATED", "order": True, "limit": 100})
+        self.assertEquals([x.key for x in expected], [x["key"] for x in rows])
+        issue = [x for x in expected if x.key == "FAKE-2"][0]
+        row = [x for x in rows if x["key"] == "FAKE-2"][0]
+        self.assertEquals(issue.status.name, row["status"])
+        self.assertEquals(issue.created_user.name, row["created_user"])
+        self.assertEquals(None, row["assigner"])
+        self.assertEquals([x.name for x in issue.versions], row["versions"])
+        self.assertEquals([x.name for x in issue.milestones], row["milestones"])
+        self.assertEquals(issue.summary, row["summary"])
+
+    def test_csv1(self):
+        out = _Output()
+        columns = [("key", "key"), ("status", "status.name"), ("versions", "versions[].id"), ("none", "nothing.x")]
+        count = export_issues(self.backlog, [{"projectId": 1, "limit": 5}, {"projectId": 2}], out, format="csv",
+                              columns=columns, page_size=4, buffer_size=64)
+        rows = list(csv.reader(StringIO.StringIO(out.getvalue())))
+        self.assertEquals(["key", "status", "versions", "none"], rows[0])
+        self.assertEquals(5 + 30, count)
+        self.assertEquals(count, len(rows) - 1)
+        self.assertEquals(["FAKE-1", "FAKE-2", "FAKE-3"], [x[0] for x in rows[1:4]])
+        self.assertEquals("1", rows[2][2])
+        self.assertEquals("", rows[1][3])
+        # バッファの単位で書き込む
+        self.assertTrue(1 < len(out.writes) < count)
+
+    def test_main1(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        stderr = sys.stderr
+        sys.stderr = StringIO.StringIO()
+        try:
+            main(["backlog-export", "--uri", self.server.uri, "-p", "2", "--condition", "statusId=1,2",
+                  "--column", "key=key", "--column", "status=status.name", "-f", "csv", "-o", path])
+            f = open(path)
+            rows = list(csv.reader(f))
+            f.close()
+        finally:
+            sys.stderr = stderr
+            os.remove(path)
+        self.assertEquals(["key", "status"], rows[0])
+        self.assertEquals(self.backlog.count_issue({"projectId": 2, "statusId": [1, 2]}), len(rows) - 1)
+
+    def test_page_size1(self):
+        server = FakeBacklogServer(issues=250, comments=0).start()
+        stderr = sys.stderr
+        try:
+            backlog = server.client(Backlog, transport=self.transport)
+            out = _Output()
+            self.assertEquals(250, export_issues(backlog, {"projectId": 1}, out, columns=[("id", "id")]))
+            self.assertEquals(250, len(set(out.getvalue().splitlines())))
+            self.assertRaises(ValueError, export_issues, backlog, {"projectId": 1}, _Output(), page_size=200)
+            sys.stderr = StringIO.StringIO()
+            self.assertRaises(SystemExit, main, ["backlog-export", "--uri", server.uri, "-p", "1",
+                                                 "--page-size", "200"])
+        finally:
+            sys.stderr = stderr
+            server.stop()
+
+
+def test_main():
+    test_support.run_unittest(ExportTest)
+
+
+if __name__ == '__main__':
+    test_main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+import unittest
+import time
+import xmlrpclib
+from test import test_support
+
+from backloglib import Backlog, BacklogAdmin, PooledTransport
+from backloglib.fakeserver import FakeBacklogServer
+from backloglib.models import Comment, Status
+
+
+class FakeBacklogServerTest(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeBacklogServer(issues=30, comments=2, users=3).start()
+        self.transport = PooledTransport()
+        self.backlog = self.server.client(Backlog, transport=self.transport)
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.stop()
+
+    def test_find_issue1(self):
+        issues = self.backlog.find_issue({"projectId": 1, "sort": "CREATED", "order": True, "limit": 100})
+        self.assertEquals(["FAKE-%d" % i for i in range(1, 31)], [x.key for x in issues])
+        self.assertTrue(isinstance(issues[0].status, Status))
+        self.assertEquals(20, len(self.backlog.find_issue({"projectId": 1})))
+        self.assertEquals(30, self.backlog.count_issue({"projectId": 1}))
+
+    def test_get_comments1(self):
+        comments = self.backlog.get_comments(self.backlog.get_issue("FAKE-1").id)
+        self.assertEquals(2, len(comments))
+        self.assertTrue(isinstance(comments[0], Comment))
+
+    def test_create_issue1(self):
+        issue = self.backlog.create_issue({"projectId": 1, "summary": u"新しい課題", "priorityId": 2})
+        self.assertEquals("FAKE-31", issue.key)
+        self.assertEquals(2, issue.priority.id)
+        updated = self.backlog.switch_status({"key": issue.key, "statusId": Status.DONE, "assignerId": 2,
+                                              "resolutionId": 0, "comment": u"完了"})
+        self.assertEquals(Status.DONE, updated.status.id)
+        self.assertEquals(u"完了", self.backlog.get_comments(issue.id)[-1].content)
+        self.assertEquals(1, self.backlog.count_issue({"projectId": 1, "statusId": [Status.DONE]}))
+
+    def test_fault1(self):
+        self.assertRaises(xmlrpclib.Fault, self.backlog.get_issue, "NOTFOUND-1")
+        self.assertRaises(xmlrpclib.Fault, self.backlog.server.backlog.unknown)
+        self.assertEquals([None, "FAKE-2"], [getattr(x, "key", None) for x in
+                                             self.backlog.get_issues(["NOTFOUND-1", "FAKE-2"])])
+
+    def test_admin1(self):
+        admin = self.server.client(BacklogAdmin)
+        user = admin.add_user({"user_id": "new", "password_md5": "x", "name": u"新規", "mail_address": "new@example.com",
+                               "role": BacklogAdmin.ROLE_NORMAL_USER})
+        admin.add_project_user({"project_id": 1, "user_id": user.id})
+        self.assertEquals(4, len(admin.get_project_users(1)))
+        admin.delete_user(user.id)
+        self.assertEquals(3, len(self.backlog.get_users(1)))
+
+    def test_latency1(self):
+        self.server.latency = 0.05
+        start = time.time()
+        self.backlog.get_statuses()
+        self.assertTrue(time.time() - start >= 0.05)
+        self.assertEquals(1, self.server.calls["backlog.getStatuses"])
+
+
+def test_main():
+    test_support.run_unittest(FakeBacklogServerTest)
+
+
+if __name__ == '__main__':
+    test_main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+from test import test_support
+
+from backloglib import Backlog, PooledTransport
+from backloglib.fakeserver import ICON, ICON_UPDATED_ON, FakeBacklogServer
+from backloglib.icons import IconCache
+from backloglib.models import UserIcon
+
+
+class IconCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeBacklogServer(issues=0, comments=0, users=5).start()
+        self.transport = PooledTransport()
+        self.backlog = self.server.client(Backlog, transport=self.transport)
+        self.directory = tempfile.mkdtemp()
+        for user_id in range(1, 6):
+            self.server.backlog.icons[user_id] = ICON + "%d" % user_id * 100
+        self.icons = IconCache(self.backlog, self.directory, max_bytes=len(ICON) * 3 + 300)
+
+    def tearDown(self):
+        self.icons.close()
+        shutil.rmtree(self.directory)
+        self.transport.close()
+        self.server.stop()
+
+    def _calls(self, method):
+        return self.server.calls.get("backlog.%s" % method, 0)
+
+    def test_get1(self):
+        icon = self.icons.get(1)
+        self.assertTrue(isinstance(icon, UserIcon))
+        self.assertEquals(ICON + "1" * 100, icon.data[:])
+        self.assertEquals("image/gif", icon.content_type)
+        self.assertEquals(ICON_UPDATED_ON, icon.updated_on)
+        self.assertEquals(1, self._calls("getUserIcon"))
+        # ユーザの updated_on が変わっていなければファイルから返す
+        cached = self.icons.get(1)
+        self.assertEquals(ICON + "1" * 100, cached.data[:])
+        self.assertEquals(ICON_UPDATED_ON, cached.updated_on)
+        self.assertEquals(1, self._calls("getUserIcon"))
+        self.assertEquals(2, self._calls("getUser"))
+        self.assertTrue(os.path.exists(self.icons.path(1)))
+
+    def test_get2(self):
+        self.icons.get(1)
+        self.server.backlog.icons[1] = ICON + "x"
+        self.server.backlog.users[1]["updated_on"] = "20991231000000"
+        self.assertEquals(ICON + "x", self.icons.get(1).data[:])
+        self.assertEquals(2, self._calls("getUserIcon"))
+        self.assertEquals(len(ICON) + 1, self.icons.size())
+
+    def test_get3(self):
+        # アイコンとユーザの updated_on は別の値で、DetailUser.updated_on を渡せば API を呼び出さない
+        user = self.backlog.get_user(1)
+        self.assertNotEquals(ICON_UPDATED_ON, user.updated_on)
+        icon = self.icons.get(user.id, user.updated_on)
+        for i in range(3):
+            cached = self.icons.get(user.id, user.updated_on)
+        self.assertEquals(1, self._calls("getUserIcon"))
+        self.assertEquals(1, self._calls("getUser"))
+        # 取得し直した場合とファイルから返した場合で data の型は同じ
+        self.assertEquals(type(icon.data), type(cached.data))
+        self.assertEquals(icon.data[:], cached.data[:])
+
+    def test_dedupe1(self):
+        self.server.backlog.icons.clear()
+        for user_id in range(1, 6):
+            self.icons.get(user_id)
+        self.assertEquals(len(ICON), self.icons.size())
+        self.assertEquals(self.icons.path(1), self.icons.path(5))
+
+    def test_evict1(self):
+        for user_id in (1, 2, 3):
+            self.icons.get(user_id)
+        self.icons.get(1)
+        self.icons.get(4)
+        # 最後に参照した時刻が最も古い 2 が削除される
+        self.assertEquals(None, self.icons.path(2))
+        self.assertTrue(self.icons.size() <= self.icons.max_bytes)
+        self.assertEquals(3, len([x for d, dirs, files in os.walk(self.directory) for x in files
+                                  if x != "index.db"]))
+        icons = IconCache(self.backlog, self.directory)
+        self.assertEquals(ICON + "1" * 100, icons.get(1, self.backlog.get_user(1).updated_on).data[:])
+        self.assertEquals(4, self._calls("getUserIcon"))
+        icons.close()
+
+
+def test_main():
+    test_support.run_unittest(IconCacheTest)
+
+
+if __name__ == '__main__':
+    test_main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+import logging
+import unittest
+import xmlrpclib
+from test import test_support
+
+from backloglib import Backlog, Instrumentation, MasterDataCache, PooledTransport, columnar
+from backloglib.fakeserver import FakeBacklogServer
+from backloglib.instrument import CallbackSink, CallRecord, HistogramSink, LogSink
+
+from backloglibtest import StubTransport
+
+
+class _Handler(logging.Handler):
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+class InstrumentationTest(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeBacklogServer(issues=30, comments=3).start()
+        self.transport = PooledTransport()
+        self.records = []
+        self.histogram = HistogramSink()
+        self.instrumentation = Instrumentation(self.histogram, CallbackSink(self.records.append))
+        self.backlog = self.server.client(Backlog, transport=self.transport, cache=MasterDataCache(),
+                                          instrumentation=self.instrumentation)
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.stop()
+
+    def test_record1(self):
+        self.backlog.find_issue({"projectId": 1, "limit": 30})
+        record = self.records[0]
+        self.assertEquals("backlog.findIssue", record.method)
+        self.assertEquals(30, record.objects)
+        self.assertFalse(record.cached)
+        self.assertTrue(record.request_bytes > 0)
+        self.assertTrue(record.response_bytes > record.request_bytes)
+        self.assertTrue(record.network > 0 and record.unmarshal > 0)
+        self.assertTrue(record.wall >= record.network + record.unmarshal)
+
+    def test_model1(self):
+        # factories に登録していないメソッドは、Backlog のメソッドでモデルオブジェクトに変換する
+        self.backlog.get_issue("FAKE-1")
+        record = self.records[0]
+        self.assertEquals(1, record.objects)
+        self.assertTrue(record.model > 0)
+
+    def test_cached1(self):
+        self.backlog.get_statuses()
+        self.backlog.get_statuses()
+        self.assertEquals([False, True], [x.cached for x in self.records])
+        self.assertEquals(0, self.records[1].response_bytes)
+        self.assertEquals(4, self.records[1].objects)
+
+    def test_error1(self):
+        self.assertRaises(xmlrpclib.Fault, self.backlog.get_issue, "NOTFOUND-1")
+        self.assertEquals("Fault", self.records[0].error)
+
+    def test_histogram1(self):
+        for i in range(5):
+            self.backlog.get_comments(i + 1)
+        stats = self.histogram.snapshot()["backlog.getComments"]
+        self.assertEquals(5, stats["calls"])
+        self.assertEquals(15, stats["objects"])
+        self.assertEquals(5, sum(stats["buckets"]))
+        self.assertTrue(self.histogram.percentile("backlog.getComments", 0.5) > 0)
+        self.assertEquals(None, self.histogram.percentile("backlog.getIssue", 0.5))
+
+    def test_stream1(self):
+        stream = self.backlog.find_issue_stream({"projectId": 1, "limit": 30})
+        self.assertEquals([], self.records)
+        issues = []
+        for issue in stream:
+            # ループの中の呼び出しは別に記録する
+            if not issues:
+                self.backlog.get_issue(issue.key)
+            issues.append(issue)
+        self.assertEquals(["backlog.getIssue", "backlog.findIssue"], [x.method for x in self.records])
+        record = self.records[1]
+        self.assertEquals(30, record.objects)
+        self.assertFalse(record.cached)
+        self.assertTrue(record.request_bytes > 0)
+        self.assertTrue(record.response_bytes > record.request_bytes)
+        self.assertTrue(record.unmarshal > 0)
+        self.assertTrue(record.wall >= record.network + record.unmarshal)
+        self.assertEquals(1, self.histogram.snapshot()["backlog.findIssue"]["calls"])
+
+    @unittest.skipIf(columnar.numpy is None, "numpy is not installed")
+    def test_stream2(self):
+        # ストリームで取得する Backlog のメソッドも記録する
+        batch = self.backlog.find_issue_batch({"projectId": 1}, page_size=20)
+        self.assertEquals(30, len(batch))
+        self.assertEquals([20, 10], [x.objects for x in self.records if x.method == "backlog.findIssue"])
+
+    def test_disabled1(self):
+        backlog = self.server.client(Backlog, transport=self.transport)
+        self.assertFalse("get_issue" in vars(backlog))
+        self.assertTrue("get_issue" in vars(self.backlog))
+        backlog.get_issue("FAKE-1")
+        self.assertEquals([], self.records)
+
+
+class SinkTest(unittest.TestCase):
+    def test_log1(self):
+        logger = logging.getLogger("backloglibtest.instrument")
+        logger.setLevel(logging.INFO)
+        handler = _Handler()
+        logger.addHandler(handler)
+        try:
+            transport = StubTransport({"backlog.getIssue": lambda key: {"id": 1, "key": key}})
+            backlog = Backlog("space", "user", "password", transport=transport,
+                              instrumentation=Instrumentation(LogSink(logger)))
+            backlog.get_issue("STUB-1")
+        finally:
+            logger.removeHandler(handler)
+        self.assertEquals(1, len(handler.messages))
+        self.assertTrue(handler.messages[0].startswith("backlog.getIssue wall="))
+        self.assertTrue("objects=1" in handler.messages[0])
+
+    def test_histogram1(self):
+        sink = HistogramSink()
+        for wall in [0.0005, 0.003, 0.003, 0.1]:
+            record = CallRecord("backlog.getIssue")
+            record.wall = wall
+            sink.record(record)
+        self.assertEquals(0.001, sink.percentile("backlog.getIssue", 0.25))
+        self.assertEquals(0.004, sink.percentile("backlog.getIssue", 0.5))
+        self.assertEquals(0.128, sink.percentile("backlog.getIssue", 0.99))
+
+
+def test_main():
+    test_support.run_unittest(InstrumentationTest, SinkTest)
+
+
+if __name__ == '__main__':
+    test_main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+import unittest
+from test import test_support
+
+from backloglib import Backlog, PooledTransport, compact
+from backloglib.fakeserver import FakeBacklogServer
+from backloglib.mirror import IssueMirror
+from backloglib.models import Comment, Issue, Project, User, Version
+from backloglib.sync import IssueSync, MemoryWatermarkStore
+
+
+class IssueMirrorTest(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeBacklogServer(issues=40, comments=2, users=4).start()
+        self.transport = PooledTransport()
+        self.backlog = self.server.client(Backlog, transport=self.transport)
+        for i in range(1, 41):
+            self.backlog.update_issue({"key": "FAKE-%d" % i, "assignerId": i % 4 + 1, "priorityId": [2, 3, 4][i % 3],
+                                       "versionId": 1 if i % 2 else None, "due_date": "201403%02d" % (i % 28 + 1)})
+        for i in range(1, 11):
+            self.backlog.switch_status({"key": "FAKE-%d" % i, "statusId": 4, "assignerId": 1, "resolutionId": 0,
+                                        "comment": u"完了"})
+        self.mirror = IssueMirror()
+        self.mirror.refresh_master(self.backlog, 1)
+        IssueSync(self.backlog, MemoryWatermarkStore(), self.mirror.put_issues).run(1)
+
+    def tearDown(self):
+        self.mirror.close()
+        self.transport.close()
+        self.server.stop()
+
+    def _assertSame(self, condition):
+        condition = dict(condition, projectId=1, limit=100)
+        expected = self.backlog.find_issue(condition)
+        actual = self.mirror.find_issue(condition)
+        self.assertEquals([x.serialize() for x in expected], [x.serialize() for x in actual])
+        self.assertEquals(self.backlog.count_issue(condition), self.mirror.count_issue(condition))
+        return actual
+
+    def test_find_issue1(self):
+        actual = self._assertSame({})
+        self.assertEquals(40, len(actual))
+        self.assertTrue(isinstance(actual[0], Issue))
+
+    def test_find_issue2(self):
+        self.assertEquals(10, len(self._assertSame({"statusId": 4})))
+        self._assertSame({"statusId": [1, 4], "assignerId": 2})
+        self._assertSame({"priorityId": 2, "sort": "PRIORITY", "order": True})
+        self._assertSame({"versionId": [1]})
+        self._assertSame({"due_date_min": "20140305", "due_date_max": "20140310", "sort": "LIMIT_DATE"})
+        self._assertSame({"query": u"課題 1"})
+
+    def test_paging1(self):
+        actual = self.mirror.find_issue({"projectId": 1, "sort": "CREATED", "order": True, "offset": 5, "limit": 3})
+        self.assertEquals(["FAKE-6", "FAKE-7", "FAKE-8"], [x.key for x in actual])
+
+    def test_get1(self):
+        self.assertEquals(self.backlog.get_issue("FAKE-3").serialize(), self.mirror.get_issue("FAKE-3").serialize())
+        self.assertEquals(None, self.mirror.get_issue("FAKE-99"))
+        self.assertTrue(isinstance(self.mirror.get_project("FAKE"), Project))
+        self.assertTrue(isinstance(self.mirror.get_versions(1)[0], Version))
+        self.assertEquals(1, len(self.mirror.get_components(1)))
+        users = self.mirror.get_users(1)
+        self.assertEquals(4, len(users))
+        self.assertTrue(isinstance(users[0], User))
+
+    def test_comments1(self):
+        issue = self.mirror.get_issue("FAKE-1")
+        self.mirror.put_comments(issue.id, self.backlog.get_comments(issue.id))
+        comments = self.mirror.get_comments(issue.id)
+        self.assertEquals(3, len(comments))
+        self.assertTrue(isinstance(comments[0], Comment))
+        self.assertEquals(u"完了", comments[-1].content)
+        self.assertEquals(self.backlog.get_comments(issue.id)[-1].udpated_on, comments[-1].udpated_on)
+
+    def test_update1(self):
+        self.backlog.update_issue({"key": "FAKE-20", "versionId": 1})
+        self.mirror.put_issues([self.backlog.get_issue("FAKE-20")])
+        self._assertSame({"versionId": 1})
+        self.mirror.delete_issues([self.mirror.get_issue("FAKE-20").id])
+        self.assertEquals(39, self.mirror.count_issue({"projectId": 1}))
+
+    def test_compact1(self):
+        mirror = IssueMirror(compact=True)
+        mirror.put_issues(self.backlog.find_issue({"projectId": 1, "limit": 5}))
+        actual = mirror.find_issue({"projectId": 1})
+        self.assertEquals(5, len(actual))
+        self.assertTrue(isinstance(actual[0], compact.Issue))
+
+
+def test_main():
+    test_support.run_unittest(IssueMirrorTest)
+
+
+if __name__ == '__main__':
+    test_main()
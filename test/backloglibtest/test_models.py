@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+import unittest
+import xmlrpclib
+from test import test_support
+
+import backloglib
+from backloglib.models import AddIssue, AdminUpdateProjectUsers, FindCondition, Issue, LazyIssue, Status, \
+    UpdateIssue, User, Version
+
+from backloglibtest import StubServer
+
+ISSUE = {"id": 1, "key": "STUB-1", "summary": u"summary", "description": u"description",
+         "assigner": {"id": 2, "name": u"assigner"},
+         "created_user": {"id": 3, "name": u"creator"},
+         "status": {"id": 1, "name": u"Open"},
+         "versions": [{"id": 4, "name": u"1.0", "date": "20140101"}, {"id": 5, "name": u"1.1", "date": "20140201"}],
+         "milestones": []}
+
+
+class LazyIssueTest(unittest.TestCase):
+    def test_access1(self):
+        issue = LazyIssue(**ISSUE)
+        self.assertEquals("STUB-1", issue.key)
+        self.assertTrue(isinstance(issue.status, Status))
+        self.assertTrue(isinstance(issue.assigner, User))
+        self.assertEquals([4, 5], [v.id for v in issue.versions])
+        self.assertTrue(isinstance(issue.versions[0], Version))
+        self.assertTrue(issue.status is issue.status)
+
+    def test_access2(self):
+        issue = LazyIssue(**ISSUE)
+        self.assertFalse(hasattr(issue, "resolution"))
+        self.assertRaises(AttributeError, getattr, issue, "component")
+
+    def test_serialize1(self):
+        self.assertEquals(Issue(**ISSUE).serialize(), LazyIssue(**ISSUE).serialize())
+
+    def test_serialize2(self):
+        issue = LazyIssue(**ISSUE)
+        issue.status
+        self.assertEquals(Issue(**ISSUE).serialize(), issue.serialize())
+        self.assertEquals(vars(Issue(**ISSUE)).keys(), vars(issue).keys())
+        self.assertEquals(Issue(**ISSUE).serialize().keys(), issue.serialize().keys())
+
+    def test_assign1(self):
+        # 変換前のフィールドに代入・削除した場合も Issue と同じ結果になる
+        expected = Issue(**ISSUE)
+        issue = LazyIssue(**ISSUE)
+        for x in (expected, issue):
+            x.status = Status(4, u"Done")
+            del x.assigner
+        self.assertEquals(u"Done", issue.status.name)
+        self.assertFalse(hasattr(issue, "assigner"))
+        self.assertEquals(expected.serialize(), issue.serialize())
+        self.assertEquals({"id": 4, "name": u"Done"}, issue.serialize()["status"])
+        self.assertFalse("assigner" in issue.serialize())
+        self.assertRaises(AttributeError, delattr, issue, "assigner")
+
+    def test_repr1(self):
+        self.assertEquals(repr(Issue(**ISSUE)), repr(LazyIssue(**ISSUE)))
+
+    def test_backlog1(self):
+        backlog = backloglib.Backlog("space", "user", "password", lazy=True)
+        backlog.server = StubServer({"backlog.getIssue": lambda key: dict(ISSUE)})
+        actual = backlog.get_issue("STUB-1")
+        self.assertTrue(isinstance(actual, LazyIssue))
+        self.assertEquals(u"Open", actual.status.name)
+
+
+class SerializeTest(unittest.TestCase):
+    def _assertSame(self, obj):
+        expected = obj._do_convert(vars(obj))
+        actual = obj.serialize()
+        self.assertEquals(expected, actual)
+        self.assertEquals(xmlrpclib.dumps((expected,), "method"), xmlrpclib.dumps((actual,), "method"))
+        # 2 回目以降は生成済みの関数を使う
+        self.assertEquals(expected.keys(), obj.serialize().keys())
+
+    def test_add_issue1(self):
+        self._assertSame(AddIssue(1, u"summary", description=u"description", issueTypeId="2", priority=u"High",
+                                  estimated_hours=1.5))
+
+    def test_update_issue1(self):
+        self._assertSame(UpdateIssue("STUB-1", summary=u"summary", resolutionId=0, comment=u"comment"))
+        self._assertSame(UpdateIssue("STUB-1", componentId=3))
+
+    def test_admin_update_project_users1(self):
+        self._assertSame(AdminUpdateProjectUsers(1, [1, 2, 3]))
+
+    def test_issue1(self):
+        self._assertSame(Issue(**ISSUE))
+
+    def test_find_condition1(self):
+        self._assertSame(FindCondition({"projectId": 1, "statusId": [1, 2], "query": u"query"}))
+
+    def test_datetime1(self):
+        self._assertSame(AddIssue(1, u"summary", start_date=xmlrpclib.DateTime("20140101T00:00:00")))
+
+
+def test_main():
+    test_support.run_unittest(LazyIssueTest, SerializeTest)
+
+
+if __name__ == '__main__':
+    test_main()
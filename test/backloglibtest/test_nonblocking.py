@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+import inspect
+import threading
+import unittest
+import xmlrpclib
+from test import test_support
+
+from backloglib import AsyncBacklog, AsyncBacklogAdmin, Backlog, BacklogAdmin
+from backloglib.models import AdminUser, Project
+
+from backloglibtest import StubServer
+
+
+class AsyncBacklogTest(unittest.TestCase):
+    def setUp(self):
+        self.backlog = AsyncBacklog("space", "user", "password", max_workers=4)
+        self.stub = StubServer({"backlog.getProjects": self._get_projects,
+                                "backlog.getProject": self._get_project})
+        self.backlog.client.server = self.stub
+
+    def tearDown(self):
+        self.backlog.close()
+
+    def _get_projects(self):
+        return [self._get_project(i) for i in range(1, 4)]
+
+    def _get_project(self, key):
+        if key == "NONE":
+            raise xmlrpclib.Fault(1, "no such project")
+        return {"id": key, "key": "P%s" % key, "name": u"project", "url": "http://example.com", "archived": False}
+
+    def test_get_projects1(self):
+        future = self.backlog.get_projects()
+        actual = future.result()
+        self.assertEquals(3, len(actual))
+        self.assertTrue(isinstance(actual[0], Project))
+
+    def test_get_project1(self):
+        futures = [self.backlog.get_project(i) for i in range(10)]
+        self.assertEquals(range(10), [f.result().id for f in futures])
+
+    def test_get_project2(self):
+        future = self.backlog.get_project("NONE")
+        self.assertRaises(xmlrpclib.Fault, future.result)
+        self.assertTrue(isinstance(future.exception(), xmlrpclib.Fault))
+
+    def test_callback1(self):
+        done = threading.Event()
+        results = []
+
+        def callback(future):
+            results.append(future.result())
+            done.set()
+
+        self.backlog.get_project(1).add_done_callback(callback)
+        done.wait(5)
+        self.assertEquals(1, results[0].id)
+
+    def test_methods1(self):
+        self.assertFalse(hasattr(self.backlog, "iter_issues"))
+        self.assertTrue(hasattr(self.backlog, "find_issue"))
+        self.assertTrue(hasattr(self.backlog, "create_issue"))
+
+    def test_methods2(self):
+        # ジェネレータを返すメソッドは対象外とする
+        for clazz, async_clazz in ((Backlog, AsyncBacklog), (BacklogAdmin, AsyncBacklogAdmin)):
+            for name, method in inspect.getmembers(clazz, inspect.ismethod):
+                if name.startswith("_"):
+                    continue
+                if inspect.isgeneratorfunction(method) or "return self.server.stream(" in inspect.getsource(method):
+                    self.assertFalse(hasattr(async_clazz, name), name)
+
+
+class AsyncBacklogAdminTest(unittest.TestCase):
+    def test_get_users1(self):
+        backlog = AsyncBacklogAdmin("space", "admin", "password")
+        backlog.client.server = StubServer({"backlog.admin.getUsers": lambda: [
+            {"id": 1, "user_id": "admin", "name": u"admin", "mail_address": "admin@example.com",
+             "role": BacklogAdmin.ROLE_ADMIN, "mail_setting": None, "created_on": None, "updated_on": None}]})
+        try:
+            actual = backlog.get_users().result()
+            self.assertTrue(isinstance(actual[0], AdminUser))
+            self.assertEquals(BacklogAdmin.ROLE_ADMIN, AsyncBacklogAdmin.ROLE_ADMIN)
+        finally:
+            backlog.close()
+
+
+def test_main():
+    test_support.run_unittest(AsyncBacklogTest, AsyncBacklogAdminTest)
+
+
+if __name__ == '__main__':
+    test_main()
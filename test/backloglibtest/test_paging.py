@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+import unittest
+from test import test_support
+from xmlrpclib import Fault
+
+from backloglib import Backlog, compact
+from backloglib.fakeserver import FakeBacklogServer
+from backloglib.models import Comment, Issue
+from backloglib.transport import PooledTransport
+
+from backloglibtest import BacklogTestCase, StubServer, issue_structs, find_handler
+
+
+class PagingTest(BacklogTestCase):
+    def setUp(self):
+        super(PagingTest, self).setUp()
+        self.issues = issue_structs(25)
+        self.stub = StubServer({"backlog.findIssue": find_handler(self.issues),
+                                "backlog.countIssue": lambda params: len(self.issues)})
+        self.backlog.server = self.stub
+
+    def test_iter_issues1(self):
+        actual = list(self.backlog.iter_issues({"projectId": 1}, page_size=10))
+        self.assertEquals(25, len(actual))
+        self.assertTrue(isinstance(actual[0], Issue))
+        self.assertEquals(range(1, 26), [x.id for x in actual])
+        self.assertEquals([0, 10, 20], [args[0]["offset"] for name, args in self.stub.calls])
+
+    def test_iter_issues2(self):
+        # ページ境界ちょうどの場合は空ページで終わる
+        actual = list(self.backlog.iter_issues({"projectId": 1}, page_size=5))
+        self.assertEquals(25, len(actual))
+        self.assertEquals(6, len(self.stub.calls))
+
+    def test_iter_issues3(self):
+        actual = list(self.backlog.iter_issues({"projectId": 1, "offset": 3, "limit": 12}, page_size=10))
+        self.assertEquals(range(4, 16), [x.id for x in actual])
+        self.assertEquals([(3, 10), (13, 2)], [(args[0]["offset"], args[0]["limit"]) for name, args in self.stub.calls])
+
+    def test_iter_issues4(self):
+        self.backlog.transport = PooledTransport(pool_size=2)
+        actual = list(self.backlog.iter_issues({"projectId": 1}, page_size=10))
+        self.assertEquals(range(1, 26), [x.id for x in actual])
+
+    def test_find_issue_parallel1(self):
+        self.backlog.transport = PooledTransport(pool_size=4)
+        actual = self.backlog.find_issue_parallel({"projectId": 1, "sort": "CREATED"}, page_size=4)
+        self.assertEquals(range(1, 26), [x.id for x in actual])
+        count_params = [args[0] for name, args in self.stub.calls if name == "backlog.countIssue"]
+        self.assertEquals([{"projectId": 1}], count_params)
+        windows = sorted([(args[0]["offset"], args[0]["limit"]) for name, args in self.stub.calls
+                          if name == "backlog.findIssue"])
+        self.assertEquals([(x, 4) for x in range(0, 24, 4)] + [(24, 1)], windows)
+
+    def test_find_issue_parallel2(self):
+        actual = self.backlog.find_issue_parallel({"projectId": 1, "offset": 5, "limit": 7}, page_size=3)
+        self.assertEquals(range(6, 13), [x.id for x in actual])
+
+    def test_find_issue_parallel3(self):
+        self.assertEquals([], self.backlog.find_issue_parallel({"projectId": 1, "offset": 30}))
+
+    def test_find_issue_parallel4(self):
+        handler = self.stub.handlers["backlog.findIssue"]
+
+        def findIssue(params):
+            if params["offset"] == 4:
+                raise Fault(500, "error")
+            return handler(params)
+
+        self.stub.handlers["backlog.findIssue"] = findIssue
+        self.assertRaises(Fault, self.backlog.find_issue_parallel, {"projectId": 1}, page_size=4)
+        # 失敗した区間より後の区間は取得しない
+        offsets = [args[0]["offset"] for name, args in self.stub.calls if name == "backlog.findIssue"]
+        self.assertEquals([0, 4], offsets)
+
+
+class CommentPrefetchTest(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeBacklogServer(issues=25, comments=3).start()
+        self.transport = PooledTransport(pool_size=4)
+        self.backlog = self.server.client(Backlog, transport=self.transport)
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.stop()
+
+    def test_get_comments_many1(self):
+        actual = self.backlog.get_comments_many([3, 1, 2], chunk_size=2)
+        self.assertEquals([x.id for x in self.backlog.get_comments(3)], [x.id for x in actual[0]])
+        self.assertTrue(isinstance(actual[1][0], Comment))
+        self.assertEquals(2, self.server.calls["system.multicall"])
+
+    def test_iter_issues_comments1(self):
+        actual = list(self.backlog.iter_issues({"projectId": 1, "sort": "CREATED", "order": True}, page_size=10,
+                                               comments=True, comments_chunk=4, max_in_flight=2))
+        self.assertEquals(range(1, 26), [x.id for x in actual])
+        for issue in actual:
+            self.assertEquals([x.id for x in self.backlog.get_comments(issue.id)], [x.id for x in issue.comments])
+        # コメントは 4 件の課題ごとにまとめて取得する
+        self.assertEquals(7, self.server.calls["system.multicall"])
+
+    def test_iter_issues_comments2(self):
+        backlog = self.server.client(Backlog, compact=True)
+        actual = list(backlog.iter_issues({"projectId": 1, "limit": 5}, comments=True))
+        self.assertTrue(isinstance(actual[0], compact.Issue))
+        self.assertEquals(3, len(actual[0].comments))
+        self.assertEquals(3, len(actual[0].serialize()["comments"]))
+
+
+class PageSizeTest(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeBacklogServer(issues=250, comments=0).start()
+        self.transport = PooledTransport(pool_size=4)
+        self.backlog = self.server.client(Backlog, transport=self.transport)
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.stop()
+
+    def test_find_issue_parallel1(self):
+        condition = {"projectId": 1, "sort": "CREATED", "order": True}
+        self.assertEquals(range(1, 251), [x.id for x in self.backlog.find_issue_parallel(condition, page_size=100)])
+        self.assertRaises(ValueError, self.backlog.find_issue_parallel, condition, page_size=200)
+
+    def test_iter_issues1(self):
+        condition = {"projectId": 1, "sort": "CREATED", "order": True}
+        self.assertEquals(250, self.backlog.count_issue({"projectId": 1}))
+        self.assertEquals(range(1, 251), [x.id for x in self.backlog.iter_issues(condition, page_size=100)])
+        # findIssue の上限を超える page_size は途中で打ち切られるため受け付けない
+        self.assertRaises(ValueError, list, self.backlog.iter_issues(condition, page_size=200))
+        self.assertRaises(ValueError, list, self.backlog.iter_issues(condition, page_size=0))
+
+
+def test_main():
+    test_support.run_unittest(PagingTest, CommentPrefetchTest, PageSizeTest)
+
+
+if __name__ == '__main__':
+    test_main()
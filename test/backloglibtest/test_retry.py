@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+import errno
+import socket
+import unittest
+import xmlrpclib
+from test import test_support
+
+import backloglib
+from backloglib.retry import RetryPolicy
+
+from backloglibtest import StubTransport
+
+
+class _Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def _failing(errors, value):
+    """
+    errors の例外を順に送出した後で value を返すハンドラ
+    """
+    errors = list(errors)
+
+    def handler(*args):
+        if errors:
+            raise errors.pop(0)
+        return value
+
+    return handler
+
+
+def _reset():
+    return socket.error(errno.ECONNRESET, "Connection reset by peer")
+
+
+def _protocol_error(status):
+    return xmlrpclib.ProtocolError("space.backlog.jp/XML-RPC", status, "error", {})
+
+
+class RetryPolicyTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = _Clock()
+        self.retry = RetryPolicy(max_attempts=4, base_delay=1.0, max_delay=3.0, deadline=60,
+                                 clock=self.clock, sleep=self.clock.sleep, random=lambda: 1.0)
+        self.transport = StubTransport()
+        self.backlog = backloglib.Backlog("space", "user", "password", transport=self.transport, retry=self.retry)
+
+    def _called(self):
+        return [name for name, args in self.transport.calls]
+
+    def test_idempotent1(self):
+        self.transport.handlers["backlog.getIssue"] = _failing([_reset(), _protocol_error(503)], {"id": 1, "key": "STUB-1"})
+        self.assertEquals("STUB-1", self.backlog.get_issue("STUB-1").key)
+        self.assertEquals(3, len(self._called()))
+        self.assertEquals({"backlog.getIssue": {"retries": 2, "retry_time": 3.0, "failures": 0}}, self.retry.snapshot())
+
+    def test_max_attempts1(self):
+        self.transport.handlers["backlog.findIssue"] = _failing([_reset()] * 10, [])
+        self.assertRaises(socket.error, self.backlog.find_issue, {"projectId": 1})
+        self.assertEquals(4, len(self._called()))
+        # 待ち時間は 1, 2, 4 秒のうち max_delay で頭打ちになる
+        self.assertEquals(6.0, self.clock.now)
+        self.assertEquals(1, self.retry.snapshot()["backlog.findIssue"]["failures"])
+
+    def test_deadline1(self):
+        self.retry.deadline = 2.5
+        self.transport.handlers["backlog.countIssue"] = _failing([_reset()] * 10, 0)
+        self.assertRaises(socket.error, self.backlog.count_issue, {"projectId": 1})
+        self.assertEquals(2, len(self._called()))
+
+    def test_non_idempotent1(self):
+        self.transport.handlers["backlog.createIssue"] = _failing([_reset()], {"id": 1, "key": "STUB-1"})
+        self.assertRaises(socket.error, self.backlog.create_issue, {"projectId": 1, "summary": u"summary"})
+        self.assertEquals(1, len(self._called()))
+
+        self.transport.handlers["backlog.addComment"] = _failing([_protocol_error(503)], {})
+        self.assertRaises(xmlrpclib.ProtocolError, self.backlog.add_comment, {"key": "STUB-1", "content": u"c"})
+        self.assertEquals(2, len(self._called()))
+
+    def test_non_idempotent2(self):
+        comment = {"id": 1, "content": u"c", "created_user": {"id": 1, "name": u"user"}, "created_on": "",
+                   "updated_on": ""}
+        self.transport.handlers["backlog.addComment"] = _failing(
+            [_protocol_error(429), socket.error(errno.ECONNREFUSED, "Connection refused")], comment)
+        self.assertEquals(1, self.backlog.add_comment({"key": "STUB-1", "content": u"c"}).id)
+        self.assertEquals(3, len(self._called()))
+
+    def test_fault1(self):
+        self.transport.handlers["backlog.getIssue"] = _failing([xmlrpclib.Fault(1, "not found")], {})
+        self.assertRaises(xmlrpclib.Fault, self.backlog.get_issue, "STUB-1")
+        self.assertEquals(1, len(self._called()))
+
+    def test_idempotent2(self):
+        self.retry.idempotent = frozenset(["backlog.admin.updateProjectUsers"])
+        admin = backloglib.BacklogAdmin("space", "admin", "password", transport=self.transport, retry=self.retry)
+        self.transport.handlers["backlog.admin.updateProjectUsers"] = _failing([_reset()], [])
+        self.assertEquals([], admin.update_project_users({"project_id": 1, "user_id": [1]}))
+        self.assertEquals(2, len(self._called()))
+
+
+def test_main():
+    test_support.run_unittest(RetryPolicyTest)
+
+
+if __name__ == '__main__':
+    test_main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+import time
+import unittest
+from test import test_support
+
+from backloglib import Backlog, PooledTransport, summary
+from backloglib.fakeserver import FakeBacklogServer
+from backloglib.summary import SummaryAggregator, SummaryMatrix
+
+numpy = summary.numpy
+
+
+class _Clock(object):
+    def __init__(self):
+        self.now = time.mktime((2014, 3, 1, 10, 0, 0, 0, 0, -1))
+
+    def __call__(self):
+        return self.now
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class SummaryTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = _Clock()
+        self.server = FakeBacklogServer(projects=3, issues=10, comments=0, clock=self.clock).start()
+        self.transport = PooledTransport(pool_size=4)
+        self.backlog = self.server.client(Backlog, transport=self.transport)
+        for i, key in enumerate(["FAKE-1", "FAKE-2", "FAKE2-1", "FAKE2-2", "FAKE2-3"]):
+            self.backlog.switch_status({"key": key, "statusId": 4 if i % 2 else 2, "assignerId": None,
+                                        "resolutionId": None, "comment": None})
+        self.aggregator = SummaryAggregator(self.backlog)
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.stop()
+
+    def _calls(self, method):
+        return self.server.calls.get("backlog.%s" % method, 0)
+
+    def test_matrix1(self):
+        summaries = self.backlog.get_project_summaries()
+        matrix = SummaryMatrix.from_summaries(summaries)
+        self.assertEquals([x.id for x in summaries], matrix.project_ids)
+        self.assertEquals((3, len(matrix.status_ids)), matrix.projects.shape)
+        self.assertEquals(numpy.int64, matrix.projects.dtype)
+        for summary, row in zip(summaries, matrix.projects.tolist()):
+            self.assertEquals([x.count for x in summary.statuses], row)
+        self.assertEquals(30, sum(matrix.totals().values()))
+        self.assertEquals([10, 10, 10], matrix.project_totals().tolist())
+        self.assertEquals(sum([len(x.milestones or []) for x in summaries]), matrix.milestones.shape[0])
+        done = matrix.ratio([4])
+        self.assertAlmostEquals(0.1, done[0])
+        self.assertAlmostEquals(0.1, done[1])
+        self.assertAlmostEquals(0.0, done[2])
+
+    def test_refresh1(self):
+        before = self.aggregator.refresh()
+        self.assertEquals(None, self.aggregator.refreshed)
+        self.assertEquals(1, self._calls("getProjectSummaries"))
+
+        # 変更がなければ取得し直さない
+        self.clock.now += 10
+        self.aggregator.refresh()
+        self.assertEquals([], self.aggregator.refreshed)
+        self.assertEquals(0, self._calls("getProjectSummary"))
+
+        self.clock.now += 10
+        project_id = self.backlog.get_issue("FAKE2-4").projectId
+        self.backlog.switch_status({"key": "FAKE2-4", "statusId": 4, "assignerId": None, "resolutionId": None,
+                                    "comment": None})
+        after = self.aggregator.refresh()
+        self.assertEquals([project_id], self.aggregator.refreshed)
+        self.assertEquals(1, self._calls("getProjectSummary"))
+        self.assertEquals(1, self._calls("getProjectSummaries"))
+
+        delta = after.delta(before)
+        changes = delta.by_project()[project_id]
+        self.assertEquals(1, changes[delta.status_names[delta.status_ids.index(4)]])
+        self.assertEquals(-1, sum([v for k, v in changes.items() if v < 0]))
+        self.assertEquals(2, int(numpy.abs(delta.projects).sum()))
+        self.assertEquals(after.totals(), SummaryMatrix.from_summaries(self.backlog.get_project_summaries())
+                          .totals())
+
+    def test_refresh2(self):
+        self.aggregator.refresh()
+        # タイムラインの件数を超える更新があった場合は全て取得し直す
+        for i in range(60):
+            self.clock.now += 1
+            self.backlog.add_comment({"key": "FAKE-3", "content": u"%d" % i})
+        self.aggregator.refresh()
+        self.assertEquals(None, self.aggregator.refreshed)
+        self.assertEquals(2, self._calls("getProjectSummaries"))
+        self.aggregator.refresh(full=True)
+        self.assertEquals(3, self._calls("getProjectSummaries"))
+
+    def test_delta1(self):
+        summaries = self.backlog.get_project_summaries()
+        whole = SummaryMatrix.from_summaries(summaries)
+        part = SummaryMatrix.from_summaries(summaries[1:])
+        delta = whole.delta(part)
+        self.assertEquals(whole.project_ids, delta.project_ids)
+        self.assertEquals(whole.projects[0].tolist(), delta.projects[0].tolist())
+        self.assertEquals(0, int(numpy.abs(delta.projects[1:]).sum()))
+        empty = SummaryMatrix.from_summaries([])
+        self.assertEquals(whole.projects.tolist(), whole.delta(empty).projects.tolist())
+
+
+def test_main():
+    test_support.run_unittest(SummaryTest)
+
+
+if __name__ == '__main__':
+    test_main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+import os
+import tempfile
+import time
+import unittest
+from test import test_support
+
+from backloglib import Backlog, PooledTransport
+from backloglib.fakeserver import FakeBacklogServer
+from backloglib.sync import IssueSync, MemoryWatermarkStore, SqliteWatermarkStore, SyncState
+
+
+class _Clock(object):
+    def __init__(self):
+        self.now = time.mktime((2014, 3, 1, 10, 0, 0, 0, 0, -1))
+
+    def __call__(self):
+        return self.now
+
+
+class IssueSyncTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = _Clock()
+        self.server = FakeBacklogServer(issues=25, comments=0, clock=self.clock).start()
+        self.transport = PooledTransport()
+        self.backlog = self.server.client(Backlog, transport=self.transport)
+        self.store = MemoryWatermarkStore()
+        self.received = []
+        self.sync = IssueSync(self.backlog, self.store, self.received.extend, overlap=60, page_size=10,
+                              page_overlap=2)
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.stop()
+
+    def _update(self, key, seconds=1):
+        self.clock.now += seconds
+        self.backlog.update_issue({"key": key, "summary": u"updated %s" % key})
+
+    def _keys(self):
+        keys = [x.key for x in self.received]
+        del self.received[:]
+        return keys
+
+    def _run_keys(self):
+        self.sync.run(1)
+        return self._keys()
+
+    def test_initial1(self):
+        result = self.sync.run(1)
+        self.assertEquals(25, result.changed)
+        self.assertEquals(["FAKE-%d" % i for i in range(1, 26)], sorted(self._keys(), key=lambda x: int(x[5:])))
+        self.assertEquals("20140301100000", result.watermark)
+
+    def test_incremental1(self):
+        self.sync.run(1)
+        self._keys()
+        self.assertEquals(0, self.sync.run(1).changed)
+        self._update("FAKE-3", 120)
+        self._update("FAKE-7")
+        result = self.sync.run(1)
+        self.assertEquals(["FAKE-3", "FAKE-7"], self._keys())
+        self.assertEquals("20140301100201", result.watermark)
+
+    def test_tie1(self):
+        self.sync.run(1)
+        self._update("FAKE-3", 120)
+        self.sync.run(1)
+        self._keys()
+        # watermark と同じ時刻に後から更新された課題も取りこぼさない
+        self._update("FAKE-4", 0)
+        self.assertEquals(["FAKE-4"], self._run_keys())
+
+    def test_skew1(self):
+        self.sync.run(1)
+        self._update("FAKE-3", 120)
+        self.sync.run(1)
+        self._keys()
+        # サーバの時刻が遅れて、watermark より前の時刻で更新された課題も overlap の範囲なら取得する
+        self._update("FAKE-5", -30)
+        self.assertEquals(["FAKE-5"], self._run_keys())
+        self.assertEquals([], self._run_keys())
+
+    def test_shift1(self):
+        self.sync.run(1)
+        self._keys()
+        for i in range(1, 26):
+            self._update("FAKE-%d" % i, 0 if i > 1 else 60)
+        original = self.backlog.find_issue
+        calls = []
+
+        def find_issue(params):
+            page = original(params)
+            if not calls:
+                # 1 ページ目の取得後に、前の方の課題が更新されて末尾に移動する
+                for key in ["FAKE-1", "FAKE-2", "FAKE-3", "FAKE-4"]:
+                    self._update(key)
+            calls.append(params["offset"])
+            return page
+
+        self.backlog.find_issue = find_issue
+        keys = self._run_keys()
+        self.assertEquals(set(["FAKE-%d" % i for i in range(1, 26)]), set(keys))
+        self.assertEquals(29, len(keys))
+        self.assertTrue(len(calls) > 3)
+
+    def test_page_size1(self):
+        # findIssue の上限を超えると 1 回の実行の途中で打ち切られるため受け付けない
+        self.assertRaises(ValueError, IssueSync, self.backlog, self.store, self.received.extend, page_size=200)
+        self.assertRaises(ValueError, IssueSync, self.backlog, self.store, self.received.extend, page_size=0)
+
+
+class WatermarkStoreTest(unittest.TestCase):
+    def test_sqlite1(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            store = SqliteWatermarkStore(path)
+            self.assertEquals(None, store.get(1).watermark)
+            store.set(1, SyncState("20140301100000", {"3": "20140301100000"}))
+            store.close()
+            state = SqliteWatermarkStore(path).get(1)
+            self.assertEquals("20140301100000", state.watermark)
+            self.assertEquals({"3": "20140301100000"}, state.seen)
+        finally:
+            os.remove(path)
+
+
+def test_main():
+    test_support.run_unittest(IssueSyncTest, WatermarkStoreTest)
+
+
+if __name__ == '__main__':
+    test_main()
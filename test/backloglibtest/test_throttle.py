@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+import socket
+import threading
+import unittest
+from test import test_support
+
+import backloglib
+from backloglib.cache import MasterDataCache
+from backloglib.throttle import AIMDController, RateLimiter, TokenBucket, is_read_method
+
+from backloglibtest import StubTransport
+
+
+class _Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class TokenBucketTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = _Clock()
+
+    def test_burst1(self):
+        bucket = TokenBucket(2, capacity=3, clock=self.clock, sleep=self.clock.sleep)
+        self.assertEquals([True, True, True, False], [bucket.try_acquire() for i in range(4)])
+        self.clock.now += 0.5
+        self.assertTrue(bucket.try_acquire())
+        self.assertFalse(bucket.try_acquire())
+
+    def test_acquire1(self):
+        bucket = TokenBucket(4, capacity=1, clock=self.clock, sleep=self.clock.sleep)
+        for i in range(5):
+            bucket.acquire()
+        self.assertEquals(1.0, sum(self.clock.slept))
+
+    def test_capacity1(self):
+        bucket = TokenBucket(10, capacity=2, clock=self.clock, sleep=self.clock.sleep)
+        self.clock.now += 60
+        self.assertEquals(2, len([x for x in range(5) if bucket.try_acquire()]))
+
+
+class RateLimiterTest(unittest.TestCase):
+    def test_is_read_method1(self):
+        for name in ["backlog.getIssue", "backlog.findIssue", "backlog.countIssue", "backlog.admin.getUsers",
+                     "system.multicall"]:
+            self.assertTrue(is_read_method(name), name)
+        for name in ["backlog.createIssue", "backlog.addComment", "backlog.switchStatus", "backlog.admin.addUser"]:
+            self.assertFalse(is_read_method(name), name)
+
+    def test_budgets1(self):
+        clock = _Clock()
+        limiter = RateLimiter(read_rate=10, write_rate=1, clock=clock, sleep=clock.sleep)
+        for i in range(10):
+            limiter.acquire("backlog.getIssue")
+        self.assertEquals([], clock.slept)
+        limiter.acquire("backlog.createIssue")
+        limiter.acquire("backlog.createIssue")
+        self.assertEquals([1.0], clock.slept)
+
+    def test_unlimited1(self):
+        limiter = RateLimiter(write_rate=1)
+        for i in range(100):
+            self.assertEquals(0.0, limiter.acquire("backlog.getIssue"))
+
+    def test_backlog1(self):
+        clock = _Clock()
+        limiter = RateLimiter(read_rate=1, clock=clock, sleep=clock.sleep)
+        transport = StubTransport({"backlog.getStatuses": lambda: [{"id": 1, "name": u"Open"}],
+                                   "backlog.getIssue": lambda key: {"id": 1, "key": key}})
+        cache = MasterDataCache()
+        # 同じ RateLimiter を渡したインスタンスは制限を共有する
+        backlogs = [backloglib.Backlog("space", "user%d" % i, "password", transport=transport, cache=cache,
+                                       limiter=limiter) for i in range(2)]
+        for backlog in backlogs:
+            backlog.get_issue("STUB-1")
+        self.assertEquals(1, len(clock.slept))
+        # キャッシュから返した呼び出しはトークンを消費しない
+        for i in range(3):
+            backlogs[i % 2].get_statuses()
+        self.assertEquals(2, len(clock.slept))
+
+
+class AIMDControllerTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = _Clock()
+        self.controller = AIMDController(initial=4, minimum=1, maximum=8, target_latency=1.0, clock=self.clock)
+
+    def _call(self, latency, congested=False):
+        self.controller.acquire()
+        self.controller.release(latency, congested)
+
+    def test_increase1(self):
+        for i in range(4):
+            self._call(0.1)
+        self.assertEquals(4, self.controller.limit)
+        for i in range(6):
+            self._call(0.1)
+        self.assertEquals(6, self.controller.limit)
+        for i in range(100):
+            self._call(0.1)
+        self.assertEquals(8, self.controller.limit)
+
+    def test_decrease1(self):
+        self._call(2.0)
+        self.assertEquals(2, self.controller.limit)
+        # 同じ混雑による失敗では続けて減らさない
+        self._call(0.1, congested=True)
+        self.assertEquals(2, self.controller.limit)
+        self.clock.now += 1.0
+        self._call(0.1, congested=True)
+        self.assertEquals(1, self.controller.limit)
+        self.clock.now += 1.0
+        self._call(5.0)
+        self.assertEquals(1, self.controller.limit)
+
+    def test_suspend1(self):
+        # 手放している間は limit を変えず、report で調整する
+        self.controller.acquire()
+        self.controller.suspend()
+        self.assertEquals(0, self.controller.in_flight)
+        self.assertEquals(4, self.controller.limit)
+        self.controller.report(2.0)
+        self.assertEquals(0, self.controller.in_flight)
+        self.assertEquals(2, self.controller.limit)
+
+    def test_limit1(self):
+        controller = AIMDController(initial=2, maximum=2)
+        for i in range(2):
+            controller.acquire()
+        acquired = threading.Event()
+
+        def run():
+            controller.acquire()
+            acquired.set()
+
+        t = threading.Thread(target=run)
+        t.start()
+        self.assertFalse(acquired.wait(0.1))
+        controller.release(0.1)
+        self.assertTrue(acquired.wait(1.0))
+        t.join()
+        self.assertEquals(2, controller.in_flight)
+
+    def test_backlog1(self):
+        def fail(key):
+            raise socket.error(104, "Connection reset by peer")
+
+        transport = StubTransport({"backlog.getIssue": fail})
+        backlog = backloglib.Backlog("space", "user", "password", transport=transport, controller=self.controller)
+        self.assertRaises(socket.error, backlog.get_issue, "STUB-1")
+        self.assertEquals(2, self.controller.limit)
+        self.assertEquals(0, self.controller.in_flight)
+
+
+def test_main():
+    test_support.run_unittest(TokenBucketTest, RateLimiterTest, AIMDControllerTest)
+
+
+if __name__ == '__main__':
+    test_main()
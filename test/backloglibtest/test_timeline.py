@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+import Queue
+import time
+import unittest
+from test import test_support
+
+from backloglib import Backlog, PooledTransport
+from backloglib.fakeserver import FakeBacklogServer
+from backloglib.timeline import TimelinePoller
+
+
+class _Clock(object):
+    def __init__(self):
+        self.now = time.mktime((2014, 3, 1, 10, 0, 0, 0, 0, -1))
+
+    def __call__(self):
+        return self.now
+
+
+class TimelinePollerTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = _Clock()
+        self.server = FakeBacklogServer(issues=10, comments=0, clock=self.clock).start()
+        self.transport = PooledTransport()
+        self.backlog = self.server.client(Backlog, transport=self.transport)
+        self.gaps = []
+        self.poller = TimelinePoller(self.backlog, min_interval=1, max_interval=8,
+                                     on_gap=lambda since, until: self.gaps.append((since, until)))
+
+    def tearDown(self):
+        self.poller.stop()
+        self.transport.close()
+        self.server.stop()
+
+    def _comment(self, key, content, seconds=0):
+        self.clock.now += seconds
+        self.backlog.add_comment({"key": key, "content": content})
+
+    def test_poll1(self):
+        # 最初の取得では窓の全てのイベントが新しい
+        self.assertEquals(10, len(self.poller.poll()))
+        self.assertEquals([], self.poller.poll())
+        self._comment("FAKE-1", u"a", 1)
+        self._comment("FAKE-2", u"b")
+        # 同じ時刻のイベントも種別・課題キー・内容で区別し、古い順に返す
+        actual = self.poller.poll()
+        self.assertEquals([("FAKE-1", u"a"), ("FAKE-2", u"b")], [(x.issue.key, x.content) for x in actual])
+        self.assertEquals([], self.poller.poll())
+        self.assertEquals([], self.gaps)
+
+    def test_interval1(self):
+        self.poller.poll()
+        self.assertEquals(1, self.poller.interval)
+        for expected in (2, 4, 8, 8):
+            self.poller.poll()
+            self.assertEquals(expected, self.poller.interval)
+        self._comment("FAKE-1", u"a", 1)
+        self.poller.poll()
+        self.assertEquals(1, self.poller.interval)
+
+    def test_gap1(self):
+        for i in range(40):
+            self._comment("FAKE-1", u"%d" % i, 1)
+        self.assertEquals(50, len(self.poller.poll()))
+        for i in range(49):
+            self._comment("FAKE-2", u"%d" % i, 1)
+        self.assertEquals(49, len(self.poller.poll()))
+        self.assertEquals(0, self.poller.gaps)
+        for i in range(60):
+            self._comment("FAKE-3", u"%d" % i, 1)
+        self.assertEquals(50, len(self.poller.poll()))
+        self.assertEquals(1, self.poller.gaps)
+        self.assertEquals(1, len(self.gaps))
+        self.assertTrue(self.gaps[0][0] < self.gaps[0][1])
+
+    def test_subscribe1(self):
+        subscription = self.poller.subscribe(maxsize=4)
+        self.poller.min_interval = self.poller.interval = 0.01
+        self.poller.start()
+        received = []
+        while len(received) < 10:
+            received.append(subscription.get(timeout=5))
+        # キューが空くまで待っている間は次の取得を行わない
+        self._comment("FAKE-1", u"a", 1)
+        received.append(subscription.get(timeout=5))
+        self.assertEquals(u"a", received[-1].content)
+        self.assertRaises(Queue.Empty, subscription.get, timeout=0.1)
+        subscription.close()
+        self.poller.stop()
+        self.assertEquals(11, len(received))
+
+    def test_stop1(self):
+        # 配信しきれなかったイベントは既読にせず、次の取得で配信する
+        first = self.poller.subscribe(maxsize=20)
+        second = self.poller.subscribe(maxsize=3)
+        self.poller._stopped.set()
+        published = self.poller.poll()
+        self.assertEquals(3, len(published))
+        self.assertEquals(4, first.queue.qsize())
+        self.assertEquals(3, second.queue.qsize())
+        self.poller._stopped.clear()
+        received = [second.get() for i in range(3)]
+        second.queue.maxsize = 20
+        self.assertEquals(7, len(self.poller.poll()))
+        self.assertEquals(10, first.queue.qsize())
+        received.extend([second.get() for i in range(7)])
+        self.assertEquals([(x.issue.key, x.content) for x in received],
+                          [(x.issue.key, x.content) for x in [first.get() for i in range(10)]])
+        self.assertEquals([], self.poller.poll())
+
+
+def test_main():
+    test_support.run_unittest(TimelinePollerTest)
+
+
+if __name__ == '__main__':
+    test_main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2009 - 2014 Takashi SOMEDA
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language
+# governing permissions and limitations under the License.
+
+import unittest
+import threading
+import xmlrpclib
+from test import test_support
+
+from backloglib import AIMDController, Backlog, PooledTransport
+from backloglib.fakeserver import FakeBacklogServer
+from backloglib.models import Issue
+from backloglib.unmarshal import getparser
+from backloglibtest import issue_structs, find_handler
+from backloglibtest.test_transport import _KeepAliveHandler, _Server
+
+
+def _parse(body, factory, stream=False):
+    p, u = getparser(factory, stream=stream)
+    p.feed(body)
+    p.close()
+    return u
+
+
+class ModelUnmarshallerTest(unittest.TestCase):
+    def test_struct1(self):
+        body = xmlrpclib.dumps((issue_structs(1)[0],), methodresponse=True)
+        ret = _parse(body, Issue).close()[0]
+        self.assertTrue(isinstance(ret, Issue))
+        self.assertEquals("STUB-1", ret.key)
+        self.assertEquals(u"Open", ret.status.name)
+
+    def test_array1(self):
+        body = xmlrpclib.dumps((issue_structs(3),), methodresponse=True)
+        ret = _parse(body, Issue).close()[0]
+        self.assertEquals(["STUB-1", "STUB-2", "STUB-3"], [x.key for x in ret])
+        self.assertEquals(issue_structs(3)[1]["priority"], ret[1].priority.serialize())
+
+    def test_stream1(self):
+        body = xmlrpclib.dumps((issue_structs(3),), methodresponse=True)
+        u = _parse(body, Issue, stream=True)
+        self.assertEquals(([],), u.close())
+        self.assertEquals(["STUB-1", "STUB-2", "STUB-3"], [x.key for x in u.ready])
+
+    def test_fault1(self):
+        body = xmlrpclib.dumps(xmlrpclib.Fault(1, "error"), methodresponse=True)
+        u = _parse(body, Issue)
+        self.assertRaises(xmlrpclib.Fault, u.close)
+
+
+class StreamTest(unittest.TestCase):
+    def setUp(self):
+        self.server = _Server(("127.0.0.1", 0), _KeepAliveHandler, logRequests=False)
+        self.server.register_function(find_handler(issue_structs(30)), "backlog.findIssue")
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.setDaemon(True)
+        thread.start()
+        self.transport = PooledTransport()
+        self.backlog = Backlog("stub", "user", "password", transport=self.transport)
+        self.backlog.server._ServerProxy__host = "user:password@127.0.0.1:%d" % self.server.server_address[1]
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_find_issue1(self):
+        ret = self.backlog.find_issue({"projectId": 1, "limit": 30})
+        self.assertEquals(30, len(ret))
+        self.assertTrue(all(isinstance(x, Issue) for x in ret))
+
+    def test_find_issue_stream1(self):
+        ret = list(self.backlog.find_issue_stream({"projectId": 1, "limit": 30}))
+        self.assertEquals(["STUB-%d" % i for i in range(1, 31)], [x.key for x in ret])
+        self.assertEquals(1, len(self.transport._idle.values()[0]))
+
+    def test_find_issue_stream2(self):
+        stream = self.backlog.find_issue_stream({"projectId": 1, "limit": 30})
+        self.assertEquals("STUB-1", stream.next().key)
+        stream.close()
+        # 読み残しのある接続はプールに戻さない
+        self.assertEquals([], self.transport._idle.get(self.backlog.server._ServerProxy__host, []))
+
+
+class NestedStreamTest(unittest.TestCase):
+    """
+    ストリームを処理しているループの中で他の API を呼び出す
+    """
+
+    def setUp(self):
+        self.server = FakeBacklogServer(issues=30, comments=2).start()
+        self.transport = PooledTransport(pool_size=1)
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.stop()
+
+    def _nested(self, backlog):
+        results = []
+
+        def run():
+            for issue in backlog.find_issue_stream({"projectId": 1, "limit": 30}):
+                results.append(len(backlog.get_comments(issue.id)))
+
+        thread = threading.Thread(target=run)
+        thread.setDaemon(True)
+        thread.start()
+        thread.join(10)
+        self.assertFalse(thread.isAlive(), "nested call blocked")
+        return results
+
+    def test_pool_size1(self):
+        backlog = self.server.client(Backlog, transport=self.transport)
+        self.assertEquals([2] * 30, self._nested(backlog))
+        self.assertEquals(30, len(backlog.find_issue({"projectId": 1, "limit": 30})))
+
+    def test_controller1(self):
+        controller = AIMDController(initial=1, minimum=1, maximum=1)
+        backlog = self.server.client(Backlog, transport=PooledTransport(pool_size=4), controller=controller)
+        try:
+            self.assertEquals([2] * 30, self._nested(backlog))
+            self.assertEquals(0, controller.in_flight)
+        finally:
+            backlog.transport.close()
+
+
+def test_main():
+    test_support.run_unittest(ModelUnmarshallerTest, StreamTest, NestedStreamTest)
+
+
+if __name__ == '__main__':
+    test_main()